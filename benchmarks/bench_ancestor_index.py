@@ -0,0 +1,76 @@
+import argparse
+import random
+import time
+
+from src.revision_storage import RevisionStorage
+
+from .generator import RevisionIdOrdering
+
+
+def naive_lowest_common_ancestor(storage: RevisionStorage, first: str, second: str):
+    ancestors = set()
+    revision = first
+    while revision in storage:
+        ancestors.add(revision)
+        revision = storage[revision].parent_revision
+    revision = second
+    while revision in storage:
+        if revision in ancestors:
+            return revision
+        revision = storage[revision].parent_revision
+    return None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="time ancestor queries on a deep history with side branches"
+    )
+    parser.add_argument("--revisions", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def main():
+    inputs = parse_args()
+    rng = random.Random(inputs.seed)
+    edges = [("r0", None)]
+    for index in range(1, inputs.revisions):
+        parent = index - 1 if rng.random() < 0.99 else rng.randrange(index)
+        edges.append((f"r{index}", f"r{parent}"))
+    storage = RevisionStorage.from_edges(edges)
+
+    started = time.perf_counter()
+    storage.ancestor_index
+    print(f"index build:      {time.perf_counter() - started:.3f}s")
+
+    pairs = [
+        (f"r{rng.randrange(inputs.revisions)}", f"r{rng.randrange(inputs.revisions)}")
+        for _ in range(inputs.queries)
+    ]
+
+    started = time.perf_counter()
+    for first, second in pairs:
+        naive_lowest_common_ancestor(storage, first, second)
+    naive_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for first, second in pairs:
+        storage.lowest_common_ancestor(first, second)
+        storage.is_ancestor(first, second)
+        storage.distance(first, second)
+    index_elapsed = time.perf_counter() - started
+
+    queries = len(pairs)
+    print(f"naive LCA:        {naive_elapsed / queries * 1e6:.1f}us per query")
+    print(f"indexed queries:  {index_elapsed / queries * 1e6:.1f}us per query")
+
+    started = time.perf_counter()
+    storage.ordering = RevisionIdOrdering()
+    storage.fix_revision_conflict()
+    storage.lowest_common_ancestor(*pairs[0])
+    print(f"fix + refresh:    {time.perf_counter() - started:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import time
+
+from src.revision_storage import RevisionStorage
+
+
+def naive_last_descendant(storage: RevisionStorage, revision: str) -> str:
+    current = storage[revision]
+    while current.children:
+        current = storage[current.children[0]]
+    return current.revision
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="time last-descendant queries on a deep linear history"
+    )
+    parser.add_argument("--revisions", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=1_000)
+    return parser.parse_args()
+
+
+def main():
+    inputs = parse_args()
+    edges = [("r0", None)] + [
+        (f"r{index}", f"r{index - 1}") for index in range(1, inputs.revisions)
+    ]
+    storage = RevisionStorage.from_edges(edges)
+
+    started = time.perf_counter()
+    index = storage.descendant_index
+    print(f"index build:      {time.perf_counter() - started:.3f}s")
+
+    step = max(1, inputs.revisions // inputs.queries)
+    query_revisions = [f"r{index}" for index in range(0, inputs.revisions, step)]
+
+    started = time.perf_counter()
+    for revision in query_revisions:
+        naive_last_descendant(storage, revision)
+    naive_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for revision in query_revisions:
+        index.tip(revision)
+        index.first_branch_point(revision)
+        index.depth(revision)
+    index_elapsed = time.perf_counter() - started
+
+    queries = len(query_revisions)
+    print(f"naive walk:       {naive_elapsed / queries * 1e6:.1f}us per query")
+    print(f"indexed queries:  {index_elapsed / queries * 1e6:.1f}us per query")
+
+    started = time.perf_counter()
+    storage.add(revision="new", down_revision=f"r{inputs.revisions - 1}")
+    storage.add(revision="conflict", down_revision=f"r{inputs.revisions // 2}")
+    print(f"2 incremental adds: {(time.perf_counter() - started) * 1e3:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
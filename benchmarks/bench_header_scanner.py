@@ -0,0 +1,46 @@
+import argparse
+import os
+import tempfile
+import time
+
+from src.fileparser import MigrationsParser
+
+from .generator import MigrationTreeSpec, generate_migration_tree
+
+
+def time_engine(dir_name: str, engine: str, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        MigrationsParser(_dir_name=dir_name, _engine=engine)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="compare the parse engines"
+    )
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--body-lines", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=3)
+    return parser.parse_args()
+
+
+def main():
+    inputs = parse_args()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        generate_migration_tree(temp_dir, MigrationTreeSpec(
+            count=inputs.files, body_lines=inputs.body_lines
+        ))
+        dir_name = temp_dir + os.sep
+        for engine in MigrationsParser.ENGINES:
+            elapsed = time_engine(dir_name, engine, inputs.repeats)
+            print(
+                f"{engine:>8}: {elapsed:.3f}s "
+                f"({elapsed / inputs.files * 1e6:.1f}us per file)"
+            )
+
+
+if __name__ == '__main__':
+    main()
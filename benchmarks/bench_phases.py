@@ -0,0 +1,124 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from src.fileparser import MigrationsParser
+from src.revision_storage import RevisionStorage
+
+from .generator import SHAPES, MigrationTreeSpec, generate_migration_tree
+
+
+PHASES = ("discovery", "parsing", "graph_build", "conflict_fixing", "writing")
+
+
+def timed(phases: Dict[str, float], name: str, function: Callable):
+    started = time.perf_counter()
+    result = function()
+    phases[name] = time.perf_counter() - started
+    return result
+
+
+def run_phases(dir_name: str, engine: str) -> Dict:
+    phases: Dict[str, float] = {}
+    parser = MigrationsParser(_dir_name=dir_name, _engine=engine, _autoload=False)
+    timed(phases, "discovery", parser._set_migration_files)
+    revision_items = timed(
+        phases, "parsing", lambda: parser._parse_files(parser.files)
+    )
+
+    def build_graph() -> RevisionStorage:
+        storage = RevisionStorage()
+        for revision_item in revision_items:
+            storage.add(revision_item)
+        return storage
+
+    storage = timed(phases, "graph_build", build_graph)
+    timed(phases, "conflict_fixing", storage.fix_revision_conflict)
+    written = timed(phases, "writing", storage.wtite_fix_to_file)
+    return {
+        "files": len(parser.files),
+        "files_written": len(written),
+        "phases": phases,
+    }
+
+
+def run_case(spec: MigrationTreeSpec, engine: str, repeats: int) -> Dict:
+    best: Dict = {}
+    for _ in range(repeats):
+        # Writing changes the tree, so every repeat gets a fresh copy.
+        with tempfile.TemporaryDirectory() as temp_dir:
+            generate_migration_tree(temp_dir, spec)
+            result = run_phases(temp_dir + os.sep, engine)
+        if not best:
+            best = result
+            continue
+        for phase, elapsed in result["phases"].items():
+            best["phases"][phase] = min(best["phases"][phase], elapsed)
+    best["phases"]["total"] = sum(best["phases"][phase] for phase in PHASES)
+    return {
+        "shape": spec.shape,
+        "count": spec.count,
+        "heads": spec.heads,
+        "body_lines": spec.body_lines,
+        "engine": engine,
+        **best,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="time every migxer phase on synthetic migration trees"
+    )
+    parser.add_argument("--shapes", nargs="+", choices=SHAPES, default=SHAPES)
+    parser.add_argument("--counts", nargs="+", type=int, default=[100, 1000])
+    parser.add_argument("--heads", type=int, default=5)
+    parser.add_argument("--body_lines", type=int, default=20)
+    parser.add_argument(
+        "--engines", nargs="+", choices=MigrationsParser.ENGINES,
+        default=["scanner"]
+    )
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--output", help="JSON file, stdout by default")
+    return parser.parse_args()
+
+
+def main():
+    inputs = parse_args()
+    results: List[Dict] = []
+    for shape in inputs.shapes:
+        for count in inputs.counts:
+            spec = MigrationTreeSpec(
+                count=count, shape=shape, heads=inputs.heads,
+                body_lines=inputs.body_lines,
+            )
+            for engine in inputs.engines:
+                results.append(run_case(spec, engine, inputs.repeats))
+                print(
+                    f"{shape:>10} {count:>8} {engine:>8}: "
+                    f"{results[-1]['phases']['total']:.3f}s",
+                    file=sys.stderr,
+                )
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    if inputs.output:
+        with open(inputs.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
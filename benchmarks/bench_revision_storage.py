@@ -0,0 +1,77 @@
+import argparse
+import random
+import time
+import tracemalloc
+
+from src.revision_storage import CompactRevisionStorage, RevisionStorage
+
+
+def linear_edges(count: int):
+    edges = [("r0", None)]
+    for index in range(1, count):
+        edges.append((f"r{index}", f"r{index - 1}"))
+    return edges
+
+
+def time_incremental(edges) -> float:
+    started = time.perf_counter()
+    storage = RevisionStorage()
+    for revision, down_revision in edges:
+        storage.add(
+            revision=revision, down_revision=down_revision,
+            original_filepath=revision
+        )
+    return time.perf_counter() - started
+
+
+def time_from_edges(edges, storage_cls=RevisionStorage) -> float:
+    started = time.perf_counter()
+    storage_cls.from_edges(edges)
+    return time.perf_counter() - started
+
+
+def memory_per_revision(edges, storage_cls) -> float:
+    tracemalloc.start()
+    storage = storage_cls.from_edges(edges)
+    storage.find_first_multiparent()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return allocated / len(edges)
+
+
+def time_last_descendant(edges, storage_cls) -> float:
+    storage = storage_cls.from_edges(edges)
+    storage.find_first_multiparent()
+    started = time.perf_counter()
+    storage._get_last_descendant(storage.root_revision)
+    return time.perf_counter() - started
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="time RevisionStorage graph building"
+    )
+    parser.add_argument("--revisions", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def main():
+    inputs = parse_args()
+    edges = linear_edges(inputs.revisions)
+    shuffled = edges[:]
+    random.Random(inputs.seed).shuffle(shuffled)
+    print(f"add, topological order: {time_incremental(edges):.3f}s")
+    print(f"add, shuffled order:    {time_incremental(shuffled):.3f}s")
+    print(f"from_edges, shuffled:   {time_from_edges(shuffled):.3f}s")
+    for storage_cls in (RevisionStorage, CompactRevisionStorage):
+        name = storage_cls.__name__
+        print(
+            f"{name}: from_edges {time_from_edges(shuffled, storage_cls):.3f}s, "
+            f"{memory_per_revision(shuffled, storage_cls):.0f} bytes/revision, "
+            f"last descendant walk {time_last_descendant(edges, storage_cls):.3f}s"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+from .generator import SHAPES, MigrationTreeSpec, generate_migration_tree
+
+
+def time_process(command: List[str], repeats: int) -> float:
+    # Whole process wall time: interpreter startup, imports and the run.
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def count_imports(command: List[str]) -> int:
+    importtime = subprocess.run(
+        [sys.executable, "-X", "importtime", *command[1:]],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    ).stderr
+    # The first line is the table header.
+    return importtime.count("import time:") - 1
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="time migxer processes the way pre-commit runs them"
+    )
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--shape", choices=SHAPES, default="linear")
+    parser.add_argument("--repeats", type=int, default=10)
+    return parser.parse_args()
+
+
+def main():
+    inputs = parse_args()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        generate_migration_tree(temp_dir, MigrationTreeSpec(
+            count=inputs.files, shape=inputs.shape
+        ))
+        main_command = [sys.executable, "-m", "src.main", "--rev_dir", temp_dir]
+        commands = {
+            "interpreter": [sys.executable, "-c", "pass"],
+            "check": [*main_command, "--check"],
+        }
+        if inputs.shape == "linear":
+            # Nothing to fix, so the full run leaves the tree as it is.
+            commands["full"] = main_command
+        for name, command in commands.items():
+            elapsed = time_process(command, inputs.repeats)
+            print(
+                f"{name:>12}: {elapsed * 1e3:.1f}ms, "
+                f"{count_imports(command)} modules imported"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+import argparse
+import os
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from src.revision_storage import OrderingStrategy, RevisionItem
+
+
+SHAPES = ("linear", "deep", "many_heads", "wide")
+
+MIGRATION_TEMPLATE = '''"""{message}
+
+Revision ID: {revision}
+Revises: {down_revision_header}
+Create Date: {create_date}
+
+"""
+from alembic import op  # noqa
+import sqlalchemy as sa  # noqa
+
+# revision identifiers, used by Alembic.
+revision = '{revision}'
+down_revision = {down_revision_literal}
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+{upgrade_body}
+
+
+def downgrade():
+{downgrade_body}
+'''
+
+UPGRADE_LINE = (
+    "    op.add_column('table_{index}', sa.Column('column_{line}', "
+    "sa.String(length=255), nullable=True))"
+)
+DOWNGRADE_LINE = "    op.drop_column('table_{index}', 'column_{line}')"
+
+Edge = Tuple[str, Optional[str]]
+
+
+class RevisionIdOrdering(OrderingStrategy):
+    # Trees built from bare edges have no dates, their ids are unique and
+    # stable.
+    describes = "revision id"
+
+    def key(self, revision_item: RevisionItem) -> str:
+        return revision_item.revision
+
+
+@dataclass
+class MigrationTreeSpec:
+    count: int
+    shape: str = "linear"
+    heads: int = 2
+    body_lines: int = 0
+    seed: int = 0
+
+
+class MigrationTreeGenerator:
+    # Shapes:
+    #   linear      one chain, nothing to fix
+    #   deep        one chain with a 2-way fork at its very top
+    #   many_heads  a trunk with ``heads`` branches forking from one point,
+    #               like a long-lived release branch merged back
+    #   wide        ``heads`` branches forking from random trunk positions
+    START_DATE = datetime(2020, 1, 1)
+
+    def __init__(self, spec: MigrationTreeSpec):
+        if spec.shape not in SHAPES:
+            raise AttributeError(f"Unknown tree shape {spec.shape}")
+        self.spec = spec
+        self.rng = random.Random(spec.seed)
+
+    def edges(self) -> List[Edge]:
+        count, heads = self.spec.count, self.spec.heads
+        revisions = self._revision_ids(count)
+        if self.spec.shape == "linear":
+            forks = []
+        elif self.spec.shape == "deep":
+            forks = [(count - 1, count - 3)] if count > 2 else []
+        elif self.spec.shape == "many_heads":
+            forks = self._many_heads_forks(count, heads)
+        else:
+            forks = self._wide_forks(count, heads)
+
+        edges = [(revisions[0], None)]
+        branch_starts = {start: parent for start, parent in forks}
+        for index in range(1, count):
+            parent = branch_starts.get(index, index - 1)
+            edges.append((revisions[index], revisions[parent]))
+        return edges
+
+    def _revision_ids(self, count: int) -> List[str]:
+        revisions = set()
+        while len(revisions) < count:
+            revisions.add(f"{self.rng.getrandbits(48):012x}")
+        revisions = sorted(revisions)
+        self.rng.shuffle(revisions)
+        return revisions
+
+    @staticmethod
+    def _many_heads_forks(count: int, heads: int) -> List[Tuple[int, int]]:
+        # The last ``heads`` segments of the list all start from the same
+        # trunk revision.
+        branch_length = max(1, count // (4 * heads))
+        fork_point = count - heads * branch_length - 1
+        if fork_point < 0:
+            return []
+        return [
+            (fork_point + 1 + branch * branch_length, fork_point)
+            for branch in range(1, heads)
+        ]
+
+    def _wide_forks(self, count: int, heads: int) -> List[Tuple[int, int]]:
+        if count < 4:
+            return []
+        starts = sorted(self.rng.sample(range(2, count), min(heads - 1, count - 2)))
+        return [(start, self.rng.randrange(0, start - 1)) for start in starts]
+
+    def write(self, dir_name: str) -> List[Edge]:
+        edges = self.edges()
+        for index, (revision, down_revision) in enumerate(edges):
+            filepath = os.path.join(dir_name, f"{revision}_migration_{index}.py")
+            with open(filepath, "w") as migration_file:
+                migration_file.write(
+                    self.render(index, revision, down_revision)
+                )
+        return edges
+
+    def render(
+        self, index: int, revision: str, down_revision: Optional[str]
+    ) -> str:
+        create_date = self.START_DATE + timedelta(minutes=index)
+        body_lines = self.spec.body_lines
+        upgrade_body = "\n".join(
+            UPGRADE_LINE.format(index=index, line=line)
+            for line in range(body_lines)
+        ) or "    pass"
+        downgrade_body = "\n".join(
+            DOWNGRADE_LINE.format(index=index, line=line)
+            for line in range(body_lines)
+        ) or "    pass"
+        return MIGRATION_TEMPLATE.format(
+            message=f"Generated migration {index}",
+            revision=revision,
+            down_revision_header=down_revision or "",
+            down_revision_literal=repr(down_revision),
+            create_date=create_date.strftime("%Y-%m-%d %H:%M:%S.%f"),
+            upgrade_body=upgrade_body,
+            downgrade_body=downgrade_body,
+        )
+
+
+def generate_migration_tree(dir_name: str, spec: MigrationTreeSpec) -> List[Edge]:
+    return MigrationTreeGenerator(spec).write(dir_name)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="write a synthetic alembic migrations tree"
+    )
+    parser.add_argument("dir_name")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--shape", choices=SHAPES, default="linear")
+    parser.add_argument("--heads", type=int, default=2)
+    parser.add_argument("--body_lines", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def main():
+    inputs = parse_args()
+    os.makedirs(inputs.dir_name, exist_ok=True)
+    spec = MigrationTreeSpec(
+        count=inputs.count, shape=inputs.shape, heads=inputs.heads,
+        body_lines=inputs.body_lines, seed=inputs.seed,
+    )
+    generate_migration_tree(inputs.dir_name, spec)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,3 @@
+from .batch_runner import BatchRunner, DirectoryReport
+
+__all__ = ["BatchRunner", "DirectoryReport"]
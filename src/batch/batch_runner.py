@@ -0,0 +1,177 @@
+import glob
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from src.fileparser import (
+    MigrationFileParser, MigrationsParser, parse_files_concurrently
+)
+from src.parse_cache import ParseCache
+from src.revision_storage import RevisionItem
+from src.revision_storage.migxer_revision_storage import (
+    FixIsImpossible, ParentNotFoundException, RevisionsCycleException
+)
+from src.stats import EventHook, HookEmitter
+
+
+@dataclass
+class DirectoryReport:
+    directory: str
+    files: int = 0
+    revisions: int = 0
+    # Heads once the fix, if any, is written.
+    heads: List[str] = field(default_factory=list)
+    multiparent: Optional[str] = None
+    files_written: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def has_conflict(self) -> bool:
+        return self.multiparent is not None
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+@dataclass
+class BatchRunner(HookEmitter):
+    # Checks or fixes many migration directories in one process. Files of
+    # every directory go through one parse cache lookup and one worker pool,
+    # so the pool stays busy across directories instead of draining at the
+    # end of each small one. Storages are still built and fixed separately.
+    directories: List[str]
+    fix: bool = True
+    recursive: bool = False
+    engine: str = "scanner"
+    jobs: int = 1
+    pool: str = "process"
+    parse_cache: Optional[ParseCache] = None
+    hooks: List[EventHook] = field(default_factory=list)
+
+    # A broken file fails its own directory only.
+    PARSE_ERRORS = (SyntaxError, ValueError, UnicodeDecodeError, OSError)
+
+    def __post_init__(self):
+        if self.pool not in MigrationsParser.POOLS:
+            raise AttributeError(f"Unknown worker pool {self.pool}")
+
+    @staticmethod
+    def expand_directories(patterns: List[str]) -> List[str]:
+        # Directories and globs, in the given order, each directory once.
+        directories: Dict[str, str] = {}
+        for pattern in patterns:
+            for path in sorted(glob.glob(pattern)) or [pattern]:
+                directories.setdefault(os.path.realpath(path), path)
+        return list(directories.values())
+
+    def run(self) -> List[DirectoryReport]:
+        parsers = {
+            directory: MigrationsParser(
+                # Directories come from the batch, not from the environment.
+                _dir_env_varname="",
+                _dir_name=directory,
+                _recursive=self.recursive,
+                _engine=self.engine,
+                _autoload=False,
+            )
+            for directory in self.directories
+        }
+        reports = {
+            directory: DirectoryReport(directory)
+            for directory in self.directories
+        }
+        with self._measure_phase("discovery"):
+            for directory, parser in parsers.items():
+                if not os.path.isdir(directory):
+                    reports[directory].error = "not a directory"
+                    continue
+                try:
+                    parser.files.extend(parser.discovery.files())
+                except OSError as exc:
+                    reports[directory].error = _describe(exc)
+                    continue
+                reports[directory].files = len(parser.files)
+        files = [file for parser in parsers.values() for file in parser.files]
+        self._emit("files_scanned", count=len(files))
+
+        with self._measure_phase("parsing"):
+            revision_items, errors = self._parse(files)
+
+        for directory, parser in parsers.items():
+            report = reports[directory]
+            if report.error is None:
+                report.error = next(
+                    (
+                        f"{file}: {errors[file]}"
+                        for file in parser.files if file in errors
+                    ),
+                    None,
+                )
+            if report.error is None:
+                self._finish(parser, revision_items, report)
+        return list(reports.values())
+
+    def _parse(
+        self, files: List[str]
+    ) -> Tuple[Dict[str, RevisionItem], Dict[str, str]]:
+        # Returns the items and the errors by file.
+        files_to_parse = files
+        revision_items = {}
+        if self.parse_cache is not None:
+            revision_items, files_to_parse = self.parse_cache.lookup(files)
+            self._emit("cache", **self.parse_cache.stats)
+
+        file_parser = MigrationFileParser(self.engine)
+        errors = {}
+        try:
+            parsed_items = parse_files_concurrently(
+                file_parser, files_to_parse, self.jobs, self.pool
+            )
+        except self.PARSE_ERRORS:
+            # The pool gives up on the first bad file, so every file is
+            # parsed again on its own to tell the good ones apart.
+            parsed_items, errors = self._parse_one_by_one(
+                file_parser, files_to_parse
+            )
+        self._emit(
+            "files_parsed", count=len(files_to_parse), **file_parser.counters
+        )
+        if self.parse_cache is not None:
+            self.parse_cache.store(parsed_items)
+        for revision_item in parsed_items:
+            revision_items[revision_item.original_filepath] = revision_item
+        return revision_items, errors
+
+    def _parse_one_by_one(
+        self, file_parser: MigrationFileParser, files: List[str]
+    ) -> Tuple[List[RevisionItem], Dict[str, str]]:
+        parsed_items = []
+        errors = {}
+        for file in files:
+            try:
+                parsed_items.append(file_parser.to_revision_item(file))
+            except self.PARSE_ERRORS as exc:
+                errors[file] = _describe(exc)
+        return parsed_items, errors
+
+    def _finish(self, parser: MigrationsParser, revision_items, report):
+        storage = parser.revisions_storage
+        try:
+            with self._measure_phase("graph_build"):
+                for file in parser.files:
+                    storage.add(revision_items[file])
+            report.revisions = len(storage)
+            report.multiparent = storage.find_first_multiparent()
+            if self.fix and report.has_conflict:
+                storage.fix_revision_conflict()
+                report.files_written = storage.wtite_fix_to_file()
+            report.heads = storage.heads()
+        except (
+            FixIsImpossible, ParentNotFoundException, RevisionsCycleException,
+            OSError,
+        ) as exc:
+            report.error = _describe(exc)
+
+
+def _describe(exc: Exception) -> str:
+    return f"{type(exc).__name__}: {exc}"
@@ -0,0 +1,3 @@
+from .heads_check import HeadsCheck
+
+__all__ = ["HeadsCheck"]
@@ -0,0 +1,80 @@
+from src.migration_files import header_grammar, walk_files
+
+
+# Runs from pre-commit on every commit, so it only imports the os and re
+# based src.migration_files: no typing, dataclasses or datetime, and ast
+# only for the headers the line grammar can't read.
+class HeadsCheck:
+    # Counts heads as "revisions minus every down_revision" from streamed
+    # (revision, down_revision) pairs, without RevisionItems, dates or the
+    # children graph.
+    _PAIR_TARGET_IDS = (
+        header_grammar.REVISION_TARGET_ID,
+        header_grammar.DOWN_REVISION_TARGET_ID,
+    )
+
+    def __init__(
+        self, locations: list, files_extension: str = ".py",
+        recursive: bool = False
+    ):
+        self.locations = list(dict.fromkeys(locations))
+        self.files_extension = files_extension
+        self.recursive = recursive
+        self.files_checked = 0
+        self.fallbacks = 0
+
+    def heads(self) -> list:
+        revisions = {}
+        parents = set()
+        for filepath in self.files():
+            self.files_checked += 1
+            revision, down_revisions = self._read_revision_pair(filepath)
+            if revision is None:
+                continue
+            revisions[revision] = None
+            parents.update(down_revisions)
+        return [revision for revision in revisions if revision not in parents]
+
+    def files(self):
+        return walk_files(self.locations, self.files_extension, self.recursive)
+
+    def _read_revision_pair(self, filepath: str) -> tuple:
+        values = {}
+        with open(filepath, "rb") as migration_file:
+            for raw_line in migration_file:
+                line = raw_line.decode()
+                if line.startswith(header_grammar.BODY_START_PREFIXES):
+                    break
+                match = header_grammar.ASSIGNMENT_RE.match(line)
+                if not match:
+                    continue
+                target_id, raw_value = match.groups()
+                if target_id not in self._PAIR_TARGET_IDS or target_id in values:
+                    continue
+                value = header_grammar.parse_value(raw_value)
+                if value is header_grammar.UNSUPPORTED:
+                    break
+                values[target_id] = value
+                if len(values) == 2:
+                    return self._to_pair(
+                        values[header_grammar.REVISION_TARGET_ID],
+                        values[header_grammar.DOWN_REVISION_TARGET_ID],
+                    )
+        return self._visit_revision_pair(filepath)
+
+    def _visit_revision_pair(self, filepath: str) -> tuple:
+        from src.visitor import MigxerVisitor
+
+        self.fallbacks += 1
+        visitor = MigxerVisitor(filepath)
+        return self._to_pair(
+            visitor.revision_value, visitor.down_revision_value
+        )
+
+    @staticmethod
+    def _to_pair(revision, down_revision) -> tuple:
+        if down_revision is None:
+            return revision, ()
+        if isinstance(down_revision, str):
+            return revision, (down_revision,)
+        return revision, tuple(down_revision)
@@ -0,0 +1,3 @@
+from .discovery import FileStamp, MigrationsDiscovery
+
+__all__ = ["FileStamp", "MigrationsDiscovery"]
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import subprocess
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.migration_files import EXCLUDED_DIRS, scan_directory
+
+
+FileStamp = Tuple[int, int]
+_DirectoryListing = Tuple[List[Tuple[str, Optional[FileStamp]]], List[str]]
+
+
+@dataclass
+class MigrationsDiscovery:
+    # Finds migration files in several version locations, optionally
+    # recursing into subdirectories (like alembic's version_locations and
+    # recursive_version_locations). Every directory is read with a single
+    # scandir pass and directories are read concurrently, which matters on
+    # network filesystems where each round trip is slow. Files come out in a
+    # stable order: locations as given, then names sorted within a directory
+    # before the files of its subdirectories.
+    locations: Sequence[str] = field(default_factory=list)
+    files_extension: str = ".py"
+    recursive: bool = False
+    max_workers: int = 8
+
+    EXCLUDED_DIRS = EXCLUDED_DIRS
+
+    def files(self) -> List[str]:
+        return [filepath for filepath, _ in self._discover(with_stamps=False)]
+
+    def stamps(self) -> Dict[str, FileStamp]:
+        return dict(self._discover(with_stamps=True))
+
+    def fingerprint(self, stamps: Optional[Dict[str, FileStamp]] = None) -> bytes:
+        # Digest of the listing with mtimes and sizes: any added, removed or
+        # rewritten migration changes it.
+        if stamps is None:
+            stamps = self.stamps()
+        digest = hashlib.blake2b(digest_size=16)
+        for filepath, (mtime_ns, size) in sorted(stamps.items()):
+            digest.update(f"{filepath}\0{mtime_ns}\0{size}\n".encode())
+        return digest.digest()
+
+    def git_fingerprint(self) -> bytes:
+        # Survives a fresh checkout, where every mtime is new: the index
+        # blob ids of tracked files plus the stamps of modified and
+        # untracked files. Falls back to the stat fingerprint outside a git
+        # work tree or without git.
+        try:
+            return self._git_fingerprint()
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            return self.fingerprint()
+
+    def _git_fingerprint(self) -> bytes:
+        # Migrations only: a parse cache or a snapshot saved next to them
+        # changes on every run.
+        pathspec = "*" + self.files_extension
+        digest = hashlib.blake2b(digest_size=16)
+        for location in dict.fromkeys(self.locations):
+            digest.update(
+                self._git(location, "ls-files", "-s", "-z", "--", pathspec)
+            )
+            changed = self._git(
+                location, "ls-files", "-z", "--modified", "--deleted",
+                "--others", "--exclude-standard", "--", pathspec
+            )
+            digest.update(changed)
+            for entry in filter(None, changed.split(b"\0")):
+                path = os.path.join(location, os.fsdecode(entry))
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                digest.update(f"{stat.st_mtime_ns}\0{stat.st_size}\n".encode())
+        return digest.digest()
+
+    @staticmethod
+    def _git(location: str, *args: str) -> bytes:
+        return subprocess.run(
+            ["git", "-C", location, *args], capture_output=True, check=True
+        ).stdout
+
+    def _discover(
+        self, with_stamps: bool
+    ) -> List[Tuple[str, Optional[FileStamp]]]:
+        locations = list(dict.fromkeys(self.locations))
+        if not self.recursive and len(locations) == 1:
+            files, _ = self._scan_directory(locations[0], with_stamps)
+            return files
+
+        listings = self._scan_directories(locations, with_stamps)
+        discovered = []
+        pending = list(reversed(locations))
+        while pending:
+            files, subdirs = listings[pending.pop()]
+            discovered.extend(files)
+            pending.extend(reversed(subdirs))
+        return discovered
+
+    def _scan_directories(
+        self, locations: List[str], with_stamps: bool
+    ) -> Dict[str, _DirectoryListing]:
+        listings: Dict[str, _DirectoryListing] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {
+                pool.submit(self._scan_directory, location, with_stamps):
+                location
+                for location in locations
+            }
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    dir_path = futures.pop(future)
+                    files, subdirs = future.result()
+                    listings[dir_path] = (files, subdirs)
+                    for subdir in subdirs:
+                        futures[pool.submit(
+                            self._scan_directory, subdir, with_stamps
+                        )] = subdir
+        return listings
+
+    def _scan_directory(
+        self, dir_path: str, with_stamps: bool
+    ) -> _DirectoryListing:
+        return scan_directory(
+            dir_path, self.files_extension, self.recursive, with_stamps,
+            self.EXCLUDED_DIRS
+        )
@@ -1,3 +1,4 @@
 from .fileparser import MigrationsParser
+from .migration_file_parser import MigrationFileParser, parse_files_concurrently
 
-__all__ = ["MigrationsParser",]
+__all__ = ["MigrationFileParser", "MigrationsParser", "parse_files_concurrently",]
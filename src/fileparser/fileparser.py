@@ -1,62 +1,304 @@
+import asyncio
 import os
 from dataclasses import dataclass, field
-from datetime import datetime
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
-from src.visitor import MigxerVisitor
-from src.revision_storage import RevisionItem, RevisionStorage
+from src.discovery import MigrationsDiscovery
+from src.parse_cache import ParseCache
+from src.revision_storage import (
+    RevisionItem, RevisionStorage, SnapshotError, load_snapshot
+)
+from src.stats import EventHook, HookEmitter
+from src.writer import SourceCache
+
+from .migration_file_parser import (
+    POOLS, MigrationFileParser, parse_files_chunk, parse_files_concurrently
+)
 
 
 @dataclass
-class MigrationsParser:
+class MigrationsParser(HookEmitter):
     _dir_env_varname: str = "MIGRATIONS_DIR"
     _files_extension: str = ".py"
     _dir_name: str = ""
+    _version_locations: List[str] = field(default_factory=list)
+    _recursive: bool = False
+    _engine: str = "scanner"
+    _jobs: int = 1
+    _pool: str = "process"
+    _use_cache: bool = False
+    _cache_max_entries: int = ParseCache.DEFAULT_MAX_ENTRIES
+    _parse_cache: Optional[ParseCache] = None
+    _snapshot_path: Optional[str] = None
+    _snapshot_fingerprint: str = "stat"
+    # Keeps the sources of the files a fix may rewrite, read once the graph
+    # is built, so writing reads none of them again.
+    _source_cache: Optional[SourceCache] = None
+    _autoload: bool = True
     files: List[str] = field(default_factory=list)
     revisions_storage: RevisionStorage = field(default_factory=RevisionStorage)
+    hooks: List[EventHook] = field(default_factory=list)
 
-    NUM_LINES_TO_READ_FOR_DATE: int = 10
-    MIGRATION_DATE_PREFIX: str = "Create Date"
-    MIGRATION_DATE_SPLIT_CHAR: str = "."
-    MIGRATION_DATETIME_FMT: str = "%Y-%m-%d %H:%M:%S"
+    ENGINES = MigrationFileParser.ENGINES
+    POOLS = POOLS
+    SNAPSHOT_FINGERPRINTS = ("stat", "git")
+    DEFAULT_CONCURRENCY: int = 8
+    ASYNC_CHUNK_SIZE: int = 64
 
     def __post_init__(self):
-        self._set_migration_files()
+        self.file_parser = MigrationFileParser(self._engine)
+        if self._pool not in self.POOLS:
+            raise AttributeError(f"Unknown worker pool {self._pool}")
+        if self._snapshot_fingerprint not in self.SNAPSHOT_FINGERPRINTS:
+            raise AttributeError(
+                f"Unknown snapshot fingerprint {self._snapshot_fingerprint}"
+            )
+        self.snapshot_used = False
+        if self._autoload:
+            self.load()
+
+    def load(self):
+        if self._snapshot_path is not None:
+            self._load_with_snapshot()
+            return
+        with self._measure_phase("discovery"):
+            self._set_migration_files()
+        self._emit("files_scanned", count=len(self.files))
+        self._set_revision_items()
+
+    def _load_with_snapshot(self):
+        # A snapshot saved for the same listing replaces parsing; otherwise
+        # the migrations are parsed and the snapshot is saved again.
+        fingerprint = self._discover_with_fingerprint()
+        if self._load_snapshot(fingerprint):
+            return
         self._set_revision_items()
+        self.revisions_storage.save_snapshot(self._snapshot_path, fingerprint)
+
+    def _discover_with_fingerprint(self) -> bytes:
+        with self._measure_phase("discovery"):
+            discovery = self.discovery
+            stamps = discovery.stamps()
+            self.files.extend(stamps)
+            if self._snapshot_fingerprint == "git":
+                fingerprint = discovery.git_fingerprint()
+            else:
+                fingerprint = discovery.fingerprint(stamps)
+        self._emit("files_scanned", count=len(self.files))
+        return fingerprint
+
+    def _load_snapshot(self, fingerprint: bytes) -> bool:
+        try:
+            with self._measure_phase("snapshot"):
+                edges = load_snapshot(self._snapshot_path, fingerprint)
+        except (OSError, SnapshotError):
+            return False
+
+        self.snapshot_used = True
+        with self._measure_phase("graph_build"):
+            for edge in edges:
+                self.revisions_storage.add(None, *edge)
+        self._emit_graph()
+        return True
+
+    @classmethod
+    async def aload(
+        cls, dir_name: str = "", concurrency: int = DEFAULT_CONCURRENCY,
+        **kwargs
+    ) -> 'MigrationsParser':
+        # Same result as MigrationsParser(...), but every blocking step runs
+        # in a worker thread, so the event loop stays free. Files are parsed
+        # by up to `concurrency` threads instead of a _jobs sized pool.
+        for option in ("_jobs", "_pool"):
+            if option in kwargs:
+                raise AttributeError(
+                    f"{option} is not used by aload, pass concurrency instead"
+                )
+        parser = cls(_dir_name=dir_name, _autoload=False, **kwargs)
+        await parser.async_load(concurrency)
+        return parser
+
+    async def async_load(self, concurrency: int = DEFAULT_CONCURRENCY):
+        if self._snapshot_path is not None:
+            await self._async_load_with_snapshot(concurrency)
+            return
+        with self._measure_phase("discovery"):
+            self.files.extend(await asyncio.to_thread(self.discovery.files))
+        self._emit("files_scanned", count=len(self.files))
+        await self._async_set_revision_items(concurrency)
+
+    async def _async_load_with_snapshot(self, concurrency: int):
+        fingerprint = await asyncio.to_thread(self._discover_with_fingerprint)
+        if await asyncio.to_thread(self._load_snapshot, fingerprint):
+            return
+        await self._async_set_revision_items(concurrency)
+        await asyncio.to_thread(
+            self.revisions_storage.save_snapshot, self._snapshot_path,
+            fingerprint
+        )
+
+    async def _async_set_revision_items(self, concurrency: int):
+        parse_cache = await asyncio.to_thread(self._open_parse_cache)
+        try:
+            with self._measure_phase("parsing"):
+                revision_items = await self._async_load_revision_items(
+                    parse_cache, concurrency
+                )
+        finally:
+            await asyncio.to_thread(self._close_parse_cache, parse_cache)
+        await asyncio.to_thread(self._build_storage, revision_items)
+
+    @property
+    def migration_locations(self) -> List[str]:
+        # The environment variable may list several locations, separated
+        # like PATH.
+        env_locations = os.environ.get(self._dir_env_varname)
+        if env_locations:
+            return [
+                location for location in env_locations.split(os.pathsep)
+                if location
+            ]
+        return [
+            location for location in [self._dir_name, *self._version_locations]
+            if location
+        ]
+
+    @property
+    def migrations_dir(self) -> str:
+        return self.migration_locations[0]
+
+    @property
+    def discovery(self) -> MigrationsDiscovery:
+        return MigrationsDiscovery(
+            self.migration_locations, self._files_extension, self._recursive
+        )
 
     def _set_migration_files(self):
-        mig_dir = os.environ.get(self._dir_env_varname) or self._dir_name
-        for filename in os.listdir(mig_dir):
-            if filename.endswith(self._files_extension):
-                migration_path = mig_dir + filename
-                self.files.append(migration_path)
+        self.files.extend(self.discovery.files())
 
     def _set_revision_items(self):
-        for file in self.files:
-            self.revisions_storage.add(
-                self._migration_file_to_revision_item(file)
+        parse_cache = self._open_parse_cache()
+        try:
+            with self._measure_phase("parsing"):
+                revision_items = self._load_revision_items(parse_cache)
+        finally:
+            self._close_parse_cache(parse_cache)
+        self._build_storage(revision_items)
+
+    def _open_parse_cache(self) -> Optional[ParseCache]:
+        if self._parse_cache is None and self._use_cache:
+            return ParseCache.for_directory(
+                self.migrations_dir, self._cache_max_entries
+            )
+        return self._parse_cache
+
+    def _close_parse_cache(self, parse_cache: Optional[ParseCache]):
+        if parse_cache is None:
+            return
+        self.cache_stats = parse_cache.stats
+        if parse_cache is not self._parse_cache:
+            parse_cache.close()
+        self._emit("cache", **self.cache_stats)
+
+    def _build_storage(self, revision_items: Dict[str, RevisionItem]):
+        with self._measure_phase("graph_build"):
+            for file in self.files:
+                self.revisions_storage.add(revision_items[file])
+        if self._source_cache is not None:
+            self._keep_rewritable_sources()
+        self._emit_graph()
+
+    def _keep_rewritable_sources(self):
+        # Fixes only move the children of branch points, every other file is
+        # only ever read up to its header.
+        storage = self.revisions_storage
+        storage.source_cache = self._source_cache
+        filepaths = [
+            storage[child].original_filepath
+            for item in storage.values() if len(item.children) > 1
+            for child in item.children
+        ]
+        self._source_cache.retain(filepaths)
+        counters = self.file_parser.counters
+        kept = 0
+        for filepath in filepaths:
+            if filepath is not None and filepath not in self._source_cache:
+                self.file_parser.keep_source(filepath, self._source_cache)
+                kept += 1
+        self._emit(
+            "sources_kept", count=kept,
+            bytes_read=self.file_parser.counters_since(counters)["bytes_read"]
+        )
+
+    def _emit_graph(self):
+        if self.hooks:
+            storage = self.revisions_storage
+            self._emit("orphans", count=len(storage.orphans))
+            self._emit("graph", revisions=len(storage), depth=storage.graph_depth())
+
+    def _load_revision_items(self, parse_cache: Optional[ParseCache]):
+        files_to_parse = self.files
+        revision_items = {}
+        if parse_cache is not None:
+            revision_items, files_to_parse = parse_cache.lookup(self.files)
+
+        counters = self.file_parser.counters
+        parsed_items = self._parse_files(files_to_parse)
+        self._emit(
+            "files_parsed", count=len(files_to_parse),
+            **self.file_parser.counters_since(counters)
+        )
+        if parse_cache is not None:
+            parse_cache.store(parsed_items)
+        for revision_item in parsed_items:
+            revision_items[revision_item.original_filepath] = revision_item
+        return revision_items
+
+    async def _async_load_revision_items(
+        self, parse_cache: Optional[ParseCache], concurrency: int
+    ) -> Dict[str, RevisionItem]:
+        files_to_parse = self.files
+        revision_items = {}
+        if parse_cache is not None:
+            revision_items, files_to_parse = await asyncio.to_thread(
+                parse_cache.lookup, self.files
+            )
+
+        semaphore = asyncio.Semaphore(concurrency)
+        chunk_size = self.ASYNC_CHUNK_SIZE
+        chunks = [
+            files_to_parse[start:start + chunk_size]
+            for start in range(0, len(files_to_parse), chunk_size)
+        ]
+        chunks_results = await asyncio.gather(*(
+            self._async_parse_chunk(semaphore, chunk) for chunk in chunks
+        ))
+        parsed_items = []
+        counters = self.file_parser.counters
+        for chunk_items, chunk_counters in chunks_results:
+            parsed_items.extend(chunk_items)
+            self.file_parser.merge_counters(chunk_counters)
+        self._emit(
+            "files_parsed", count=len(files_to_parse),
+            **self.file_parser.counters_since(counters)
+        )
+        if parse_cache is not None:
+            await asyncio.to_thread(parse_cache.store, parsed_items)
+        for revision_item in parsed_items:
+            revision_items[revision_item.original_filepath] = revision_item
+        return revision_items
+
+    async def _async_parse_chunk(
+        self, semaphore: asyncio.Semaphore, files: List[str]
+    ) -> Tuple[List[RevisionItem], Dict[str, int]]:
+        # Every chunk gets its own MigrationFileParser, so counters are
+        # merged on the loop thread only.
+        async with semaphore:
+            return await asyncio.to_thread(
+                parse_files_chunk, self._engine, files
             )
 
-    def _migration_file_to_revision_item(self, filepath: str) -> RevisionItem:
-        visitor = MigxerVisitor(filepath)
-        rev_item = RevisionItem(
-            original_filepath=filepath,
-            revision=visitor.revision_value,
-            parent_revision=visitor.down_revision_value,
-            revision_date=self._extract_datetime_from_comment(filepath),
+    def _parse_files(self, files: List[str]) -> List[RevisionItem]:
+        return parse_files_concurrently(
+            self.file_parser, files, self._jobs, self._pool
         )
-        return rev_item
-
-    def _extract_datetime_from_comment(self, filepath: str) -> datetime:
-        with open(filepath, "r") as file:
-            for _ in range(self.NUM_LINES_TO_READ_FOR_DATE):
-                line = next(file)
-                if line.startswith(self.MIGRATION_DATE_PREFIX):
-                    return self._cut_datetime_from_line(line)
-
-    def _cut_datetime_from_line(self, line) -> datetime:
-        date_substring_shift = len(self.MIGRATION_DATE_PREFIX) + 2
-        date_string = line[date_substring_shift:-1]
-        date_string = date_string.split(self.MIGRATION_DATE_SPLIT_CHAR)[0]
-        _datetime = datetime.strptime(date_string, self.MIGRATION_DATETIME_FMT)
-        return _datetime
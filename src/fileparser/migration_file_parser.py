@@ -0,0 +1,172 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Dict, List, Tuple
+
+from src.scanner import (
+    HeaderScanner, HeaderScanResult, LazyDate, MmapHeaderExtractor, ScanFailed
+)
+from src.visitor import MigxerVisitor
+from src.revision_storage import RevisionItem
+from src.writer import SourceCache
+
+
+POOLS = {"process": ProcessPoolExecutor, "thread": ThreadPoolExecutor}
+CHUNKS_PER_JOB = 4
+
+
+@dataclass
+class MigrationFileParser:
+    engine: str = "scanner"
+    bytes_read: int = field(default=0, init=False)
+    fallbacks: int = field(default=0, init=False)
+
+    NUM_LINES_TO_READ_FOR_DATE: int = 10
+    MIGRATION_DATE_PREFIX: str = "Create Date"
+
+    ENGINES = ("scanner", "mmap", "ast")
+    SCANNERS = {"scanner": HeaderScanner, "mmap": MmapHeaderExtractor}
+
+    def __post_init__(self):
+        if self.engine not in self.ENGINES:
+            raise AttributeError(f"Unknown parse engine {self.engine}")
+
+    def parse_files(self, filepaths: List[str]) -> List[RevisionItem]:
+        return [self.to_revision_item(filepath) for filepath in filepaths]
+
+    @property
+    def counters(self) -> Dict[str, int]:
+        return {"bytes_read": self.bytes_read, "fallbacks": self.fallbacks}
+
+    def counters_since(self, counters: Dict[str, int]) -> Dict[str, int]:
+        # What was counted after ``counters`` was taken, so events of a
+        # reused parser are not counted twice.
+        return {
+            name: value - counters[name] for name, value in self.counters.items()
+        }
+
+    def merge_counters(self, counters: Dict[str, int]):
+        self.bytes_read += counters["bytes_read"]
+        self.fallbacks += counters["fallbacks"]
+
+    def to_revision_item(self, filepath: str) -> RevisionItem:
+        if self.engine in self.SCANNERS:
+            return self._scan_migration_file(filepath)
+        self.bytes_read += os.path.getsize(filepath)
+        visitor = MigxerVisitor(filepath)
+        rev_item = RevisionItem(
+            original_filepath=filepath,
+            revision=visitor.revision_value,
+            parent_revision=visitor.down_revision_value,
+            revision_date=LazyDate(filepath),
+            depends_on=visitor.depends_on_value,
+        )
+        return rev_item
+
+    def source_to_revision_item(
+        self, filepath: str, source: bytes
+    ) -> RevisionItem:
+        # For sources that are not files on disk, like git blobs, so the date
+        # is never read again from ``filepath``.
+        self.bytes_read += len(source)
+        try:
+            scanned = MmapHeaderExtractor(filepath).scan_buffer(source)
+        except ScanFailed as exc:
+            self.fallbacks += 1
+            return self._visit_migration_source(filepath, exc.source)
+        revision_date = None
+        if scanned.date_line is not None:
+            revision_date = LazyDate(filepath, scanned.date_line)
+        return RevisionItem(
+            original_filepath=filepath,
+            revision=scanned.revision,
+            parent_revision=scanned.down_revision,
+            revision_date=revision_date,
+            depends_on=scanned.depends_on,
+        )
+
+    def keep_source(self, filepath: str, source_cache: SourceCache):
+        # The whole source of a file a fix will rewrite, so writing reads it
+        # from memory. Parsing itself only reads headers.
+        with open(filepath, "rb") as migration_file:
+            stat = os.fstat(migration_file.fileno())
+            source = migration_file.read()
+        self.bytes_read += len(source)
+        source_cache.put(filepath, source, stat)
+
+    def _scan_migration_file(self, filepath: str) -> RevisionItem:
+        try:
+            scanned = self.SCANNERS[self.engine](filepath).scan()
+        except ScanFailed as exc:
+            self.fallbacks += 1
+            self.bytes_read += len(exc.source.encode())
+            return self._visit_migration_source(filepath, exc.source)
+        self.bytes_read += scanned.bytes_read
+        return self._scanned_to_revision_item(filepath, scanned)
+
+    @staticmethod
+    def _scanned_to_revision_item(
+        filepath: str, scanned: HeaderScanResult
+    ) -> RevisionItem:
+        return RevisionItem(
+            original_filepath=filepath,
+            revision=scanned.revision,
+            parent_revision=scanned.down_revision,
+            revision_date=LazyDate(filepath, scanned.date_line),
+            depends_on=scanned.depends_on,
+        )
+
+    def _visit_migration_source(
+        self, filepath: str, source: str
+    ) -> RevisionItem:
+        visitor = MigxerVisitor(filepath, source=source)
+        revision_date = None
+        header_lines = source.splitlines()[:self.NUM_LINES_TO_READ_FOR_DATE]
+        for line in header_lines:
+            if line.startswith(self.MIGRATION_DATE_PREFIX):
+                revision_date = LazyDate(filepath, line)
+                break
+        return RevisionItem(
+            original_filepath=filepath,
+            revision=visitor.revision_value,
+            parent_revision=visitor.down_revision_value,
+            revision_date=revision_date,
+            depends_on=visitor.depends_on_value,
+        )
+
+
+def parse_files_chunk(
+    engine: str, filepaths: List[str]
+) -> Tuple[List[RevisionItem], Dict[str, int]]:
+    file_parser = MigrationFileParser(engine)
+    return file_parser.parse_files(filepaths), file_parser.counters
+
+
+def split_files_into_chunks(filepaths: List[str], jobs: int) -> List[List[str]]:
+    chunks_count = jobs * CHUNKS_PER_JOB
+    chunk_size = max(1, -(-len(filepaths) // chunks_count))
+    return [
+        filepaths[start:start + chunk_size]
+        for start in range(0, len(filepaths), chunk_size)
+    ]
+
+
+def parse_files_concurrently(
+    file_parser: MigrationFileParser, filepaths: List[str], jobs: int,
+    pool: str = "process",
+) -> List[RevisionItem]:
+    # Counters of the workers are merged into file_parser. One job or one
+    # file is parsed right here.
+    if jobs <= 1 or len(filepaths) <= 1:
+        return file_parser.parse_files(filepaths)
+    worker = partial(parse_files_chunk, file_parser.engine)
+    with POOLS[pool](max_workers=jobs) as executor:
+        # map() yields chunks in submission order, so the items are in the
+        # order of filepaths no matter which worker finishes first.
+        revision_items = []
+        chunks = split_files_into_chunks(filepaths, jobs)
+        for chunk_items, counters in executor.map(worker, chunks):
+            revision_items.extend(chunk_items)
+            file_parser.merge_counters(counters)
+        return revision_items
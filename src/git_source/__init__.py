@@ -0,0 +1,7 @@
+from .git_source import GitError, GitMigrationsLoader, GitObjectReader, run_git
+from .history import GitFirstCommitOrdering, GitHistory
+
+__all__ = [
+    "GitError", "GitFirstCommitOrdering", "GitHistory", "GitMigrationsLoader",
+    "GitObjectReader", "run_git",
+]
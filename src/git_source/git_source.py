@@ -0,0 +1,131 @@
+import os
+import subprocess
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+from src.discovery import MigrationsDiscovery
+from src.fileparser import MigrationFileParser
+from src.revision_storage import RevisionItem, RevisionStorage
+from src.stats import EventHook, HookEmitter
+
+
+class GitError(Exception):
+    pass
+
+
+def run_git(repo_dir: str, *args: str) -> bytes:
+    completed = subprocess.run(
+        ["git", "-C", repo_dir, *args], capture_output=True
+    )
+    if completed.returncode != 0:
+        raise GitError(completed.stderr.decode().strip())
+    return completed.stdout
+
+
+class GitObjectReader:
+    # One long-lived ``git cat-file --batch`` process for all blobs: an
+    # object id goes in on stdin, "<oid> <type> <size>\n<content>\n" comes
+    # back on stdout.
+    def __init__(self, repo_dir: str):
+        self._process = subprocess.Popen(
+            ["git", "-C", repo_dir, "cat-file", "--batch"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        )
+
+    def __enter__(self) -> 'GitObjectReader':
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+    def read(self, object_id: str) -> bytes:
+        self._process.stdin.write(object_id.encode() + b"\n")
+        self._process.stdin.flush()
+        header = self._process.stdout.readline()
+        if not header or header.endswith(b" missing\n"):
+            raise GitError(f"Object {object_id} is missing")
+        size = int(header.split()[2])
+        content = self._process.stdout.read(size + 1)
+        if len(content) != size + 1:
+            raise GitError(f"Object {object_id} is truncated")
+        return content[:-1]
+
+    def close(self):
+        self._process.stdin.close()
+        self._process.wait()
+        self._process.stdout.close()
+
+
+Blob = Tuple[str, str]
+
+
+@dataclass
+class GitMigrationsLoader(HookEmitter):
+    # Builds the revision graph straight from the git object database: trees
+    # are listed with ``git ls-tree`` and blobs are streamed through a
+    # GitObjectReader, no checkout or working tree involved. Loading several
+    # refs gives the graph their merge would have.
+    locations: Sequence[str]
+    files_extension: str = ".py"
+    recursive: bool = False
+    file_parser: MigrationFileParser = field(default_factory=MigrationFileParser)
+    hooks: List[EventHook] = field(default_factory=list)
+
+    def list_blobs(self, ref: str) -> List[Blob]:
+        blobs = []
+        for location in self.locations:
+            args = ["ls-tree", "-z"] + (["-r"] if self.recursive else [])
+            listing = run_git(location, *args, ref, "--", ".")
+            for entry in listing.split(b"\0"):
+                if not entry:
+                    continue
+                meta, path = entry.split(b"\t", 1)
+                _, object_type, object_id = meta.split()
+                path = path.decode()
+                if object_type != b"blob" or not path.endswith(
+                    self.files_extension
+                ):
+                    continue
+                if MigrationsDiscovery.EXCLUDED_DIRS.intersection(
+                    path.split("/")[:-1]
+                ):
+                    continue
+                blobs.append((os.path.join(location, path), object_id.decode()))
+        return blobs
+
+    def load(self, refs: Sequence[str]) -> RevisionStorage:
+        with self._measure_phase("discovery"):
+            blobs_by_ref = [(ref, self.list_blobs(ref)) for ref in refs]
+        self._emit(
+            "files_scanned", count=sum(len(blobs) for _, blobs in blobs_by_ref)
+        )
+
+        # A blob unchanged between the refs is parsed once. A revision
+        # changed on both sides keeps the version of the first ref.
+        revision_items: Dict[str, RevisionItem] = {}
+        parsed_blobs = set()
+        counters = self.file_parser.counters
+        with self._measure_phase("parsing"):
+            with GitObjectReader(self.locations[0]) as reader:
+                for ref, blobs in blobs_by_ref:
+                    for path, object_id in blobs:
+                        if object_id in parsed_blobs:
+                            continue
+                        parsed_blobs.add(object_id)
+                        revision_item = self.file_parser.source_to_revision_item(
+                            f"{ref}:{path}", reader.read(object_id)
+                        )
+                        revision_items.setdefault(
+                            revision_item.revision, revision_item
+                        )
+        self._emit(
+            "files_parsed", count=len(parsed_blobs),
+            **self.file_parser.counters_since(counters)
+        )
+
+        storage = RevisionStorage()
+        storage.hooks.extend(self.hooks)
+        with self._measure_phase("graph_build"):
+            for revision_item in revision_items.values():
+                storage.add(revision_item)
+        return storage
@@ -0,0 +1,62 @@
+import os
+from typing import Any, Dict, Optional, Sequence
+
+from src.revision_storage import OrderingStrategy, RevisionItem
+
+from .git_source import run_git
+
+
+class GitHistory:
+    # When every file under ``locations`` was first committed, read from a
+    # single ``git log`` pass on first use and kept for the following
+    # lookups. Files that were never committed have no time.
+    _COMMIT_MARKER = "\x01"
+
+    def __init__(self, locations: Sequence[str]):
+        self.locations = list(locations)
+        self._first_commit_times: Optional[Dict[str, int]] = None
+
+    def first_commit_time(self, filepath: str) -> Optional[int]:
+        if self._first_commit_times is None:
+            self._first_commit_times = self._read_first_commit_times()
+        return self._first_commit_times.get(os.path.realpath(filepath))
+
+    def _read_first_commit_times(self) -> Dict[str, int]:
+        top_level = run_git(
+            self.locations[0], "rev-parse", "--show-toplevel"
+        ).decode().strip()
+        pathspecs = [os.path.realpath(location) for location in self.locations]
+        # Only additions, renames count as adding the new path.
+        log = run_git(
+            top_level, "log", "-z", "--name-only", "--no-renames",
+            "--diff-filter=A", f"--format={self._COMMIT_MARKER}%ct",
+            "--", *pathspecs
+        )
+        first_commit_times: Dict[str, int] = {}
+        commit_time = 0
+        for token in map(os.fsdecode, log.split(b"\0")):
+            token = token.lstrip("\n")
+            if token.startswith(self._COMMIT_MARKER):
+                commit_time = int(token[len(self._COMMIT_MARKER):])
+            elif token:
+                path = os.path.realpath(os.path.join(top_level, token))
+                # Newest commits come first, commit times aren't monotonic.
+                known_time = first_commit_times.get(path)
+                if known_time is None or commit_time < known_time:
+                    first_commit_times[path] = commit_time
+        return first_commit_times
+
+
+class GitFirstCommitOrdering(OrderingStrategy):
+    # Branches are ordered by when their migrations entered git, which
+    # follows the real merge order even when "Create Date" headers are
+    # missing or were written by hand.
+    describes = "first commit time"
+
+    def __init__(self, history: GitHistory):
+        self.history = history
+
+    def key(self, revision_item: RevisionItem) -> Optional[Any]:
+        if revision_item.original_filepath is None:
+            return None
+        return self.history.first_commit_time(revision_item.original_filepath)
@@ -1,29 +1,321 @@
 import argparse
 import os
+import sys
 
-from src.fileparser import MigrationsParser
+# Only what --check needs is imported up front, it runs from pre-commit on
+# every commit. The rest is imported by the functions that use it, and the
+# annotations are strings so that not even typing is imported.
+from src.check import HeadsCheck
+
+# Type checkers treat TYPE_CHECKING as true, typing.TYPE_CHECKING without
+# the typing import.
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Optional
+
+    from src.fileparser import MigrationsParser
+    from src.revision_storage import RevisionStorage
+    from src.stats import RunStats
 
 
 def parse_args():
     parser = argparse.ArgumentParser(description="a script to do stuff")
     parser.add_argument("--rev_dir")
-    return parser.parse_args()
+    parser.add_argument(
+        "--batch", nargs="+", metavar="DIR",
+        help="check or fix every directory (or glob) in one process, with "
+             "one worker pool and one parse cache"
+    )
+    parser.add_argument(
+        "--report", metavar="PATH", default="-",
+        help="with --batch, where the JSON report goes, stdout by default"
+    )
+    parser.add_argument(
+        "--version_location", action="append", default=[],
+        help="an extra migrations directory, may be repeated"
+    )
+    parser.add_argument(
+        "--recursive", action="store_true",
+        help="look for migrations in subdirectories too"
+    )
+    parser.add_argument(
+        "--check", action="store_true",
+        help="only count heads and exit with 1 when there is more than one, "
+             "nothing is parsed beyond revision and down_revision"
+    )
+    parser.add_argument(
+        "--render", choices=("ascii", "dot"),
+        help="print every conflict as ASCII or Graphviz DOT instead of fixing"
+    )
+    parser.add_argument(
+        "--window", type=int, metavar="N",
+        help="with --render, draw only N ancestors and descendants around "
+             "each branch point"
+    )
+    parser.add_argument(
+        "--order", choices=("date", "git"), default="date",
+        help="how sibling branches are ordered when fixing: by their "
+             "Create Date headers, or by when their files were first "
+             "committed (falling back to the headers)"
+    )
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--cache", action="store_true")
+    parser.add_argument(
+        "--cache_max_entries", type=int,
+        help="the parse cache size, ParseCache.DEFAULT_MAX_ENTRIES by default"
+    )
+    parser.add_argument("--clear_cache", action="store_true")
+    parser.add_argument(
+        "--keep_sources_mb", type=int, metavar="MB",
+        help="keep up to MB of migration sources read while parsing, so "
+             "writing a fix reads none of those files again"
+    )
+    parser.add_argument(
+        "--snapshot", metavar="PATH",
+        help="load the revisions graph from a snapshot at PATH when the "
+             "migrations did not change, save it there otherwise"
+    )
+    parser.add_argument(
+        "--snapshot_fingerprint", choices=("stat", "git"), default="stat",
+        help="how a snapshot is matched to the migrations: file stamps "
+             "(stat), or git blob ids which survive a fresh checkout (git)"
+    )
+    parser.add_argument("--watch", action="store_true")
+    parser.add_argument("--watch_interval", type=float, default=0.5)
+    parser.add_argument("--auto_fix", action="store_true")
+    parser.add_argument(
+        "--against", metavar="REF",
+        help="report the heads conflict merging REF would cause, read from "
+             "the git object database without a checkout"
+    )
+    parser.add_argument(
+        "--ours", metavar="REF", default="HEAD",
+        help="the ref --against is merged into"
+    )
+    parser.add_argument(
+        "--stats", nargs="?", const="-", metavar="PATH",
+        help="write run metrics as JSON to PATH, stdout by default"
+    )
+    parser.add_argument(
+        "--profile", metavar="PATH", help="dump cProfile stats to PATH"
+    )
+    inputs = parser.parse_args()
+    if inputs.batch:
+        # Options of a single directory run that the batch does not honour.
+        unsupported = [
+            option for option, used in (
+                ("--version_location", inputs.version_location),
+                ("--order", inputs.order != "date"),
+                ("--keep_sources_mb", inputs.keep_sources_mb is not None),
+                ("--snapshot", inputs.snapshot is not None),
+                ("--render", inputs.render is not None),
+                ("--watch", inputs.watch),
+                ("--against", inputs.against is not None),
+            )
+            if used
+        ]
+        if unsupported:
+            parser.error(f"{', '.join(unsupported)} can't be used with --batch")
+    return inputs
 
 
 def main():
     inputs = parse_args()
-    if not os.path.exists(inputs.rev_dir):
-        raise AttributeError(
-            f"Seems that path {inputs.rev_dir} does not exist"
+    locations = [] if inputs.batch else [inputs.rev_dir]
+    for location in [*locations, *inputs.version_location]:
+        if not os.path.exists(location):
+            raise AttributeError(
+                f"Seems that path {location} does not exist"
+            )
+
+    if inputs.check and not inputs.batch:
+        sys.exit(check_heads(inputs))
+
+    if inputs.clear_cache:
+        from src.parse_cache import ParseCache
+        if inputs.batch:
+            parse_cache = ParseCache(ParseCache.FILENAME)
+        else:
+            parse_cache = ParseCache.for_directory(inputs.rev_dir)
+        with parse_cache:
+            parse_cache.invalidate()
+
+    profiler = None
+    if inputs.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    run_stats = None
+    if inputs.stats:
+        from src.stats import RunStats
+        run_stats = RunStats()
+    try:
+        exit_code = run(inputs, run_stats)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(inputs.profile)
+        if run_stats is not None:
+            write_stats(run_stats, inputs.stats)
+    if exit_code:
+        sys.exit(exit_code)
+
+
+def run(inputs, run_stats: 'Optional[RunStats]' = None) -> int:
+    from src.fileparser import MigrationsParser
+    from src.revision_storage import RevisionStorage
+
+    hooks = [run_stats] if run_stats is not None else []
+    if inputs.batch:
+        return run_batch(inputs, hooks)
+    if inputs.against:
+        return check_against(inputs, hooks)
+
+    storage = RevisionStorage()
+    storage.hooks.extend(hooks)
+    cache_options = {}
+    if inputs.cache_max_entries is not None:
+        cache_options["_cache_max_entries"] = inputs.cache_max_entries
+    if inputs.keep_sources_mb is not None:
+        from src.writer import SourceCache
+        cache_options["_source_cache"] = SourceCache(
+            inputs.keep_sources_mb * 1024 * 1024
         )
+    fileparser = MigrationsParser(
+        _dir_name=inputs.rev_dir, _version_locations=inputs.version_location,
+        _recursive=inputs.recursive, _jobs=inputs.jobs, _use_cache=inputs.cache,
+        _snapshot_path=inputs.snapshot,
+        _snapshot_fingerprint=inputs.snapshot_fingerprint,
+        revisions_storage=storage, hooks=hooks, **cache_options
+    )
+    if inputs.order == "git":
+        from src.git_source import GitFirstCommitOrdering, GitHistory
+        from src.revision_storage import CreateDateOrdering, FallbackOrdering
+        storage.ordering = FallbackOrdering(
+            GitFirstCommitOrdering(GitHistory(fileparser.migration_locations)),
+            CreateDateOrdering(),
+        )
+    if inputs.render:
+        render(storage, inputs)
+        return 0
+    if inputs.watch:
+        watch(fileparser, inputs)
+        return 0
 
-    fileparser = MigrationsParser(_dir_name=inputs.rev_dir)
-    storage = fileparser.revisions_storage
     fix_was_maden: bool = storage.fix_revision_conflict()
     if fix_was_maden:
         storage.wtite_fix_to_file()
     else:
-        print("Nothing to fix")
+        print("Nothing to fix", file=sys.stderr if inputs.stats == "-" else None)
+    return 0
+
+
+def run_batch(inputs, hooks) -> int:
+    import json
+    from src.batch import BatchRunner
+    from src.parse_cache import ParseCache
+
+    parse_cache = None
+    if inputs.cache:
+        # One cache for the whole batch, in the directory it is run from.
+        parse_cache = ParseCache(
+            ParseCache.FILENAME, inputs.cache_max_entries
+            if inputs.cache_max_entries is not None
+            else ParseCache.DEFAULT_MAX_ENTRIES
+        )
+    try:
+        reports = BatchRunner(
+            BatchRunner.expand_directories(inputs.batch),
+            fix=not inputs.check, recursive=inputs.recursive,
+            jobs=inputs.jobs, parse_cache=parse_cache, hooks=hooks,
+        ).run()
+    finally:
+        if parse_cache is not None:
+            parse_cache.close()
+
+    report = {report.directory: report.to_dict() for report in reports}
+    if inputs.report == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(inputs.report, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+    failed = any(
+        report.error is not None or (inputs.check and report.has_conflict)
+        for report in reports
+    )
+    return 1 if failed else 0
+
+
+def check_heads(inputs) -> int:
+    heads = HeadsCheck(
+        [inputs.rev_dir, *inputs.version_location], recursive=inputs.recursive
+    ).heads()
+    if len(heads) > 1:
+        print(f"Multiple heads: {', '.join(heads)}")
+        return 1
+    return 0
+
+
+def check_against(inputs, hooks) -> int:
+    from src.git_source import GitMigrationsLoader
+
+    loader = GitMigrationsLoader(
+        [inputs.rev_dir, *inputs.version_location],
+        recursive=inputs.recursive, hooks=hooks
+    )
+    storage = loader.load([inputs.ours, inputs.against])
+    output = sys.stderr if inputs.stats == "-" else None
+    multiparent = storage.find_first_multiparent()
+    if multiparent is None:
+        print(f"Merging {inputs.against} keeps a single head", file=output)
+        return 0
+    print(
+        f"Merging {inputs.against} into {inputs.ours} makes a heads conflict "
+        f"after {multiparent}: {', '.join(storage.heads())}",
+        file=output
+    )
+    return 1
+
+
+def render(storage: 'RevisionStorage', inputs):
+    from src.render import GraphRenderer
+
+    renderer = GraphRenderer(storage, window=inputs.window)
+    if inputs.render == "dot":
+        lines = renderer.dot_lines()
+    else:
+        lines = renderer.ascii_lines()
+    for line in lines:
+        print(line)
+
+
+def write_stats(run_stats: 'RunStats', path: str):
+    import json
+
+    if path == "-":
+        json.dump(run_stats.to_dict(), sys.stdout, indent=2)
+        print()
+        return
+    with open(path, "w") as stats_file:
+        json.dump(run_stats.to_dict(), stats_file, indent=2)
+
+
+def watch(fileparser: 'MigrationsParser', inputs):
+    from src.watcher import MigrationsWatcher
+
+    watcher = MigrationsWatcher(
+        fileparser, auto_fix=inputs.auto_fix, interval=inputs.watch_interval
+    )
+    multiparent = watcher.storage.find_first_multiparent()
+    if multiparent:
+        print(f"Heads conflict after {multiparent}")
+    print(f"Watching {fileparser.migrations_dir}")
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == '__main__':
@@ -0,0 +1,6 @@
+# Imported by --check, which runs from pre-commit on every commit: these
+# modules import nothing but os and re.
+from . import header_grammar
+from .directory_walk import EXCLUDED_DIRS, scan_directory, walk_files
+
+__all__ = ["EXCLUDED_DIRS", "header_grammar", "scan_directory", "walk_files"]
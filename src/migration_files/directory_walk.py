@@ -0,0 +1,49 @@
+import os
+
+
+EXCLUDED_DIRS = frozenset({"__pycache__"})
+
+
+def scan_directory(
+    dir_path: str, files_extension: str, recursive: bool,
+    with_stamps: bool = False, excluded_dirs: frozenset = EXCLUDED_DIRS
+) -> tuple:
+    # One scandir pass over a directory: its migrations, sorted by name,
+    # with (mtime_ns, size) stamps if asked, and the subdirectories to
+    # descend into.
+    files = []
+    subdirs = []
+    with os.scandir(dir_path) as entries:
+        # is_dir()/is_file() use the entry type from the directory
+        # listing, only stamps need a stat call.
+        for entry in sorted(entries, key=lambda entry: entry.name):
+            if entry.is_dir(follow_symlinks=False):
+                if recursive and entry.name not in excluded_dirs:
+                    subdirs.append(os.path.join(dir_path, entry.name))
+                continue
+            if not entry.name.endswith(files_extension):
+                continue
+            if not entry.is_file():
+                continue
+            stamp = None
+            if with_stamps:
+                stat = entry.stat()
+                stamp = (stat.st_mtime_ns, stat.st_size)
+            files.append((os.path.join(dir_path, entry.name), stamp))
+    return files, subdirs
+
+
+def walk_files(
+    locations: list, files_extension: str = ".py", recursive: bool = False
+):
+    # Directory by directory, in MigrationsDiscovery.files() order:
+    # locations as given, then names sorted within a directory before the
+    # files of its subdirectories.
+    pending = list(reversed(list(dict.fromkeys(locations))))
+    while pending:
+        files, subdirs = scan_directory(
+            pending.pop(), files_extension, recursive
+        )
+        for filepath, _ in files:
+            yield filepath
+        pending.extend(reversed(subdirs))
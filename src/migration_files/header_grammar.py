@@ -0,0 +1,54 @@
+import re
+
+
+# The one-line header grammar shared by HeaderScanner, MmapHeaderExtractor
+# and HeadsCheck: revision = "...", down_revision = None / "..." / ("...",
+# "...") and the "Create Date" line. Values it can't express parse to
+# UNSUPPORTED and the callers fall back to MigxerVisitor.
+REVISION_TARGET_ID = "revision"
+DOWN_REVISION_TARGET_ID = "down_revision"
+DEPENDS_ON_TARGET_ID = "depends_on"
+TARGET_IDS = (REVISION_TARGET_ID, DOWN_REVISION_TARGET_ID, DEPENDS_ON_TARGET_ID)
+MIGRATION_DATE_PREFIX = "Create Date"
+BODY_START_PREFIXES = ("def ", "async def ", "class ", "@")
+
+ASSIGNMENT_RE = re.compile(
+    r"^(revision|down_revision|depends_on)"
+    r"\s*(?::[^=]*)?=\s*(.*?)\s*(?:#.*)?$"
+)
+_STRING_VALUE_RE = re.compile(r"""^(?:'([^'\\]*)'|"([^"\\]*)")$""")
+_SEQUENCE_VALUE_RE = re.compile(r"^(?:\((.*)\)|\[(.*)\])$")
+
+UNSUPPORTED = object()
+
+
+def parse_value(raw_value: str):
+    if raw_value == "None":
+        return None
+    sequence_match = _SEQUENCE_VALUE_RE.match(raw_value)
+    if not sequence_match:
+        return parse_string(raw_value)
+    parenthesized, listed = sequence_match.groups()
+    if parenthesized and parenthesized.strip() and "," not in parenthesized:
+        # ("a") is just a parenthesized string.
+        return parse_string(parenthesized.strip())
+    return parse_sequence(parenthesized if parenthesized is not None else listed)
+
+
+def parse_string(raw_value: str):
+    match = _STRING_VALUE_RE.match(raw_value)
+    if not match:
+        return UNSUPPORTED
+    single_quoted, double_quoted = match.groups()
+    return single_quoted if single_quoted is not None else double_quoted
+
+
+def parse_sequence(raw_elements: str):
+    # One-line tuples/lists of string literals, as alembic writes merges.
+    elements = [element.strip() for element in raw_elements.split(",")]
+    if elements and not elements[-1]:
+        elements.pop()
+    parsed = tuple(parse_string(element) for element in elements)
+    if UNSUPPORTED in parsed:
+        return UNSUPPORTED
+    return parsed
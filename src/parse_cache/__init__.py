@@ -0,0 +1,3 @@
+from .parse_cache import ParseCache
+
+__all__ = ["ParseCache",]
@@ -0,0 +1,246 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.revision_storage import RevisionItem
+from src.scanner import LazyDate
+
+
+class ParseCache:
+    FILENAME: str = ".migxer_cache.sqlite3"
+    SCHEMA_VERSION: int = 3
+    DEFAULT_MAX_ENTRIES: int = 100_000
+    # A file written within this window of its own cache entry may have been
+    # modified again without changing mtime, so its stat is not trusted.
+    RACY_WINDOW_NS: int = 2_000_000_000
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            content_hash TEXT NOT NULL,
+            revision TEXT NOT NULL,
+            down_revision TEXT,
+            date_line TEXT,
+            depends_on TEXT,
+            stored_ns INTEGER NOT NULL,
+            last_used INTEGER NOT NULL
+        )
+    """
+
+    def __init__(
+        self, cache_path: str, max_entries: int = DEFAULT_MAX_ENTRIES
+    ):
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # Async loading hands the cache between worker threads, one call at
+        # a time, so the connection is not pinned to its creating thread.
+        self._connection = sqlite3.connect(cache_path, check_same_thread=False)
+        self._prepare_schema()
+        self._generation = self._next_generation()
+        self._rows: Optional[Dict[str, tuple]] = None
+        # Stamps of the files lookup() missed, taken before they are parsed:
+        # (mtime_ns, size, content_hash, stamped_ns). A file changed while it
+        # is parsed then no longer matches its entry.
+        self._stamps: Dict[str, Tuple[int, int, str, int]] = {}
+
+    @classmethod
+    def for_directory(
+        cls, dir_name: str, max_entries: int = DEFAULT_MAX_ENTRIES
+    ) -> 'ParseCache':
+        return cls(os.path.join(dir_name, cls.FILENAME), max_entries)
+
+    def __enter__(self) -> 'ParseCache':
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+    def _prepare_schema(self):
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != self.SCHEMA_VERSION:
+            self._connection.execute("DROP TABLE IF EXISTS entries")
+            self._connection.execute(
+                f"PRAGMA user_version = {self.SCHEMA_VERSION}"
+            )
+        self._connection.execute(self._SCHEMA)
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_used "
+            "ON entries (last_used)"
+        )
+
+    def _next_generation(self) -> int:
+        row = self._connection.execute(
+            "SELECT MAX(last_used) FROM entries"
+        ).fetchone()
+        return (row[0] or 0) + 1
+
+    def _load_rows(self) -> Dict[str, tuple]:
+        if self._rows is None:
+            cursor = self._connection.execute(
+                "SELECT path, mtime_ns, size, content_hash, revision, "
+                "down_revision, date_line, stored_ns, depends_on "
+                "FROM entries"
+            )
+            self._rows = {row[0]: row for row in cursor}
+        return self._rows
+
+    def __len__(self) -> int:
+        return self._connection.execute(
+            "SELECT COUNT(*) FROM entries"
+        ).fetchone()[0]
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def lookup(
+        self, filepaths: Iterable[str]
+    ) -> Tuple[Dict[str, RevisionItem], List[str]]:
+        rows = self._load_rows()
+        found: Dict[str, RevisionItem] = {}
+        missing: List[str] = []
+        refreshed = []
+        for filepath in filepaths:
+            path = os.path.abspath(filepath)
+            row = rows.get(path)
+            stamped_ns = time.time_ns()
+            stat = os.stat(filepath)
+            if row is None or row[2] != stat.st_size:
+                missing.append(filepath)
+                self._stamps[path] = self._stamp(filepath, stat, stamped_ns)
+                continue
+            if not self._stat_is_trusted(row, stat):
+                content_hash = self.hash_file(filepath)
+                if content_hash != row[3]:
+                    missing.append(filepath)
+                    self._stamps[path] = (
+                        stat.st_mtime_ns, stat.st_size, content_hash, stamped_ns
+                    )
+                    continue
+                refreshed.append((stat.st_mtime_ns, time.time_ns(), row[0]))
+            found[filepath] = self._row_to_revision_item(filepath, row)
+
+        self.hits += len(found)
+        self.misses += len(missing)
+        with self._connection:
+            self._connection.executemany(
+                "UPDATE entries SET mtime_ns = ?, stored_ns = ? WHERE path = ?",
+                refreshed,
+            )
+            self._connection.executemany(
+                "UPDATE entries SET last_used = ? WHERE path = ?",
+                (
+                    (self._generation, os.path.abspath(filepath))
+                    for filepath in found
+                ),
+            )
+        return found, missing
+
+    def _stat_is_trusted(self, row: tuple, stat: os.stat_result) -> bool:
+        mtime_ns, stored_ns = row[1], row[7]
+        return (
+            stat.st_mtime_ns == mtime_ns
+            and mtime_ns + self.RACY_WINDOW_NS < stored_ns
+        )
+
+    def store(self, revision_items: Iterable[RevisionItem]):
+        entries = []
+        for item in revision_items:
+            path = os.path.abspath(item.original_filepath)
+            stamp = self._stamps.pop(path, None)
+            if stamp is None:
+                # Not missed by lookup(), so only as good as a stamp taken now.
+                stamp = self._stamp(item.original_filepath)
+            mtime_ns, size, content_hash, stamped_ns = stamp
+            entries.append((
+                path,
+                mtime_ns,
+                size,
+                content_hash,
+                item.revision,
+                # JSON keeps merge revisions' tuples apart from plain ids.
+                json.dumps(item.parent_revision),
+                self._date_line(item),
+                json.dumps(item.depends_on),
+                stamped_ns,
+                self._generation,
+            ))
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO entries VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                entries,
+            )
+        self._rows = None
+
+    def invalidate(self, filepath: Optional[str] = None):
+        with self._connection:
+            if filepath is None:
+                self._connection.execute("DELETE FROM entries")
+            else:
+                self._connection.execute(
+                    "DELETE FROM entries WHERE path = ?",
+                    (os.path.abspath(filepath),),
+                )
+        self._rows = None
+
+    def evict(self):
+        with self._connection:
+            self._connection.execute(
+                "DELETE FROM entries WHERE path IN ("
+                "SELECT path FROM entries ORDER BY last_used DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        self._rows = None
+
+    def close(self):
+        self.evict()
+        self._connection.close()
+
+    @classmethod
+    def _stamp(
+        cls, filepath: str, stat: Optional[os.stat_result] = None,
+        stamped_ns: Optional[int] = None
+    ) -> Tuple[int, int, str, int]:
+        if stamped_ns is None:
+            stamped_ns = time.time_ns()
+        if stat is None:
+            stat = os.stat(filepath)
+        return (
+            stat.st_mtime_ns, stat.st_size, cls.hash_file(filepath), stamped_ns
+        )
+
+    @staticmethod
+    def hash_file(filepath: str) -> str:
+        with open(filepath, "rb") as file:
+            return hashlib.blake2b(file.read(), digest_size=16).hexdigest()
+
+    @staticmethod
+    def _date_line(item: RevisionItem) -> Optional[str]:
+        # Dates are cached as the raw header line, so a warm run doesn't
+        # parse them either. NULL means "read the header when needed".
+        lazy_revision_date = item.lazy_revision_date
+        if lazy_revision_date is not None:
+            return lazy_revision_date.date_line
+        return LazyDate.format_date_line(item.revision_date)
+
+    @staticmethod
+    def _row_to_revision_item(filepath: str, row: tuple) -> RevisionItem:
+        parent_revision = json.loads(row[5])
+        if isinstance(parent_revision, list):
+            parent_revision = tuple(parent_revision)
+        return RevisionItem(
+            original_filepath=filepath,
+            revision=row[4],
+            parent_revision=parent_revision,
+            revision_date=LazyDate(filepath, row[6]),
+            depends_on=tuple(json.loads(row[8])),
+        )
@@ -0,0 +1,3 @@
+from .graph_renderer import GraphRenderer
+
+__all__ = ["GraphRenderer"]
@@ -0,0 +1,205 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from src.revision_storage import RevisionStorage
+
+
+@dataclass
+class GraphRenderer:
+    # Draws every conflict of a storage as ASCII or Graphviz DOT, yielding
+    # one line at a time. ``window`` limits each drawing to that many
+    # ancestors and descendants around the branch point, so the output for a
+    # huge history stays small; None draws everything.
+    storage: RevisionStorage
+    window: Optional[int] = None
+    with_dates: bool = False
+
+    ELLIPSIS = "<...>"
+    CHAIN_SEPARATOR = " - "
+
+    def __post_init__(self):
+        if self.window is not None and self.window < 1:
+            raise AttributeError(f"Window must be positive, got {self.window}")
+
+    def ascii_lines(self) -> Iterator[str]:
+        # <...> - ancestor - branch_point
+        #   |- child - grandchild - <...>
+        #   \- other_child
+        #      |- ...
+        for index, branch_point in enumerate(self.storage.conflict_points()):
+            if index:
+                yield ""
+            yield self._ancestors_line(branch_point)
+            yield from self._descendants_lines(branch_point)
+
+    def dot_lines(self) -> Iterator[str]:
+        conflict_points = self.storage.conflict_points()
+        highlighted = set(conflict_points)
+        yield "digraph revisions {"
+        yield "    rankdir=LR;"
+        yield "    node [shape=box];"
+        if self.window is None:
+            for revision in self.storage:
+                yield from self._dot_lines(revision, revision in highlighted)
+        else:
+            drawn_nodes: Set[str] = set()
+            drawn_edges: Set[Tuple[str, str]] = set()
+            for branch_point in conflict_points:
+                window = self._window_around(branch_point)
+                for revision, truncated in window.items():
+                    if revision in drawn_nodes:
+                        node_line = False
+                    else:
+                        drawn_nodes.add(revision)
+                        node_line = True
+                    yield from self._dot_lines(
+                        revision, revision in highlighted, truncated,
+                        window, drawn_edges, node_line
+                    )
+        yield "}"
+
+    def _label(self, revision: str) -> str:
+        if self.with_dates:
+            return str(self.storage[revision])
+        return revision
+
+    def _ancestors_line(self, branch_point: str) -> str:
+        # First parents only, a merge shows up under each of its branches.
+        ancestors = []
+        revision = branch_point
+        while self.window is None or len(ancestors) < self.window:
+            parents = self.storage[revision].parent_revisions
+            if not parents or parents[0] not in self.storage:
+                break
+            revision = parents[0]
+            ancestors.append(revision)
+        # Cut by the window or a partial history.
+        prefix = []
+        if self.storage[revision].parent_revisions:
+            prefix.append(self.ELLIPSIS)
+        return self.CHAIN_SEPARATOR.join(
+            prefix + [self._label(ancestor) for ancestor in reversed(ancestors)]
+            + [self._label(branch_point)]
+        )
+
+    def _descendants_lines(self, branch_point: str) -> Iterator[str]:
+        # Merged branches meet again, so every revision is drawn once and
+        # later occurrences point back to it.
+        seen = {branch_point}
+        stack: List[Tuple[str, int, str, bool]] = []
+        self._push_children(stack, branch_point, 1, "  ")
+        while stack:
+            revision, depth, indent, is_last = stack.pop()
+            labels, branching_revision, depth = self._chain(
+                revision, depth, seen
+            )
+            connector = "\\- " if is_last else "|- "
+            yield indent + connector + self.CHAIN_SEPARATOR.join(labels)
+            if branching_revision is not None:
+                self._push_children(
+                    stack, branching_revision, depth + 1,
+                    indent + ("   " if is_last else "|  ")
+                )
+
+    def _push_children(
+        self, stack: List[Tuple[str, int, str, bool]], revision: str,
+        depth: int, indent: str
+    ):
+        children = self.storage[revision].children
+        for index in reversed(range(len(children))):
+            stack.append(
+                (children[index], depth, indent, index == len(children) - 1)
+            )
+
+    def _chain(
+        self, revision: str, depth: int, seen: Set[str]
+    ) -> Tuple[List[str], Optional[str], int]:
+        # Follows single children from ``revision``. Returns the labels, the
+        # revision the chain branches at (if it is still inside the window)
+        # and its depth below the branch point.
+        labels = []
+        while True:
+            if revision in seen:
+                labels.append(f"{self._label(revision)} (see above)")
+                return labels, None, depth
+            seen.add(revision)
+            labels.append(self._label(revision))
+            children = self.storage[revision].children
+            if not children:
+                return labels, None, depth
+            if self.window is not None and depth >= self.window:
+                labels.append(self.ELLIPSIS)
+                return labels, None, depth
+            if len(children) > 1:
+                return labels, revision, depth
+            revision = children[0]
+            depth += 1
+
+    def _window_around(self, branch_point: str) -> Dict[str, bool]:
+        # Revisions within ``window`` steps up or down from the branch point,
+        # mapped to whether some of their edges leave the window.
+        window = {branch_point: False}
+        for neighbours in (self._present_parents, self._children):
+            queue = deque([(branch_point, 0)])
+            while queue:
+                revision, distance = queue.popleft()
+                if distance == self.window:
+                    continue
+                for neighbour in neighbours(revision):
+                    if neighbour not in window:
+                        window[neighbour] = False
+                        queue.append((neighbour, distance + 1))
+        for revision in window:
+            window[revision] = any(
+                neighbour not in window
+                for neighbours in (self._present_parents, self._children)
+                for neighbour in neighbours(revision)
+            )
+        return window
+
+    def _present_parents(self, revision: str) -> List[str]:
+        return [
+            parent for parent in self.storage[revision].parent_revisions
+            if parent in self.storage
+        ]
+
+    def _children(self, revision: str) -> List[str]:
+        return self.storage[revision].children
+
+    def _dot_lines(
+        self, revision: str, highlighted: bool, truncated: bool = False,
+        window: Optional[Dict[str, bool]] = None,
+        drawn_edges: Optional[Set[Tuple[str, str]]] = None,
+        node_line: bool = True
+    ) -> Iterator[str]:
+        if node_line:
+            attributes = []
+            if self.with_dates:
+                attributes.append(f"label={_quote(self._label(revision))}")
+            if highlighted:
+                attributes.append("color=red")
+            if truncated:
+                attributes.append("style=dashed")
+            attributes_str = f" [{', '.join(attributes)}]" if attributes else ""
+            yield f"    {_quote(revision)}{attributes_str};"
+
+        item = self.storage[revision]
+        edges = [(parent, "") for parent in item.parent_revisions] + [
+            (dependency, " [style=dotted]") for dependency in item.depends_on
+        ]
+        for source, edge_attributes in edges:
+            if source not in self.storage:
+                continue
+            if window is not None and source not in window:
+                continue
+            if drawn_edges is not None:
+                if (source, revision) in drawn_edges:
+                    continue
+                drawn_edges.add((source, revision))
+            yield f"    {_quote(source)} -> {_quote(revision)}{edge_attributes};"
+
+
+def _quote(value: str) -> str:
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
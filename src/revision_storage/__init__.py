@@ -1,4 +1,16 @@
-from .migxer_revision_storage import RevisionStorage
+from .compact_revision_storage import CompactRevisionStorage, RevisionItemView
+from .migxer_revision_storage import RevisionsCycleException, RevisionStorage
+from .ordering import (
+    CreateDateOrdering, FallbackOrdering, FixIsImpossible, OrderingStrategy
+)
 from .revision_item import RevisionItem
+from .snapshot import (
+    SnapshotError, SnapshotMismatch, dump_snapshot, load_snapshot
+)
 
-__all__ = ["RevisionItem", "RevisionStorage"]
+__all__ = [
+    "CompactRevisionStorage", "CreateDateOrdering", "FallbackOrdering",
+    "FixIsImpossible", "OrderingStrategy", "RevisionItem", "RevisionItemView",
+    "RevisionsCycleException", "RevisionStorage", "SnapshotError", "SnapshotMismatch", "dump_snapshot",
+    "load_snapshot",
+]
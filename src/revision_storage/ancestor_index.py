@@ -0,0 +1,141 @@
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
+
+if TYPE_CHECKING:
+    from .migxer_revision_storage import RevisionStorage
+
+
+class AncestorIndex:
+    # Binary lifting over the parent links of a tree-shaped history: every
+    # revision keeps its depth and its 1st, 2nd, 4th, ... ancestors, so
+    # ancestor, LCA and distance queries take O(log n) jumps after an
+    # O(n log n) build. Revisions whose parent was never loaded are roots of
+    # their own trees. An edge change only marks the moved revision; its
+    # subtree is relabelled on the next query, the rest of the index stays.
+    def __init__(self, storage: 'RevisionStorage'):
+        self.storage = storage
+        self._depth: Dict[str, int] = {}
+        self._jumps: Dict[str, List[str]] = {}
+        self._dirty: Set[str] = set()
+        for revision in storage:
+            if self._parent(revision) is None:
+                self._relabel(revision)
+
+    def _parent(self, revision: str) -> Optional[str]:
+        # down_revision may be a 1-tuple, it is still a single parent.
+        parents = self.storage[revision].parent_revisions
+        if parents and parents[0] in self.storage:
+            return parents[0]
+        return None
+
+    def _relabel(self, revision: str):
+        # Depths and jumps of ``revision`` and everything below it, parents
+        # first. The parent of ``revision`` must be up to date.
+        storage, depths, all_jumps = self.storage, self._depth, self._jumps
+        dirty = self._dirty
+        stack = [(revision, self._parent(revision))]
+        while stack:
+            revision, parent = stack.pop()
+            dirty.discard(revision)
+            if parent is None:
+                depths[revision] = 0
+                all_jumps[revision] = []
+            else:
+                depths[revision] = depths[parent] + 1
+                jumps = [parent]
+                ancestor_jumps = all_jumps[parent]
+                while len(jumps) <= len(ancestor_jumps):
+                    ancestor = ancestor_jumps[len(jumps) - 1]
+                    jumps.append(ancestor)
+                    ancestor_jumps = all_jumps[ancestor]
+                all_jumps[revision] = jumps
+            for child in storage[revision].children:
+                stack.append((child, revision))
+
+    def add_revision(self, revision: str):
+        self._dirty.add(revision)
+
+    def link(self, parent: str, child: str):
+        self._dirty.add(child)
+
+    unlink = link
+
+    def remove_revision(self, revision: str):
+        # The revision must already be unlinked from its parent and children.
+        self._dirty.discard(revision)
+        self._depth.pop(revision, None)
+        self._jumps.pop(revision, None)
+
+    def _refresh(self):
+        if not self._dirty:
+            return
+        # A dirty revision under another dirty one is relabelled with it, so
+        # only the topmost ones are relabelled. ``covered`` remembers whether
+        # a revision or one of its ancestors is dirty, every chain is walked
+        # once.
+        dirty = self._dirty
+        covered: Dict[str, bool] = {}
+        tops = []
+        for revision in dirty:
+            path = []
+            is_covered = False
+            ancestor = self._parent(revision)
+            while ancestor is not None:
+                if ancestor in covered:
+                    is_covered = covered[ancestor]
+                    break
+                path.append(ancestor)
+                if ancestor in dirty:
+                    is_covered = True
+                    break
+                ancestor = self._parent(ancestor)
+            for ancestor in path:
+                covered[ancestor] = is_covered
+            covered[revision] = True
+            if not is_covered:
+                tops.append(revision)
+        for top in tops:
+            self._relabel(top)
+
+    def depth(self, revision: str) -> int:
+        self._refresh()
+        return self._depth[revision]
+
+    def _lift(self, revision: str, steps: int) -> str:
+        bit = 0
+        while steps:
+            if steps & 1:
+                revision = self._jumps[revision][bit]
+            steps >>= 1
+            bit += 1
+        return revision
+
+    def is_ancestor(self, ancestor: str, revision: str) -> bool:
+        # A revision counts as its own ancestor.
+        self._refresh()
+        steps = self._depth[revision] - self._depth[ancestor]
+        return steps >= 0 and self._lift(revision, steps) == ancestor
+
+    def lowest_common_ancestor(self, first: str, second: str) -> Optional[str]:
+        self._refresh()
+        if self._depth[first] < self._depth[second]:
+            first, second = second, first
+        first = self._lift(first, self._depth[first] - self._depth[second])
+        if first == second:
+            return first
+        for bit in reversed(range(len(self._jumps[first]))):
+            if bit < len(self._jumps[first]):
+                first_jump = self._jumps[first][bit]
+                second_jump = self._jumps[second][bit]
+                if first_jump != second_jump:
+                    first, second = first_jump, second_jump
+        jumps = self._jumps[first]
+        # Different trees of a partial history have no common ancestor.
+        return jumps[0] if jumps and jumps[0] == self._jumps[second][0] else None
+
+    def distance(self, first: str, second: str) -> Optional[int]:
+        common = self.lowest_common_ancestor(first, second)
+        if common is None:
+            return None
+        return (
+            self._depth[first] + self._depth[second] - 2 * self._depth[common]
+        )
@@ -0,0 +1,391 @@
+from array import array
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from src.scanner import LazyDate
+
+from .migxer_revision_storage import RevisionStorage
+from .revision_item import (
+    NO_DATE, DownRevision, RevisionItem, _date_to_int, _int_to_date,
+    as_revisions_tuple,
+)
+
+
+NO_INDEX = -1
+
+
+class RevisionItemView:
+    __slots__ = ("_storage", "_index")
+
+    def __init__(self, storage: 'CompactRevisionStorage', index: int):
+        self._storage = storage
+        self._index = index
+
+    @property
+    def revision(self) -> str:
+        return self._storage._revisions[self._index]
+
+    @property
+    def original_filepath(self) -> Optional[str]:
+        return self._storage._filepaths[self._index]
+
+    @property
+    def parent_revision(self) -> DownRevision:
+        parent = self._storage._parents[self._index]
+        if parent == NO_INDEX:
+            return None
+        revisions = self._storage._revisions
+        extra_parents = self._storage._extra_parents.get(self._index)
+        if extra_parents is None:
+            return revisions[parent]
+        return (revisions[parent], ) + tuple(
+            revisions[extra_parent] for extra_parent in extra_parents
+        )
+
+    @parent_revision.setter
+    def parent_revision(self, revision: DownRevision):
+        self._storage._set_parent(self._index, revision)
+
+    @property
+    def parent_revisions(self) -> Tuple[str, ...]:
+        return as_revisions_tuple(self.parent_revision)
+
+    @property
+    def depends_on(self) -> Tuple[str, ...]:
+        return self._storage._depends_on.get(self._index, ())
+
+    @property
+    def revision_date(self) -> Optional[datetime]:
+        storage = self._storage
+        lazy_revision_date = storage._lazy_dates.pop(self._index, None)
+        if lazy_revision_date is not None:
+            storage._dates[self._index] = _date_to_int(lazy_revision_date.load())
+        return _int_to_date(storage._dates[self._index])
+
+    @property
+    def children(self) -> List[str]:
+        revisions = self._storage._revisions
+        return [
+            revisions[child]
+            for child in self._storage._children_indices(self._index)
+        ]
+
+    @property
+    def lazy_revision_date(self) -> Optional[LazyDate]:
+        return self._storage._lazy_dates.get(self._index)
+
+    def to_revision_item(self) -> RevisionItem:
+        return RevisionItem(
+            revision=self.revision,
+            original_filepath=self.original_filepath,
+            parent_revision=self.parent_revision,
+            revision_date=self.lazy_revision_date or self.revision_date,
+            children=self.children,
+            depends_on=self.depends_on,
+        )
+
+    __str__ = RevisionItem.__str__
+    __eq__ = RevisionItem.__eq__
+    __lt__ = RevisionItem.__lt__
+    __hash__ = None
+    assignments_ids_values_map = RevisionItem.assignments_ids_values_map
+    serialize_to_revision_file = RevisionItem.serialize_to_revision_file
+    prepare_revision_file = RevisionItem.prepare_revision_file
+    _unparse_to_temp_file = RevisionItem._unparse_to_temp_file
+
+    def __repr__(self) -> str:
+        return (
+            f"RevisionItemView(revision={self.revision!r}, "
+            f"parent_revision={self.parent_revision!r})"
+        )
+
+
+class CompactRevisionStorage(RevisionStorage):
+    # Revision ids are interned to integer indices, every per-revision field
+    # lives in a flat array and children are a CSR adjacency rebuilt from
+    # ``_parents`` on demand. Ids referenced only as a parent get an index too,
+    # ``_present`` tells loaded revisions apart from those. Merge revisions
+    # are rare, so their second and further parents, as well as depends_on
+    # and the dates not loaded yet, live in sparse dicts.
+    def __init__(self):
+        super().__init__()
+        self._revisions: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._present = bytearray()
+        self._parents = array("q")
+        self._dates = array("q")
+        self._filepaths: List[Optional[str]] = []
+        self._added = array("q")
+        self._extra_parents: Dict[int, Tuple[int, ...]] = {}
+        self._depends_on: Dict[int, Tuple[str, ...]] = {}
+        self._lazy_dates: Dict[int, LazyDate] = {}
+        self._child_offsets: Optional[array] = None
+        self._child_list: Optional[array] = None
+        self._root_index = NO_INDEX
+
+    @classmethod
+    def from_edges(cls, edges) -> 'CompactRevisionStorage':
+        storage = cls()
+        for edge in edges:
+            if isinstance(edge, RevisionItem):
+                storage._add(edge)
+            else:
+                storage._add_edge(*edge)
+        return storage
+
+    def _intern(self, revision: str) -> int:
+        index = self._ids.get(revision)
+        if index is None:
+            index = len(self._revisions)
+            self._ids[revision] = index
+            self._revisions.append(revision)
+            self._present.append(0)
+            self._parents.append(NO_INDEX)
+            self._dates.append(NO_DATE)
+            self._filepaths.append(None)
+        return index
+
+    def _add(self, revision_item: RevisionItem):
+        self._add_edge(
+            revision_item.revision, revision_item.parent_revision,
+            revision_item.lazy_revision_date or revision_item.revision_date,
+            revision_item.original_filepath, revision_item.depends_on
+        )
+
+    def _add_edge(
+        self, revision: str, down_revision: DownRevision,
+        revision_date: Union[None, datetime, LazyDate] = None,
+        original_filepath: Optional[str] = None,
+        depends_on: Tuple[str, ...] = ()
+    ):
+        index = self._intern(revision)
+        if not self._present[index]:
+            self._present[index] = 1
+            self._added.append(index)
+        if down_revision is None and self._root_index == NO_INDEX:
+            self._root_index = index
+        self._set_parent(index, down_revision)
+        if isinstance(revision_date, LazyDate):
+            self._lazy_dates[index] = revision_date
+            self._dates[index] = NO_DATE
+        else:
+            self._lazy_dates.pop(index, None)
+            self._dates[index] = _date_to_int(revision_date)
+        self._filepaths[index] = original_filepath
+        if depends_on:
+            self._depends_on[index] = tuple(depends_on)
+        else:
+            self._depends_on.pop(index, None)
+
+    def __setitem__(self, revision: str, revision_item: RevisionItem):
+        self._add(revision_item)
+
+    def _set_parent(self, index: int, revision: DownRevision):
+        parents = [self._intern(parent) for parent in as_revisions_tuple(revision)]
+        self._parents[index] = parents[0] if parents else NO_INDEX
+        if len(parents) > 1:
+            self._extra_parents[index] = tuple(parents[1:])
+        else:
+            self._extra_parents.pop(index, None)
+        self._child_offsets = None
+        self._descendant_index = None
+        self._ancestor_index = None
+
+    @property
+    def has_merges(self) -> bool:
+        return bool(self._extra_parents)
+
+    def _parent_indices(self, index: int) -> Tuple[int, ...]:
+        parent = self._parents[index]
+        if parent == NO_INDEX:
+            return ()
+        return (parent, ) + self._extra_parents.get(index, ())
+
+    def remove(self, revision: str) -> RevisionItem:
+        index = self._index_of(revision)
+        revision_item = RevisionItemView(self, index).to_revision_item()
+        revision_item.children = []
+        self._present[index] = 0
+        self._added.remove(index)
+        self._extra_parents.pop(index, None)
+        self._depends_on.pop(index, None)
+        self._lazy_dates.pop(index, None)
+        if self._root_index == index:
+            self._root_index = next(
+                (
+                    added for added in self._added
+                    if self._parents[added] == NO_INDEX
+                ),
+                NO_INDEX,
+            )
+        self._child_offsets = None
+        self._descendant_index = None
+        self._ancestor_index = None
+        return revision_item
+
+    def _index_of(self, revision: str) -> int:
+        index = self._ids.get(revision, NO_INDEX)
+        if index == NO_INDEX or not self._present[index]:
+            raise KeyError(revision)
+        return index
+
+    def _build_children(self):
+        # Counting sort of loaded revisions by parent, stable in add order.
+        size = len(self._revisions)
+        offsets = array("q", bytes(8 * (size + 1)))
+        for index in self._added:
+            for parent in self._parent_indices(index):
+                if self._present[parent]:
+                    offsets[parent + 1] += 1
+        for index in range(size):
+            offsets[index + 1] += offsets[index]
+
+        cursor = array("q", offsets)
+        child_list = array("q", bytes(8 * offsets[size]))
+        for index in self._added:
+            for parent in self._parent_indices(index):
+                if self._present[parent]:
+                    child_list[cursor[parent]] = index
+                    cursor[parent] += 1
+        self._child_offsets, self._child_list = offsets, child_list
+
+    def _children_indices(self, index: int) -> array:
+        if self._child_offsets is None:
+            self._build_children()
+        return self._child_list[
+            self._child_offsets[index]:self._child_offsets[index + 1]
+        ]
+
+    def _children_count(self, index: int) -> int:
+        if self._child_offsets is None:
+            self._build_children()
+        return self._child_offsets[index + 1] - self._child_offsets[index]
+
+    def _first_child(self, index: int) -> int:
+        if self._children_count(index) == 0:
+            return NO_INDEX
+        return self._child_list[self._child_offsets[index]]
+
+    def __getitem__(self, revision: str) -> RevisionItemView:
+        return RevisionItemView(self, self._index_of(revision))
+
+    def get(self, revision, default=None):
+        try:
+            return self[revision]
+        except KeyError:
+            return default
+
+    def __contains__(self, revision) -> bool:
+        index = self._ids.get(revision, NO_INDEX)
+        return index != NO_INDEX and bool(self._present[index])
+
+    def __len__(self) -> int:
+        return len(self._added)
+
+    def __bool__(self) -> bool:
+        return len(self._added) > 0
+
+    def __iter__(self) -> Iterator[str]:
+        return self.keys()
+
+    def keys(self) -> Iterator[str]:
+        revisions = self._revisions
+        return (revisions[index] for index in self._added)
+
+    def values(self) -> Iterator[RevisionItemView]:
+        return (RevisionItemView(self, index) for index in self._added)
+
+    def items(self) -> Iterator[Tuple[str, RevisionItemView]]:
+        revisions = self._revisions
+        return (
+            (revisions[index], RevisionItemView(self, index))
+            for index in self._added
+        )
+
+    def __repr__(self) -> str:
+        return f"CompactRevisionStorage({list(self)!r})"
+
+    def __eq__(self, other) -> bool:
+        # The dict underneath is always empty, comparing it means nothing.
+        return self is other
+
+    def __ne__(self, other) -> bool:
+        return self is not other
+
+    __hash__ = None
+
+    def _unsupported(self, *args, **kwargs):
+        raise TypeError(
+            "CompactRevisionStorage is edited through add() and remove() only"
+        )
+
+    # Not kept in the underlying dict, so its mutators and copy would act
+    # on an empty dict.
+    __delitem__ = pop = popitem = setdefault = update = clear = _unsupported
+    copy = __ior__ = __or__ = __ror__ = _unsupported
+
+    @property
+    def root_revision(self) -> Optional[str]:
+        if self._root_index != NO_INDEX:
+            return self._revisions[self._root_index]
+        return next(iter(self.orphans), None)
+
+    @property
+    def orphans(self) -> List[str]:
+        present = self._present
+        return [
+            self._revisions[index]
+            for index in self._added
+            if not all(
+                present[parent] for parent in self._parent_indices(index)
+            )
+        ]
+
+    def find_first_multiparent(self) -> Union[str, None]:
+        root = self.root_revision
+        if root is None:
+            return None
+        if self.has_merges:
+            return self._first_unresolved_branch_point()
+        current = self._ids[root]
+        while True:
+            children_count = self._children_count(current)
+            if children_count == 0:
+                return None
+            if children_count > 1:
+                return self._revisions[current]
+            current = self._first_child(current)
+
+    def _last_descendant_index(self, index: int) -> int:
+        if self._child_offsets is None:
+            self._build_children()
+        offsets, child_list = self._child_offsets, self._child_list
+        while offsets[index + 1] > offsets[index]:
+            index = child_list[offsets[index]]
+        return index
+
+    def _get_last_descendant(self, ancestor: str) -> RevisionItemView:
+        index = self._last_descendant_index(self._index_of(ancestor))
+        return RevisionItemView(self, index)
+
+    def get_revisions_line(self) -> List[str]:
+        if self.has_merges:
+            return self.topological_order()
+        root = self.root_revision
+        current = self._ids[root]
+        revisions = [root, ]
+        current = self._first_child(current)
+        while current != NO_INDEX:
+            revisions.append(self._revisions[current])
+            current = self._first_child(current)
+        return revisions
+
+    def _reparent(self, revision_item, new_parent, old_parent=None):
+        parent_revisions = revision_item.parent_revisions
+        if len(parent_revisions) > 1:
+            revision_item.parent_revision = tuple(
+                new_parent.revision if parent == old_parent else parent
+                for parent in parent_revisions
+            )
+        else:
+            revision_item.parent_revision = new_parent.revision
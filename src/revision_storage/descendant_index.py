@@ -0,0 +1,191 @@
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    from .migxer_revision_storage import RevisionStorage
+
+
+class _Segment:
+    __slots__ = ("head", "end", "tip", "tip_generation", "head_depth",
+                 "depth_generation")
+
+    def __init__(self, head: str, end: str):
+        self.head = head
+        self.end = end
+        # Query results, valid while the generation matches the index's.
+        self.tip = end
+        self.tip_generation = -1
+        self.head_depth = 0
+        self.depth_generation = -1
+
+
+class DescendantIndex:
+    # The graph is cut into segments: maximal chains where every revision but
+    # the last one has exactly one child. A segment ends on a leaf or on a
+    # branching point, so "first branching point below" is the end of the
+    # segment, O(1). Positions are only meaningful inside one segment.
+    #
+    # tip/depth hop once per segment on the way down/up, that is once per
+    # branching point and not once per revision, and remember the answer
+    # on every segment they pass. Any link/unlink starts a new generation,
+    # so the first query after an edit costs O(branching points on the
+    # path) and repeated ones are O(1).
+    #
+    # Linking/unlinking an edge splits or merges at most two segments and
+    # relabels the shorter side: O(min(upper, lower)) revisions, which is
+    # O(n) at worst (a split in the middle of a long chain).
+    def __init__(self, storage: 'RevisionStorage'):
+        self.storage = storage
+        self._segment: Dict[str, _Segment] = {}
+        self._position: Dict[str, int] = {}
+        self._generation = 0
+        self._build()
+
+    def _build(self):
+        storage = self.storage
+        for revision in storage:
+            parent = self._parent(revision)
+            if parent is not None and len(storage[parent].children) == 1:
+                continue
+            segment = _Segment(revision, revision)
+            position = 0
+            while True:
+                self._segment[revision] = segment
+                self._position[revision] = position
+                children = storage[revision].children
+                if len(children) != 1:
+                    break
+                revision = children[0]
+                position += 1
+            segment.end = revision
+
+    def _parent(self, revision: str) -> Optional[str]:
+        # down_revision may be a 1-tuple, it is still a single parent.
+        parents = self.storage[revision].parent_revisions
+        if parents and parents[0] in self.storage:
+            return parents[0]
+        return None
+
+    def add_revision(self, revision: str):
+        self._segment[revision] = _Segment(revision, revision)
+        self._position[revision] = 0
+
+    def remove_revision(self, revision: str):
+        # The revision must already be unlinked from its parent and children.
+        del self._segment[revision]
+        del self._position[revision]
+
+    def first_branch_point(self, revision: str) -> Optional[str]:
+        end = self._segment[revision].end
+        if len(self.storage[end].children) > 1:
+            return end
+        return None
+
+    def tip(self, revision: str) -> str:
+        generation = self._generation
+        passed = []
+        segment = self._segment[revision]
+        while segment.tip_generation != generation:
+            passed.append(segment)
+            children = self.storage[segment.end].children
+            if not children:
+                tip = segment.end
+                break
+            segment = self._segment[children[0]]
+        else:
+            tip = segment.tip
+        for segment in passed:
+            segment.tip = tip
+            segment.tip_generation = generation
+        return tip
+
+    def depth(self, revision: str) -> int:
+        generation = self._generation
+        position = self._position
+        passed = []
+        segment = self._segment[revision]
+        while segment.depth_generation != generation:
+            parent = self._parent(segment.head)
+            if parent not in self._segment:
+                parent = None
+            passed.append((segment, parent))
+            if parent is None:
+                break
+            segment = self._segment[parent]
+        for segment, parent in reversed(passed):
+            if parent is None:
+                segment.head_depth = 0
+            else:
+                parent_segment = self._segment[parent]
+                segment.head_depth = (
+                    parent_segment.head_depth + position[parent]
+                    - position[parent_segment.head] + 1
+                )
+            segment.depth_generation = generation
+
+        segment = self._segment[revision]
+        return segment.head_depth + position[revision] - position[segment.head]
+
+    def link(self, parent: str, child: str, children_count: int):
+        self._generation += 1
+        if children_count == 1:
+            self._merge(self._segment[parent], self._segment[child])
+        elif children_count == 2:
+            first_child = self.storage[parent].children[0]
+            self._split(parent, first_child)
+
+    def unlink(self, parent: str, child: str, children_count: int):
+        self._generation += 1
+        if children_count == 0:
+            self._split(parent, child)
+        elif children_count == 1:
+            remaining_child = self.storage[parent].children[0]
+            self._merge(
+                self._segment[parent], self._segment[remaining_child]
+            )
+
+    def _walk_down(self, revision: str, end: str):
+        while True:
+            yield revision
+            if revision == end:
+                return
+            revision = self.storage[revision].children[0]
+
+    def _walk_up(self, revision: str, head: str):
+        while True:
+            yield revision
+            if revision == head:
+                return
+            revision = self._parent(revision)
+
+    def _merge(self, upper: _Segment, lower: _Segment):
+        position = self._position
+        upper_size = position[upper.end] - position[upper.head] + 1
+        lower_size = position[lower.end] - position[lower.head] + 1
+        if lower_size <= upper_size:
+            shift = position[upper.end] + 1 - position[lower.head]
+            for revision in self._walk_down(lower.head, lower.end):
+                self._segment[revision] = upper
+                position[revision] += shift
+            upper.end = lower.end
+        else:
+            shift = position[lower.head] - 1 - position[upper.end]
+            for revision in self._walk_up(upper.end, upper.head):
+                self._segment[revision] = lower
+                position[revision] += shift
+            lower.head = upper.head
+
+    def _split(self, last_upper: str, first_lower: str):
+        segment = self._segment[last_upper]
+        position = self._position
+        upper_size = position[last_upper] - position[segment.head] + 1
+        lower_size = position[segment.end] - position[last_upper]
+        if lower_size <= upper_size:
+            lower = _Segment(first_lower, segment.end)
+            for revision in self._walk_down(first_lower, segment.end):
+                self._segment[revision] = lower
+            segment.end = last_upper
+        else:
+            upper = _Segment(segment.head, last_upper)
+            for revision in self._walk_up(last_upper, segment.head):
+                self._segment[revision] = upper
+            segment.head = first_lower
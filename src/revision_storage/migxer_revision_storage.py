@@ -1,61 +1,253 @@
+import asyncio
+from collections import deque
 from datetime import datetime
-from typing import List, Optional, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-from .revision_item import RevisionItem
+from src.stats import HookEmitter
+from src.writer import BatchWriter, SourceCache
+
+from .ancestor_index import AncestorIndex
+from .descendant_index import DescendantIndex
+from .ordering import CreateDateOrdering, FixIsImpossible, OrderingStrategy
+from .revision_item import DownRevision, RevisionItem
+from .snapshot import dump_snapshot, load_snapshot
+
+# FixIsImpossible used to be defined here and is still imported from here.
+__all__ = [
+    "FixIsImpossible", "ParentNotFoundException", "RevisionsCycleException",
+    "RevisionStorage",
+]
 
 
 class ParentNotFoundException(Exception):
     pass
 
 
-class FixIsImpossible(Exception):
+class RevisionsCycleException(Exception):
     pass
 
 
-class RevisionStorage(dict):
+class RevisionStorage(dict, HookEmitter):
+    def __init__(self):
+        super().__init__()
+        self.hooks = []
+        # Decides which sibling branch is the elder one when fixing.
+        self.ordering: OrderingStrategy = CreateDateOrdering()
+        # Sources kept by the parser, so writing a fix reads no file again.
+        self.source_cache: Optional[SourceCache] = None
+        # Set while fix_and_write() runs.
+        self._fixing = False
+        self._root_revision: Optional[str] = None
+        # Orphans are kept twice: in insertion order with the number of
+        # parents still missing, and grouped by the missing parent, so
+        # adoption is a single dict pop.
+        self._orphans: Dict[str, int] = {}
+        self._orphans_by_parent: Dict[str, List[str]] = {}
+        self._descendant_index: Optional[DescendantIndex] = None
+        self._ancestor_index: Optional[AncestorIndex] = None
+        # Revisions with several parents. While there are none the history is
+        # a tree and queries go through the DescendantIndex.
+        self._merge_count: int = 0
+
+    @classmethod
+    def from_edges(
+        cls, edges: Iterable[Union[RevisionItem, Tuple]]
+    ) -> 'RevisionStorage':
+        # Tuples are (revision, down_revision[, revision_date[, filepath[,
+        # depends_on]]]).
+        # Children keep the order of ``edges``.
+        storage = cls()
+        for edge in edges:
+            if not isinstance(edge, RevisionItem):
+                edge = cls._edge_to_revision_item(*edge)
+            storage.__setitem__(edge.revision, edge)
+
+        for revision_item in storage.values():
+            storage._update_parent(revision_item)
+        return storage
+
+    @classmethod
+    def from_snapshot(
+        cls, path: str, fingerprint: Optional[bytes] = None
+    ) -> 'RevisionStorage':
+        # Raises SnapshotMismatch when ``fingerprint`` is given and differs
+        # from the one the snapshot was saved with.
+        return cls.from_edges(load_snapshot(path, fingerprint))
+
+    def save_snapshot(self, path: str, fingerprint: bytes = b""):
+        dump_snapshot(self, path, fingerprint)
+
+    @staticmethod
+    def _edge_to_revision_item(
+        revision: str, down_revision: DownRevision,
+        revision_date: Optional[datetime] = None,
+        original_filepath: Optional[str] = None,
+        depends_on: Tuple[str, ...] = ()
+    ) -> RevisionItem:
+        return RevisionItem(
+            revision=revision,
+            parent_revision=down_revision,
+            revision_date=revision_date,
+            original_filepath=original_filepath,
+            depends_on=tuple(depends_on)
+        )
+
+    @property
+    def root_revision(self) -> Optional[str]:
+        if self._root_revision is not None:
+            return self._root_revision
+        # Partial histories have no None-parent revision, their base is the
+        # first revision whose parent was never loaded.
+        return next(iter(self._orphans), None)
+
+    @property
+    def orphans(self) -> List[str]:
+        return list(self._orphans)
+
+    @property
+    def has_merges(self) -> bool:
+        return self._merge_count > 0
+
+    @property
+    def descendant_index(self) -> DescendantIndex:
+        # Built on first query, then kept in sync by every edge change.
+        if self._descendant_index is None:
+            self._descendant_index = DescendantIndex(self)
+        return self._descendant_index
+
+    @property
+    def ancestor_index(self) -> AncestorIndex:
+        # Same lifecycle as the DescendantIndex, trees only.
+        if self._ancestor_index is None:
+            self._ancestor_index = AncestorIndex(self)
+        return self._ancestor_index
+
     def add(
         self, rev_item: Optional[RevisionItem] = None,
-        revision: Optional[str] = None, down_revision: Optional[str] = None,
+        revision: Optional[str] = None, down_revision: DownRevision = None,
         revision_date: Optional[datetime] = None,
-        original_filepath: Optional[str] = None
+        original_filepath: Optional[str] = None,
+        depends_on: Tuple[str, ...] = ()
     ):
         if not rev_item:
             rev_item = RevisionItem(
                 revision=revision,
                 parent_revision=down_revision,
                 revision_date=revision_date,
-                original_filepath=original_filepath
+                original_filepath=original_filepath,
+                depends_on=tuple(depends_on)
             )
         self._add(rev_item)
 
     def _add(self, revision_item: RevisionItem):
-        if len(self) == 0:
-            self.root_revision = revision_item.revision
-            self.__setitem__(revision_item.revision, revision_item)
-            self.orphans = []
-            return
+        if self._descendant_index is not None:
+            if revision_item.revision in self:
+                self._descendant_index = None
+            else:
+                self._descendant_index.add_revision(revision_item.revision)
+        if self._ancestor_index is not None:
+            if revision_item.revision in self:
+                self._ancestor_index = None
+            else:
+                self._ancestor_index.add_revision(revision_item.revision)
         self.__setitem__(revision_item.revision, revision_item)
         self._update_parent(revision_item)
         self._check_orphans(revision_item)
 
     def _update_parent(self, revision_item: RevisionItem):
-        parent = self.get(revision_item.parent_revision)
-        if not parent:
-            self.orphans.append(revision_item.revision)
-        else:
-            parent.children.append(revision_item.revision)
+        parent_revisions = revision_item.parent_revisions
+        if not parent_revisions:
+            if self._root_revision is None:
+                self._root_revision = revision_item.revision
+            return
+        if len(parent_revisions) > 1:
+            self._merge_count += 1
+            self._descendant_index = None
+            self._ancestor_index = None
+
+        for parent_revision in parent_revisions:
+            parent = self.get(parent_revision)
+            if not parent:
+                self._orphans[revision_item.revision] = (
+                    self._orphans.get(revision_item.revision, 0) + 1
+                )
+                self._orphans_by_parent.setdefault(
+                    parent_revision, []
+                ).append(revision_item.revision)
+            else:
+                parent.children.append(revision_item.revision)
+                self._on_link(parent, revision_item.revision)
 
     def _check_orphans(self, new_parent: RevisionItem):
-        _adopted_idxs = []
-        for orphan_idx in range(0, len(self.orphans)):
-            orphan = self.orphans[orphan_idx]
-            orphan_item = self.get(orphan)
-            if orphan_item.parent_revision == new_parent.revision:
-                new_parent.children.append(orphan)
-                _adopted_idxs.append(orphan_idx)
+        adopted = self._orphans_by_parent.pop(new_parent.revision, None)
+        if not adopted:
+            return
 
-        for child_idx in _adopted_idxs:
-            del self.orphans[child_idx]
+        for orphan in adopted:
+            self._orphans[orphan] -= 1
+            if not self._orphans[orphan]:
+                del self._orphans[orphan]
+            new_parent.children.append(orphan)
+            self._on_link(new_parent, orphan)
+
+    def remove(self, revision: str) -> RevisionItem:
+        revision_item = self[revision]
+        parent_revisions = revision_item.parent_revisions
+        if len(parent_revisions) > 1:
+            self._merge_count -= 1
+        self._orphans.pop(revision, None)
+        for parent_revision in parent_revisions:
+            siblings = self._orphans_by_parent.get(parent_revision)
+            if siblings and revision in siblings:
+                siblings.remove(revision)
+                if not siblings:
+                    del self._orphans_by_parent[parent_revision]
+
+        orphaned_children = list(revision_item.children)
+        while revision_item.children:
+            child = revision_item.children.pop()
+            self._on_unlink(revision_item, child)
+        for child in orphaned_children:
+            self._orphans[child] = self._orphans.get(child, 0) + 1
+        if orphaned_children:
+            self._orphans_by_parent[revision] = orphaned_children
+
+        for parent_revision in parent_revisions:
+            parent = self.get(parent_revision)
+            if parent:
+                parent.children.remove(revision)
+                self._on_unlink(parent, revision)
+        if self._descendant_index is not None:
+            self._descendant_index.remove_revision(revision)
+        if self._ancestor_index is not None:
+            self._ancestor_index.remove_revision(revision)
+
+        del self[revision]
+        if self._root_revision == revision:
+            self._root_revision = next(
+                (
+                    item.revision for item in self.values()
+                    if not item.parent_revisions
+                ),
+                None,
+            )
+        return revision_item
+
+    def _on_link(self, parent: RevisionItem, child: str):
+        if self._descendant_index is not None:
+            self._descendant_index.link(
+                parent.revision, child, len(parent.children)
+            )
+        if self._ancestor_index is not None:
+            self._ancestor_index.link(parent.revision, child)
+
+    def _on_unlink(self, parent: RevisionItem, child: str):
+        if self._descendant_index is not None:
+            self._descendant_index.unlink(
+                parent.revision, child, len(parent.children)
+            )
+        if self._ancestor_index is not None:
+            self._ancestor_index.unlink(parent.revision, child)
 
     def get_conflict_place_str(self, multiparent: Optional[str] = None) -> str:
         if not multiparent:
@@ -98,64 +290,317 @@ class RevisionStorage(dict):
         return result_string
 
     def find_first_multiparent(self) -> Union[str, None]:
-        current_revision = self.root_revision
-        while current_revision:
-            item = self[current_revision]
-            children_len = len(item.children)
-            if children_len == 0:
-                return
+        if self.root_revision is None:
+            return None
+        if not self.has_merges:
+            return self.descendant_index.first_branch_point(self.root_revision)
+        return self._first_unresolved_branch_point()
+
+    def heads(self) -> List[str]:
+        return [revision for revision, item in self.items() if not item.children]
+
+    def branch_points(self) -> List[str]:
+        return [
+            revision for revision in self.topological_order()
+            if len(self[revision].children) > 1
+        ]
+
+    def topological_order(self) -> List[str]:
+        # Kahn's algorithm over down_revision and depends_on edges, so every
+        # revision comes after its parents and dependencies. Edges to
+        # revisions that are not loaded are ignored.
+        in_degree: Dict[str, int] = {}
+        dependents: Dict[str, List[str]] = {}
+        for revision, item in self.items():
+            degree = 0
+            for parent_revision in item.parent_revisions:
+                if parent_revision in self:
+                    degree += 1
+            for dependency in item.depends_on:
+                if dependency in self:
+                    degree += 1
+                    dependents.setdefault(dependency, []).append(revision)
+            in_degree[revision] = degree
+
+        ready = deque(
+            revision for revision, degree in in_degree.items() if not degree
+        )
+        order = []
+        while ready:
+            revision = ready.popleft()
+            order.append(revision)
+            for successors in (
+                self[revision].children, dependents.get(revision, ())
+            ):
+                for successor in successors:
+                    in_degree[successor] -= 1
+                    if not in_degree[successor]:
+                        ready.append(successor)
+
+        if len(order) != len(in_degree):
+            cycle = [revision for revision, degree in in_degree.items() if degree]
+            raise RevisionsCycleException(f"Revisions form a cycle: {cycle}")
+        return order
+
+    def is_ancestor(self, ancestor: str, revision: str) -> bool:
+        # A revision counts as its own ancestor.
+        if not self.has_merges:
+            return self.ancestor_index.is_ancestor(ancestor, revision)
+        if ancestor not in self:
+            raise KeyError(ancestor)
+        return ancestor in self._ancestor_distances(revision)
+
+    def lowest_common_ancestor(
+        self, revision: str, *revisions: str
+    ) -> Optional[str]:
+        # None when the revisions come from separate trees of a partial
+        # history. With merges there may be several lowest ones, the latest
+        # in topological order wins.
+        if not self.has_merges:
+            index = self.ancestor_index
+            common = revision
+            for other in revisions:
+                common = index.lowest_common_ancestor(common, other)
+                if common is None:
+                    return None
+            return common
+        common_ancestors = set(self._ancestor_distances(revision))
+        for other in revisions:
+            common_ancestors.intersection_update(self._ancestor_distances(other))
+        if not common_ancestors:
+            return None
+        if len(common_ancestors) == 1:
+            return common_ancestors.pop()
+        return next(
+            ancestor for ancestor in reversed(self.topological_order())
+            if ancestor in common_ancestors
+        )
 
-            if children_len > 1:
-                return current_revision
+    def distance(self, first: str, second: str) -> Optional[int]:
+        # Number of edges on the shortest path through a common ancestor.
+        if not self.has_merges:
+            return self.ancestor_index.distance(first, second)
+        first_distances = self._ancestor_distances(first)
+        second_distances = self._ancestor_distances(second)
+        return min(
+            (
+                distance + second_distances[ancestor]
+                for ancestor, distance in first_distances.items()
+                if ancestor in second_distances
+            ),
+            default=None,
+        )
 
-            current_revision = item.children[0]
+    def _ancestor_distances(self, revision: str) -> Dict[str, int]:
+        # Breadth-first over every parent, the fallback once there are merges.
+        distances = {revision: 0}
+        queue = deque([revision])
+        while queue:
+            current = queue.popleft()
+            for parent in self[current].parent_revisions:
+                if parent in self and parent not in distances:
+                    distances[parent] = distances[current] + 1
+                    queue.append(parent)
+        return distances
+
+    def conflict_points(self) -> List[str]:
+        # Every branch point that needs a fix, not just the first one.
+        if not self.has_merges:
+            return self.branch_points()
+        return list(self._unresolved_branch_points())
+
+    def _first_unresolved_branch_point(self) -> Optional[str]:
+        return next(self._unresolved_branch_points(), None)
+
+    def _unresolved_branch_points(self) -> Iterator[str]:
+        # Branches that merge back are not a conflict. Heads reachable from
+        # every revision are collected as a bitmask in reverse topological
+        # order; a conflict is a branch point whose children reach different
+        # heads.
+        order = self.topological_order()
+        reachable_heads: Dict[str, int] = {}
+        heads_count = 0
+        for revision in reversed(order):
+            children = self[revision].children
+            if not children:
+                reachable_heads[revision] = 1 << heads_count
+                heads_count += 1
+                continue
+            mask = 0
+            for child in children:
+                mask |= reachable_heads[child]
+            reachable_heads[revision] = mask
+
+        for revision in order:
+            children = self[revision].children
+            if len({reachable_heads[child] for child in children}) > 1:
+                yield revision
 
     FixWasMaden = bool
 
     def fix_revision_conflict(
         self, multiparent: Optional[str] = None
     ) -> FixWasMaden:
-        # TODO: actualy, infinite children from multiparent can be fixed
-        # in such (date comparison) manner and all we need to do this - sort'em
-        # and sequentially add this branches to eachother. Same as here, but
-        # with sorting. This would be much more nice & abstract way of
-        # datetime-based fixing.
-
-        multiparent = multiparent or self.find_first_multiparent()
-        if not multiparent:
-            return False
-
-        left_child, right_child = self[multiparent].children
-        elder_child, younger_child = None, None
-        multiparent = self[multiparent]
-
-        if left_child == right_child:
-            raise FixIsImpossible()
+        # Every branching point under ``multiparent`` (all the bases by
+        # default) is linearized in one go: branches are sorted by date and
+        # each one is chained onto the tip of the previous one.
+        with self._measure_phase("conflict_fixing"):
+            fix_plan = self.plan_conflict_fix(multiparent)
+            if not fix_plan:
+                return False
+
+            # A merge revision may be moved under several branch points but
+            # is written once.
+            to_rewrite: Dict[str, RevisionItem] = {}
+            for revision, new_parent, old_parent in fix_plan:
+                revision_item = self[revision]
+                self._reparent(revision_item, self[new_parent], old_parent)
+                to_rewrite[revision] = revision_item
+            self.revisions_to_rewrite = list(to_rewrite.values())
+            self.revision_to_rewrite = self.revisions_to_rewrite[-1]
+        self._emit("conflicts_fixed", count=len(fix_plan))
+        return True
 
-        if left_child > right_child:
-            elder_child, younger_child = right_child, left_child
-            del multiparent.children[0]
+    # (revision, new_parent, old_parent)
+    ReparentPlan = List[Tuple[str, str, str]]
+
+    def plan_conflict_fix(self, start: Optional[str] = None) -> ReparentPlan:
+        order = self.topological_order()
+        if start is not None:
+            descendants = self._descendants(start)
+            order = [revision for revision in order if revision in descendants]
+
+        # Revisions are planned children first, so the tip of each (already
+        # linearized) child branch is known. Children sharing a tip merge
+        # back and form one branch. Once a branch is chained onto another,
+        # the elder tip is redirected to the younger one.
+        fix_plan = []
+        tips: Dict[str, str] = {}
+        redirects: Dict[str, str] = {}
+        for revision in reversed(order):
+            children = self[revision].children
+            if not children:
+                tips[revision] = revision
+                continue
+
+            branches: Dict[str, List[str]] = {}
+            for child in children:
+                tip = self._resolve_tip(redirects, tips[child])
+                branches.setdefault(tip, []).append(child)
+            ordered_tips = self._order_branches(branches)
+            for elder_tip, younger_tip in zip(ordered_tips, ordered_tips[1:]):
+                for younger in branches[younger_tip]:
+                    fix_plan.append((younger, elder_tip, revision))
+                redirects[elder_tip] = younger_tip
+            tips[revision] = ordered_tips[-1]
+        return fix_plan
+
+    def _descendants(self, revision: str) -> set:
+        descendants = {revision}
+        stack = [revision]
+        while stack:
+            for child in self[stack.pop()].children:
+                if child not in descendants:
+                    descendants.add(child)
+                    stack.append(child)
+        return descendants
+
+    @staticmethod
+    def _resolve_tip(redirects: Dict[str, str], tip: str) -> str:
+        resolved = tip
+        while resolved in redirects:
+            resolved = redirects[resolved]
+        while tip in redirects and redirects[tip] != resolved:
+            redirects[tip], tip = resolved, redirects[tip]
+        return resolved
+
+    def _order_branches(self, branches: Dict[str, List[str]]) -> List[str]:
+        if len(branches) == 1:
+            return list(branches)
+        # A branch is as old as its eldest first revision.
+        tips_by_first_revision = {}
+        for tip, children in branches.items():
+            first = children[0]
+            if len(children) > 1:
+                first = self._order_siblings_loosely(children)[0]
+            tips_by_first_revision[first] = tip
+        return [
+            tips_by_first_revision[revision]
+            for revision in self._order_siblings(list(tips_by_first_revision))
+        ]
+
+    def _order_siblings_loosely(self, children: List[str]) -> List[str]:
+        # Siblings that merge back later may share a date.
+        items = [self[child] for child in children]
+        return [item.revision for item in self.ordering.order(items, False)]
+
+    def _order_siblings(self, children: List[str]) -> List[str]:
+        if len(children) == 1:
+            return children
+        items = [self[child] for child in children]
+        return [item.revision for item in self.ordering.order(items)]
+
+    def _reparent(
+        self, revision_item: RevisionItem, new_parent: RevisionItem,
+        old_parent: Optional[str] = None
+    ):
+        parent_revisions = revision_item.parent_revisions
+        if old_parent is None and parent_revisions:
+            old_parent = parent_revisions[0]
+        old_parent_item = self.get(old_parent)
+        if old_parent_item:
+            old_parent_item.children.remove(revision_item.revision)
+            self._on_unlink(old_parent_item, revision_item.revision)
+        if len(parent_revisions) > 1:
+            # Only the conflicting edge of a merge revision is moved.
+            revision_item.parent_revision = tuple(
+                new_parent.revision if parent == old_parent else parent
+                for parent in parent_revisions
+            )
         else:
-            elder_child, younger_child = left_child, right_child
-            del multiparent.children[1]
-
-        elder_child, younger_child = self[elder_child], self[younger_child]
-        self.revision_to_rewrite = younger_child
-
-        last_descendant_of_elder_child = self._get_last_descendant(
-            elder_child.revision
-        )
-        younger_child.parent_revision = last_descendant_of_elder_child.revision
-        last_descendant_of_elder_child.children.append(younger_child.revision)
-        return True
+            revision_item.parent_revision = new_parent.revision
+        new_parent.children.append(revision_item.revision)
+        self._on_link(new_parent, revision_item.revision)
 
     def _get_last_descendant(self, ancestor: str) -> RevisionItem:
+        if not self.has_merges:
+            return self[self.descendant_index.tip(ancestor)]
         current = self[ancestor]
         while current.children:
             current = self[current.children[0]]
         return current
 
+    def graph_depth(self) -> int:
+        if self.has_merges:
+            return self._longest_path_length()
+        index = self.descendant_index
+        leaves = (
+            revision for revision, item in self.items() if not item.children
+        )
+        return max((index.depth(leaf) for leaf in leaves), default=-1) + 1
+
+    def _longest_path_length(self) -> int:
+        depths: Dict[str, int] = {}
+        for revision in self.topological_order():
+            depths[revision] = max(
+                (
+                    depths[parent] + 1
+                    for parent in self[revision].parent_revisions
+                    if parent in depths
+                ),
+                default=0,
+            )
+        return max(depths.values(), default=-1) + 1
+
+    def get_revisions_line_length(self) -> int:
+        if self.has_merges:
+            return self._longest_path_length()
+        last_descendant = self.descendant_index.tip(self.root_revision)
+        return self.descendant_index.depth(last_descendant) + 1
+
     def get_revisions_line(self) -> List[str]:
+        if self.has_merges:
+            return self.topological_order()
         revisions = [self.root_revision, ]
         current = self[self.root_revision]
         while current.children:
@@ -163,11 +608,33 @@ class RevisionStorage(dict):
             revisions.append(current.revision)
         return revisions
 
-    def wtite_fix_to_file(self):
-        revision_to_rewrite: Optional[RevisionItem] = getattr(
-            self, "revision_to_rewrite"
+    def wtite_fix_to_file(self) -> List[str]:
+        revisions_to_rewrite: List[RevisionItem] = getattr(
+            self, "revisions_to_rewrite", []
         )
-        if not revision_to_rewrite:
-            return
-
-        revision_to_rewrite.serialize_to_revision_file()
+        with self._measure_phase("writing"):
+            batch_writer = BatchWriter(source_cache=self.source_cache)
+            for revision_to_rewrite in revisions_to_rewrite:
+                batch_writer.add(revision_to_rewrite)
+            written = batch_writer.commit()
+        self._emit("files_written", count=len(written))
+        return written
+
+    async def fix_and_write(
+        self, multiparent: Optional[str] = None
+    ) -> List[str]:
+        # fix_revision_conflict() and wtite_fix_to_file() in a worker thread,
+        # one call at a time per storage: a second call while one is running
+        # would rewrite the graph under the first one's writer.
+        if self._fixing:
+            raise RuntimeError("fix_and_write is already running")
+        self._fixing = True
+        try:
+            fix_was_maden = await asyncio.to_thread(
+                self.fix_revision_conflict, multiparent
+            )
+            if not fix_was_maden:
+                return []
+            return await asyncio.to_thread(self.wtite_fix_to_file)
+        finally:
+            self._fixing = False
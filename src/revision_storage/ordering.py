@@ -0,0 +1,77 @@
+from typing import Any, List, Optional, Sequence
+
+from .revision_item import RevisionItem
+
+
+class FixIsImpossible(Exception):
+    pass
+
+
+class OrderingStrategy:
+    # Decides which of several sibling branches is the elder one when a
+    # conflict is linearized. Subclasses give every revision a sort key, or
+    # None when they know nothing about it.
+    describes: str = "key"
+
+    def key(self, revision_item: RevisionItem) -> Optional[Any]:
+        raise NotImplementedError
+
+    def order(
+        self, revision_items: Sequence[RevisionItem], strict: bool = True
+    ) -> List[RevisionItem]:
+        # ``strict`` refuses ties, siblings that merge back later may share
+        # a key.
+        keys = [self.key(item) for item in revision_items]
+        unknown = [
+            item.revision for item, key in zip(revision_items, keys)
+            if key is None
+        ]
+        if unknown:
+            raise FixIsImpossible(
+                f"Can't order revisions without a {self.describes}: {unknown}"
+            )
+        ordered = sorted(
+            range(len(revision_items)), key=keys.__getitem__
+        )
+        if strict:
+            for elder, younger in zip(ordered, ordered[1:]):
+                if keys[elder] == keys[younger]:
+                    raise FixIsImpossible(
+                        f"{revision_items[elder].revision} and "
+                        f"{revision_items[younger].revision} have the same "
+                        f"{self.describes}"
+                    )
+        return [revision_items[index] for index in ordered]
+
+
+class CreateDateOrdering(OrderingStrategy):
+    # The "Create Date" line alembic writes into the docstring.
+    describes = "date"
+
+    def key(self, revision_item: RevisionItem) -> Optional[Any]:
+        return revision_item.revision_date
+
+
+class FallbackOrdering(OrderingStrategy):
+    # Tries its strategies in turn for every group of siblings, the first
+    # one that can order the whole group wins. Keys of different strategies
+    # are never compared with each other.
+    def __init__(self, *strategies: OrderingStrategy):
+        self.strategies = strategies
+        self.describes = " or ".join(
+            strategy.describes for strategy in strategies
+        )
+
+    def key(self, revision_item: RevisionItem) -> Optional[Any]:
+        raise NotImplementedError
+
+    def order(
+        self, revision_items: Sequence[RevisionItem], strict: bool = True
+    ) -> List[RevisionItem]:
+        errors = []
+        for strategy in self.strategies:
+            try:
+                return strategy.order(revision_items, strict)
+            except FixIsImpossible as exc:
+                errors.append(str(exc))
+        raise FixIsImpossible("; ".join(errors))
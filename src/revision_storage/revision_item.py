@@ -1,19 +1,85 @@
 import ast
+import os
 
 from dataclasses import dataclass, field
-from datetime import datetime
-from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple, Union
 
+from src.scanner import LazyDate
 from src.transformer import AssignmentsTransformer
+from src.writer import (
+    CachedSource, PatchNotApplicable, RevisionFilePatcher, SourceCache,
+    write_temp_file,
+)
+
+
+DownRevision = Union[None, str, Tuple[str, ...]]
+
+# Dates as int64 microseconds since 1970, for compact storage and snapshots.
+NO_DATE = -(2 ** 63)
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _date_to_int(revision_date: Optional[datetime]) -> int:
+    if revision_date is None:
+        return NO_DATE
+    return (revision_date - _EPOCH) // _MICROSECOND
+
+
+def _int_to_date(value: int) -> Optional[datetime]:
+    if value == NO_DATE:
+        return None
+    return _EPOCH + value * _MICROSECOND
+
+
+def as_revisions_tuple(value: DownRevision) -> Tuple[str, ...]:
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        return (value,)
+    return tuple(value)
+
+
+class _LazyRevisionDate:
+    # Dataclass field descriptor: a LazyDate assigned to the field is loaded
+    # and replaced by its value on first read.
+    def __set_name__(self, owner, name: str):
+        self._attribute = "_" + name
+
+    def __get__(self, instance, owner=None) -> Optional[datetime]:
+        if instance is None:
+            return None
+        value = instance.__dict__.get(self._attribute)
+        if isinstance(value, LazyDate):
+            value = value.load()
+            instance.__dict__[self._attribute] = value
+        return value
+
+    def __set__(self, instance, value: Union[None, datetime, LazyDate]):
+        instance.__dict__[self._attribute] = value
 
 
 @dataclass
 class RevisionItem:
     revision: str
     original_filepath: str
-    parent_revision: Optional[str] = None
-    revision_date: Optional[datetime] = None
+    # A merge revision has a tuple of parents, like alembic's down_revision.
+    parent_revision: DownRevision = None
+    # Only branching revisions need a date, so parsers hand in a LazyDate.
+    revision_date: Optional[datetime] = _LazyRevisionDate()
     children: Optional[List[str]] = field(default_factory=list)
+    depends_on: Tuple[str, ...] = ()
+
+    @property
+    def parent_revisions(self) -> Tuple[str, ...]:
+        return as_revisions_tuple(self.parent_revision)
+
+    @property
+    def lazy_revision_date(self) -> Optional[LazyDate]:
+        # The pending LazyDate, None once the date is loaded.
+        value = self.__dict__.get("_revision_date")
+        return value if isinstance(value, LazyDate) else None
 
     def __str__(self) -> str:
         if self.revision_date:
@@ -27,7 +93,7 @@ class RevisionItem:
         raise NotImplementedError()
 
     @property
-    def assignments_ids_values_map(self) -> Dict[str, str]:
+    def assignments_ids_values_map(self) -> Dict[str, DownRevision]:
         return {
             "revision": self.revision,
             "down_revision": self.parent_revision
@@ -44,17 +110,42 @@ class RevisionItem:
         return self.revision_date < other.revision_date
 
     def serialize_to_revision_file(
-        self, transformer: ast.NodeTransformer = AssignmentsTransformer
+        self, transformer: ast.NodeTransformer = AssignmentsTransformer,
+        source_cache: Optional[SourceCache] = None
     ) -> str:
-        parsed_tree = None
-        transformer = AssignmentsTransformer(self.assignments_ids_values_map)
-        with open(self.original_filepath, 'r') as revision_file:
-            raw_file = revision_file.read()
-            parsed_tree = ast.parse(raw_file)
-        new_tree = transformer.visit(parsed_tree)
-        new_source_string = ast.unparse(new_tree)
+        temp_path = self.prepare_revision_file(transformer, source_cache)
+        if temp_path is not None:
+            os.replace(temp_path, self.original_filepath)
+        return self.original_filepath
 
-        with open(self.original_filepath, 'w') as revision_file:
-            revision_file.write(new_source_string)
+    def prepare_revision_file(
+        self, transformer: ast.NodeTransformer = AssignmentsTransformer,
+        source_cache: Optional[SourceCache] = None
+    ) -> Optional[str]:
+        cached = None
+        if source_cache is not None:
+            cached = source_cache.take(self.original_filepath)
+        try:
+            return RevisionFilePatcher(self.original_filepath).prepare(
+                self.assignments_ids_values_map, cached
+            )
+        except PatchNotApplicable:
+            return self._unparse_to_temp_file(transformer, cached)
 
-        return self.original_filepath
+    def _unparse_to_temp_file(
+        self, transformer: ast.NodeTransformer = AssignmentsTransformer,
+        cached: Optional[CachedSource] = None
+    ) -> str:
+        transformer = transformer(self.assignments_ids_values_map)
+        if cached is None:
+            with open(self.original_filepath, 'r') as revision_file:
+                parsed_tree = ast.parse(revision_file.read())
+        elif cached.tree is not None:
+            parsed_tree = cached.tree
+        else:
+            parsed_tree = ast.parse(cached.source)
+        new_tree = transformer.visit(parsed_tree)
+        new_source_string = ast.unparse(new_tree)
+        return write_temp_file(
+            self.original_filepath, new_source_string.encode()
+        )
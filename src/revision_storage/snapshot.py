@@ -0,0 +1,190 @@
+import hashlib
+import struct
+import sys
+from array import array
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
+
+from src.scanner import LazyDate
+from src.writer import atomic_write
+
+from .revision_item import NO_DATE, DownRevision, _date_to_int, _int_to_date
+
+if TYPE_CHECKING:
+    from .migxer_revision_storage import RevisionStorage
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class SnapshotMismatch(SnapshotError):
+    pass
+
+
+SnapshotEdge = Tuple[
+    str, DownRevision, Union[None, datetime, LazyDate], Optional[str],
+    Tuple[str, ...]
+]
+
+
+# Layout, little-endian:
+#   magic | version u32 | fingerprint (u32 length + bytes) | revisions u64
+#   ids        "\0"-joined utf-8, loaded revisions first, then ids that are
+#              only referenced as parents/dependencies
+#   paths      "\0"-joined utf-8, "" for revisions without a file
+#   dates      int64 microseconds since 1970, NO_DATE for unknown or lazy
+#   date lines "\0"-joined raw "Create Date" lines of dates not loaded yet,
+#              "" for the others
+#   parents    CSR: int64 offsets (revisions + 1) and int64 id indices
+#   depends_on CSR, same as parents
+#   checksum   blake2b-16 of everything above
+# Every section but the header is a u64 length followed by its bytes.
+SNAPSHOT_MAGIC = b"MIGXSNAP"
+SNAPSHOT_VERSION = 2
+_CHECKSUM_SIZE = 16
+
+
+def _int_array(values) -> bytes:
+    packed = array("q", values)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _read_int_array(raw: bytes) -> array:
+    unpacked = array("q")
+    unpacked.frombytes(raw)
+    if sys.byteorder != "little":
+        unpacked.byteswap()
+    return unpacked
+
+
+def _section(raw: bytes) -> bytes:
+    return struct.pack("<Q", len(raw)) + raw
+
+
+def dump_snapshot(
+    storage: 'RevisionStorage', path: str, fingerprint: bytes = b""
+):
+    # Dates not loaded yet are stored as their raw "Create Date" line and
+    # come back lazy, so saving reads no migration. Only a lazy date whose
+    # line wasn't met while scanning is loaded here.
+    ids: Dict[str, int] = {revision: index for index, revision in enumerate(storage)}
+    revisions_count = len(ids)
+
+    def intern(revision: str) -> int:
+        return ids.setdefault(revision, len(ids))
+
+    paths, dates, date_lines = [], [], []
+    parent_offsets, parent_indices = [0], []
+    depends_offsets, depends_indices = [0], []
+    for item in storage.values():
+        paths.append(item.original_filepath or "")
+        lazy_revision_date = item.lazy_revision_date
+        if lazy_revision_date is not None and lazy_revision_date.date_line:
+            dates.append(NO_DATE)
+            date_lines.append(lazy_revision_date.date_line)
+        else:
+            dates.append(_date_to_int(item.revision_date))
+            date_lines.append("")
+        parent_indices.extend(intern(parent) for parent in item.parent_revisions)
+        parent_offsets.append(len(parent_indices))
+        depends_indices.extend(intern(revision) for revision in item.depends_on)
+        depends_offsets.append(len(depends_indices))
+
+    payload = b"".join((
+        SNAPSHOT_MAGIC,
+        struct.pack("<I", SNAPSHOT_VERSION),
+        struct.pack("<I", len(fingerprint)), fingerprint,
+        struct.pack("<Q", revisions_count),
+        _section("\0".join(ids).encode()),
+        _section("\0".join(paths).encode()),
+        _section(_int_array(dates)),
+        _section("\0".join(date_lines).encode()),
+        _section(_int_array(parent_offsets)),
+        _section(_int_array(parent_indices)),
+        _section(_int_array(depends_offsets)),
+        _section(_int_array(depends_indices)),
+    ))
+    checksum = hashlib.blake2b(payload, digest_size=_CHECKSUM_SIZE).digest()
+    atomic_write(path, payload + checksum)
+
+
+def read_snapshot_fingerprint(path: str) -> bytes:
+    with open(path, "rb") as snapshot_file:
+        header = snapshot_file.read(len(SNAPSHOT_MAGIC) + 8)
+        if len(header) < len(SNAPSHOT_MAGIC) + 8:
+            raise SnapshotError("Snapshot is truncated")
+        _check_header(header)
+        (size, ) = struct.unpack_from("<I", header, len(SNAPSHOT_MAGIC) + 4)
+        return snapshot_file.read(size)
+
+
+def _check_header(raw: bytes):
+    if raw[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        raise SnapshotError("Not a revisions snapshot")
+    (version, ) = struct.unpack_from("<I", raw, len(SNAPSHOT_MAGIC))
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {version}")
+
+
+def load_snapshot(
+    path: str, fingerprint: Optional[bytes] = None
+) -> List[SnapshotEdge]:
+    with open(path, "rb") as snapshot_file:
+        raw = snapshot_file.read()
+    if len(raw) < len(SNAPSHOT_MAGIC) + 8 + _CHECKSUM_SIZE:
+        raise SnapshotError("Snapshot is truncated")
+    payload, checksum = raw[:-_CHECKSUM_SIZE], raw[-_CHECKSUM_SIZE:]
+    _check_header(payload)
+    if hashlib.blake2b(payload, digest_size=_CHECKSUM_SIZE).digest() != checksum:
+        raise SnapshotError("Snapshot is corrupted")
+
+    offset = len(SNAPSHOT_MAGIC) + 4
+    (size, ) = struct.unpack_from("<I", payload, offset)
+    offset += 4
+    stored_fingerprint = payload[offset:offset + size]
+    offset += size
+    if fingerprint is not None and fingerprint != stored_fingerprint:
+        raise SnapshotMismatch("Migrations changed since the snapshot")
+    (revisions_count, ) = struct.unpack_from("<Q", payload, offset)
+    offset += 8
+
+    sections = []
+    while offset < len(payload):
+        (size, ) = struct.unpack_from("<Q", payload, offset)
+        offset += 8
+        sections.append(payload[offset:offset + size])
+        offset += size
+    ids = sections[0].decode().split("\0") if sections[0] else []
+    paths = sections[1].decode().split("\0") if revisions_count else []
+    date_lines = sections[3].decode().split("\0") if revisions_count else []
+    dates, parent_offsets, parent_indices, depends_offsets, depends_indices = (
+        _read_int_array(section).tolist()
+        for section in (sections[2], *sections[4:])
+    )
+    parent_ids = [ids[index] for index in parent_indices]
+    depends_ids = [ids[index] for index in depends_indices]
+
+    # Edges in the ``RevisionStorage.from_edges`` tuple form.
+    edges = []
+    for index in range(revisions_count):
+        start, end = parent_offsets[index], parent_offsets[index + 1]
+        if end - start == 1:
+            down_revision = parent_ids[start]
+        else:
+            down_revision = tuple(parent_ids[start:end]) or None
+        depends_start, depends_end = (
+            depends_offsets[index], depends_offsets[index + 1]
+        )
+        path = paths[index] or None
+        if date_lines[index]:
+            revision_date = LazyDate(path, date_lines[index])
+        else:
+            revision_date = _int_to_date(dates[index])
+        edges.append((
+            ids[index], down_revision, revision_date, path,
+            tuple(depends_ids[depends_start:depends_end]),
+        ))
+    return edges
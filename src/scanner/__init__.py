@@ -0,0 +1,8 @@
+from .header_scanner import HeaderScanner, HeaderScanResult, ScanFailed
+from .lazy_date import LazyDate
+from .mmap_extractor import MmapHeaderExtractor
+
+__all__ = [
+    "HeaderScanner", "HeaderScanResult", "LazyDate", "MmapHeaderExtractor",
+    "ScanFailed",
+]
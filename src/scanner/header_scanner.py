@@ -0,0 +1,125 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Tuple, Union
+
+from src.migration_files import header_grammar
+
+
+class ScanFailed(Exception):
+    def __init__(self, sourcefile_path: str, source: str):
+        super().__init__(sourcefile_path)
+        self.sourcefile_path = sourcefile_path
+        self.source = source
+
+
+@dataclass
+class HeaderScanResult:
+    revision: str
+    down_revision: Union[None, str, Tuple[str, ...]] = None
+    # The raw "Create Date" line, strptime is left to whoever needs the date.
+    date_line: Optional[str] = None
+    bytes_read: int = 0
+    depends_on: Tuple[str, ...] = ()
+
+    @property
+    def revision_date(self) -> Optional[datetime]:
+        if self.date_line is None:
+            return None
+        return HeaderScanner.parse_date_line(self.date_line)
+
+
+class HeaderScanner:
+    # Reads a migration once, line by line, and stops as soon as all the
+    # identifiers are known or the module body starts. Anything the line
+    # grammar can't express (multi-line values, expressions, ...) raises
+    # ScanFailed carrying the already read source, so the caller can fall
+    # back to MigxerVisitor.
+    REVISION_TARGET_ID: str = header_grammar.REVISION_TARGET_ID
+    DOWN_REVISION_TARGET_ID: str = header_grammar.DOWN_REVISION_TARGET_ID
+    DEPENDS_ON_TARGET_ID: str = header_grammar.DEPENDS_ON_TARGET_ID
+    TARGET_IDS = header_grammar.TARGET_IDS
+    MIGRATION_DATE_PREFIX: str = header_grammar.MIGRATION_DATE_PREFIX
+    MIGRATION_DATE_SPLIT_CHAR: str = "."
+    MIGRATION_DATETIME_FMT: str = "%Y-%m-%d %H:%M:%S"
+    BODY_START_PREFIXES = header_grammar.BODY_START_PREFIXES
+
+    def __init__(self, sourcefile_path: str):
+        self.sourcefile_path = sourcefile_path
+
+    def scan(self) -> HeaderScanResult:
+        values = {}
+        date_line = None
+        consumed = []
+        bytes_read = 0
+        unsupported = False
+        with open(self.sourcefile_path, "rb") as migration_file:
+            for raw_line in migration_file:
+                bytes_read += len(raw_line)
+                line = raw_line.decode()
+                consumed.append(line)
+                if line.startswith(self.BODY_START_PREFIXES):
+                    break
+                if date_line is None and line.startswith(
+                    self.MIGRATION_DATE_PREFIX
+                ):
+                    date_line = line.rstrip("\r\n")
+                    continue
+                match = header_grammar.ASSIGNMENT_RE.match(line)
+                if not match:
+                    continue
+                target_id, raw_value = match.groups()
+                value = header_grammar.parse_value(raw_value)
+                if value is header_grammar.UNSUPPORTED:
+                    unsupported = True
+                    break
+                values[target_id] = value
+                if len(values) == len(self.TARGET_IDS):
+                    break
+            if not unsupported and self._has_header(values):
+                return self._to_result(values, date_line, bytes_read)
+            consumed.append(migration_file.read().decode())
+
+        raise ScanFailed(self.sourcefile_path, "".join(consumed))
+
+    @classmethod
+    def _has_header(cls, values: dict) -> bool:
+        return (
+            cls.REVISION_TARGET_ID in values
+            and cls.DOWN_REVISION_TARGET_ID in values
+        )
+
+    @classmethod
+    def _to_result(
+        cls, values: dict, date_line: Optional[str], bytes_read: int
+    ) -> HeaderScanResult:
+        depends_on = values.get(cls.DEPENDS_ON_TARGET_ID)
+        if depends_on is None:
+            depends_on = ()
+        elif isinstance(depends_on, str):
+            depends_on = (depends_on,)
+        return HeaderScanResult(
+            revision=values[cls.REVISION_TARGET_ID],
+            down_revision=values[cls.DOWN_REVISION_TARGET_ID],
+            date_line=date_line,
+            bytes_read=bytes_read,
+            depends_on=depends_on,
+        )
+
+    @classmethod
+    def read_date_line(cls, sourcefile_path: str) -> Optional[str]:
+        with open(sourcefile_path, "r") as migration_file:
+            for line in migration_file:
+                if line.startswith(cls.BODY_START_PREFIXES):
+                    return None
+                if line.startswith(cls.MIGRATION_DATE_PREFIX):
+                    return line.rstrip("\r\n")
+        return None
+
+    @classmethod
+    def parse_date_line(cls, line: str) -> Optional[datetime]:
+        date_string = line[len(cls.MIGRATION_DATE_PREFIX):].lstrip(":").strip()
+        date_string = date_string.split(cls.MIGRATION_DATE_SPLIT_CHAR)[0]
+        try:
+            return datetime.strptime(date_string, cls.MIGRATION_DATETIME_FMT)
+        except ValueError:
+            return None
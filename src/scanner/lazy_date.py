@@ -0,0 +1,35 @@
+from datetime import datetime
+from typing import Optional
+
+from .header_scanner import HeaderScanner
+
+
+class LazyDate:
+    # A revision date that is parsed on first use only. ``date_line`` is the
+    # raw "Create Date" line met while scanning the header; without it the
+    # header is read again when the date is needed.
+    __slots__ = ("sourcefile_path", "date_line")
+
+    def __init__(self, sourcefile_path: str, date_line: Optional[str] = None):
+        self.sourcefile_path = sourcefile_path
+        self.date_line = date_line
+
+    def load(self) -> Optional[datetime]:
+        date_line = self.date_line
+        if date_line is None:
+            date_line = HeaderScanner.read_date_line(self.sourcefile_path)
+        if date_line is None:
+            return None
+        return HeaderScanner.parse_date_line(date_line)
+
+    @staticmethod
+    def format_date_line(revision_date: Optional[datetime]) -> Optional[str]:
+        if revision_date is None:
+            return None
+        return (
+            f"{HeaderScanner.MIGRATION_DATE_PREFIX}: "
+            f"{revision_date.strftime(HeaderScanner.MIGRATION_DATETIME_FMT)}"
+        )
+
+    def __repr__(self) -> str:
+        return f"LazyDate({self.sourcefile_path!r}, {self.date_line!r})"
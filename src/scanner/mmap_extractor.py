@@ -0,0 +1,65 @@
+import mmap
+import re
+
+from src.migration_files import header_grammar
+
+from .header_scanner import HeaderScanner, HeaderScanResult, ScanFailed
+
+
+class MmapHeaderExtractor:
+    # Memory-maps a migration and runs bytes regexes straight over the
+    # mapping: nothing is read into a Python string and only the matched
+    # values are decoded. The search stops at the first module body line,
+    # so for the usual header only its pages are touched. Values are
+    # checked with the header grammar; anything else raises
+    # ScanFailed with the whole source, like the line scanner.
+    _HEADER_RE = re.compile(
+        rb"^(?:(?P<body>def |async def |class |@)"
+        rb"|(?P<target>revision|down_revision|depends_on)[ \t]*"
+        rb"(?::[^=\r\n]*)?=[ \t]*(?P<value>[^\r\n]*?)[ \t]*(?:#[^\r\n]*)?\r?$)",
+        re.MULTILINE,
+    )
+    _DATE_RE = re.compile(
+        rb"^" + header_grammar.MIGRATION_DATE_PREFIX.encode() + rb"[^\r\n]*",
+        re.MULTILINE,
+    )
+
+    def __init__(self, sourcefile_path: str):
+        self.sourcefile_path = sourcefile_path
+
+    def scan(self) -> HeaderScanResult:
+        with open(self.sourcefile_path, "rb") as migration_file:
+            try:
+                mapped = mmap.mmap(
+                    migration_file.fileno(), 0, access=mmap.ACCESS_READ
+                )
+            except ValueError:
+                # Empty files can't be mapped.
+                raise ScanFailed(self.sourcefile_path, "")
+            with mapped:
+                return self.scan_buffer(mapped)
+
+    def scan_buffer(self, buffer) -> HeaderScanResult:
+        # Any bytes-like source works, e.g. a blob read from git.
+        values = {}
+        header_end = 0
+        for match in self._HEADER_RE.finditer(buffer):
+            header_end = match.end()
+            if match.group("body") is not None:
+                break
+            target_id = match.group("target").decode()
+            if target_id in values:
+                continue
+            value = header_grammar.parse_value(match.group("value").decode())
+            if value is header_grammar.UNSUPPORTED:
+                raise ScanFailed(self.sourcefile_path, buffer[:].decode())
+            values[target_id] = value
+            if len(values) == len(header_grammar.TARGET_IDS):
+                break
+
+        if not HeaderScanner._has_header(values):
+            raise ScanFailed(self.sourcefile_path, buffer[:].decode())
+
+        date_match = self._DATE_RE.search(buffer, 0, header_end)
+        date_line = date_match.group().decode() if date_match else None
+        return HeaderScanner._to_result(values, date_line, header_end)
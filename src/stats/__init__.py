@@ -0,0 +1,4 @@
+from .events import EventHook, HookEmitter
+from .run_stats import RunStats
+
+__all__ = ["EventHook", "HookEmitter", "RunStats"]
@@ -0,0 +1,35 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List
+
+EventHook = Callable[[str, Dict[str, Any]], None]
+
+
+class HookEmitter:
+    # Classes using it keep their hooks in ``self.hooks``. Every hook is
+    # called as hook(event_name, payload) right when the event happens.
+    hooks: List[EventHook]
+
+    def add_hook(self, hook: EventHook):
+        self.hooks.append(hook)
+
+    def _emit(self, event: str, **payload: Any):
+        for hook in self.hooks:
+            hook(event, payload)
+
+    @contextmanager
+    def _measure_phase(self, name: str):
+        if not self.hooks:
+            yield
+            return
+        wall_started = time.perf_counter()
+        cpu_started = time.process_time()
+        try:
+            yield
+        finally:
+            self._emit(
+                "phase",
+                name=name,
+                wall=time.perf_counter() - wall_started,
+                cpu=time.process_time() - cpu_started,
+            )
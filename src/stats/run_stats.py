@@ -0,0 +1,33 @@
+from typing import Any, Dict
+
+
+class RunStats:
+    # Hook collecting every event of one run into a JSON-ready dict.
+    # Phases and counters seen more than once are summed, gauges keep the
+    # last value.
+    GAUGE_EVENTS = frozenset({"graph"})
+
+    def __init__(self):
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, Any] = {}
+
+    def __call__(self, event: str, payload: Dict[str, Any]):
+        if event == "phase":
+            phase = self.phases.setdefault(
+                payload["name"], {"wall": 0.0, "cpu": 0.0}
+            )
+            phase["wall"] += payload["wall"]
+            phase["cpu"] += payload["cpu"]
+            return
+
+        for name, value in payload.items():
+            key = f"{event}.{name}" if name != "count" else event
+            if event in self.GAUGE_EVENTS:
+                self.counters[key] = value
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.counters[key] = self.counters.get(key, 0) + value
+            else:
+                self.counters[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"phases": self.phases, "counters": self.counters}
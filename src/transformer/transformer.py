@@ -1,13 +1,35 @@
 import ast
-from typing import Dict, FrozenSet
+from typing import Dict, FrozenSet, Tuple, Union
+
+AssignedValue = Union[None, str, Tuple[str, ...]]
 
 
 class AssignmentsTransformer(ast.NodeTransformer):
-    def __init__(self, assignments_ids_values_map: Dict[str, str]):
-        self.assignments_ids_values_map: Dict[str, str] = assignments_ids_values_map
+    def __init__(self, assignments_ids_values_map: Dict[str, AssignedValue]):
+        self.assignments_ids_values_map: Dict[str, AssignedValue] = (
+            assignments_ids_values_map
+        )
         self.assignments_ids: FrozenSet = frozenset(assignments_ids_values_map)
 
     def visit_Assign(self, node: ast.Assign) -> ast.Assign:
-        if node.targets[0].id in self.assignments_ids:
-            node.value.value = self.assignments_ids_values_map[node.targets[0].id]
+        target = node.targets[0]
+        if isinstance(target, ast.Name) and target.id in self.assignments_ids:
+            node.value = self._value_node(target.id, node.value)
+        return node
+
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> ast.AnnAssign:
+        target = node.target
+        if isinstance(target, ast.Name) and target.id in self.assignments_ids:
+            node.value = self._value_node(target.id, node.value)
         return node
+
+    def _value_node(self, target_id: str, old_node: ast.expr) -> ast.expr:
+        value = self.assignments_ids_values_map[target_id]
+        if isinstance(value, (tuple, list)):
+            new_node = ast.Tuple(
+                elts=[ast.Constant(value=element) for element in value],
+                ctx=ast.Load(),
+            )
+        else:
+            new_node = ast.Constant(value=value)
+        return ast.copy_location(new_node, old_node)
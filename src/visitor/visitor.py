@@ -1,21 +1,51 @@
 import ast
 
-from typing import Optional
+from typing import Optional, Tuple, Union
 
 
 class MigxerVisitor(ast.NodeVisitor):
-    def __init__(self, sourcefile_path: str):
+    def __init__(
+        self, sourcefile_path: str, source: Optional[str] = None,
+        tree: Optional[ast.Module] = None
+    ):
         self.revision_value: Optional[str] = None
         self.revision_target_id: str = "revision"
-        self.down_revision_value: Optional[str] = None
+        self.down_revision_value: Union[None, str, Tuple[str, ...]] = None
         self.down_revision_target_id: str = "down_revision"
-        self._parse_file(sourcefile_path)
+        self.depends_on_value: Tuple[str, ...] = ()
+        self.depends_on_target_id: str = "depends_on"
+        if tree is not None:
+            self.visit(tree)
+        elif source is None:
+            self._parse_file(sourcefile_path)
+        else:
+            self.visit(ast.parse(source))
 
     def visit_Assign(self, node: ast.Assign) -> None:
-        if node.targets[0].id == self.revision_target_id:
-            self.revision_value = node.value.value
-        if node.targets[0].id == self.down_revision_target_id:
-            self.down_revision_value = node.value.value
+        target = node.targets[0]
+        if isinstance(target, ast.Name):
+            self._set_value(target.id, node.value)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> None:
+        if isinstance(node.target, ast.Name) and node.value is not None:
+            self._set_value(node.target.id, node.value)
+
+    def _set_value(self, target_id: str, value_node: ast.expr):
+        if target_id == self.revision_target_id:
+            self.revision_value = ast.literal_eval(value_node)
+        elif target_id == self.down_revision_target_id:
+            # Merge revisions have a tuple (or list) of parents.
+            value = ast.literal_eval(value_node)
+            if isinstance(value, list):
+                value = tuple(value)
+            self.down_revision_value = value
+        elif target_id == self.depends_on_target_id:
+            value = ast.literal_eval(value_node)
+            if value is None:
+                value = ()
+            elif isinstance(value, str):
+                value = (value,)
+            self.depends_on_value = tuple(value)
 
     def _parse_file(self, sourcefile):
         with open(sourcefile, 'r') as migration_file:
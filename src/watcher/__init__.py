@@ -0,0 +1,3 @@
+from .watcher import MigrationsWatcher, WatchReport
+
+__all__ = ["MigrationsWatcher", "WatchReport"]
@@ -0,0 +1,148 @@
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from src.discovery import FileStamp
+from src.fileparser import MigrationsParser
+from src.revision_storage import FixIsImpossible, RevisionsCycleException
+
+
+@dataclass
+class WatchReport:
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    multiparent: Optional[str] = None
+    fixed: List[str] = field(default_factory=list)
+    # Files that could not be parsed, with the reason, and the branch point
+    # an auto fix failed at. Files are tried again once they change.
+    errors: Dict[str, str] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    def __str__(self) -> str:
+        summary = (
+            f"+{len(self.added)} ~{len(self.changed)} -{len(self.removed)} "
+            f"in {self.elapsed * 1000:.1f}ms"
+        )
+        if self.errors:
+            summary += "; errors: " + ", ".join(
+                f"{key} ({error})" for key, error in self.errors.items()
+            )
+        if self.fixed:
+            return f"{summary}: fixed conflict, rewrote {', '.join(self.fixed)}"
+        if self.multiparent:
+            return f"{summary}: heads conflict after {self.multiparent}"
+        return f"{summary}: single head"
+
+
+@dataclass
+class MigrationsWatcher:
+    parser: MigrationsParser
+    auto_fix: bool = False
+    interval: float = 0.5
+
+    # A file being written may not parse yet.
+    PARSE_ERRORS = (SyntaxError, ValueError, UnicodeDecodeError, OSError)
+    # A conflict may not be fixable until someone edits the dates.
+    FIX_ERRORS = (FixIsImpossible, RevisionsCycleException)
+
+    def __post_init__(self):
+        # Stamps of the files in the storage only. Files that failed to
+        # parse keep their stamp in ``_broken``, so they are not retried
+        # until they change.
+        self._stamps: Dict[str, FileStamp] = self._scan()
+        self._broken: Dict[str, FileStamp] = {}
+        self._revisions: Dict[str, str] = {
+            item.original_filepath: revision
+            for revision, item in self.storage.items()
+        }
+
+    @property
+    def storage(self):
+        return self.parser.revisions_storage
+
+    def _scan(self) -> Dict[str, FileStamp]:
+        return self.parser.discovery.stamps()
+
+    def poll(self) -> WatchReport:
+        started = time.perf_counter()
+        report = WatchReport()
+        stamps = self._scan()
+        for filepath, stamp in stamps.items():
+            known_stamp = self._stamps.get(filepath)
+            if known_stamp is None:
+                if self._broken.get(filepath) != stamp:
+                    report.added.append(filepath)
+            elif known_stamp != stamp:
+                report.changed.append(filepath)
+        report.removed = [
+            filepath for filepath in self._stamps if filepath not in stamps
+        ]
+        for filepath in list(self._broken):
+            if filepath not in stamps:
+                del self._broken[filepath]
+
+        for filepath in report.removed + report.changed:
+            self._remove_file(filepath)
+            del self._stamps[filepath]
+        for filepath in report.changed + report.added:
+            try:
+                self._add_file(filepath)
+            except self.PARSE_ERRORS as exc:
+                self._broken[filepath] = stamps[filepath]
+                report.errors[filepath] = f"{type(exc).__name__}: {exc}"
+            else:
+                self._broken.pop(filepath, None)
+                self._stamps[filepath] = stamps[filepath]
+
+        if report.has_changes:
+            report.multiparent = self.storage.find_first_multiparent()
+            if report.multiparent and self.auto_fix:
+                self._fix(report)
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def _remove_file(self, filepath: str):
+        revision = self._revisions.pop(filepath, None)
+        if revision is not None and revision in self.storage:
+            self.storage.remove(revision)
+        if filepath in self.parser.files:
+            self.parser.files.remove(filepath)
+
+    def _add_file(self, filepath: str):
+        revision_item = self.parser.file_parser.to_revision_item(filepath)
+        self.storage.add(revision_item)
+        self._revisions[filepath] = revision_item.revision
+        self.parser.files.append(filepath)
+
+    def _fix(self, report: WatchReport):
+        try:
+            fix_was_maden = self.storage.fix_revision_conflict()
+        except self.FIX_ERRORS as exc:
+            report.errors[report.multiparent] = f"{type(exc).__name__}: {exc}"
+            return
+        if not fix_was_maden:
+            return
+        report.fixed = self.storage.wtite_fix_to_file()
+        report.multiparent = self.storage.find_first_multiparent()
+        # Our own writes must not come back as changes on the next poll.
+        for filepath in report.fixed:
+            stat = os.stat(filepath)
+            self._stamps[filepath] = (stat.st_mtime_ns, stat.st_size)
+
+    def run(
+        self, on_report: Callable[[WatchReport], None] = print,
+        max_polls: Optional[int] = None
+    ):
+        polls = 0
+        while max_polls is None or polls < max_polls:
+            report = self.poll()
+            if report.has_changes:
+                on_report(report)
+            polls += 1
+            time.sleep(self.interval)
@@ -0,0 +1,10 @@
+from .batch_writer import BatchWriter
+from .patch_writer import (
+    PatchNotApplicable, RevisionFilePatcher, atomic_write, write_temp_file
+)
+from .source_cache import CachedSource, SourceCache
+
+__all__ = [
+    "BatchWriter", "CachedSource", "PatchNotApplicable", "RevisionFilePatcher",
+    "SourceCache", "atomic_write", "write_temp_file",
+]
@@ -0,0 +1,122 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Protocol
+
+from .source_cache import SourceCache
+
+
+class PreparableRevisionFile(Protocol):
+    original_filepath: str
+
+    def prepare_revision_file(self, **kwargs) -> Optional[str]:
+        ...
+
+
+class BatchWriter:
+    # Every rewrite is first prepared as an fsynced temp file next to its
+    # target (concurrently, so the fsyncs overlap), then all temps are renamed
+    # over their targets and each touched directory is fsynced once. If any
+    # step fails, renamed files are restored from hard-link backups and no
+    # target is left half written. Sources kept in ``source_cache`` are
+    # patched without reading the files again.
+    BACKUP_SUFFIX: str = ".migxer-backup"
+    DEFAULT_MAX_WORKERS: int = 8
+
+    def __init__(
+        self, max_workers: int = DEFAULT_MAX_WORKERS,
+        source_cache: Optional[SourceCache] = None
+    ):
+        self.max_workers = max_workers
+        self.source_cache = source_cache
+        self.revision_files: Dict[str, PreparableRevisionFile] = {}
+
+    def add(self, revision_file: PreparableRevisionFile):
+        self.revision_files[revision_file.original_filepath] = revision_file
+
+    def commit(self) -> List[str]:
+        temp_paths = self._prepare_all()
+        try:
+            self._rename_all(temp_paths)
+        finally:
+            for temp_path in temp_paths.values():
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        self.revision_files = {}
+        return list(temp_paths)
+
+    def _prepare_all(self) -> Dict[str, str]:
+        temp_paths: Dict[str, str] = {}
+        errors = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [
+                (revision_file, pool.submit(self._prepare, revision_file))
+                for revision_file in self.revision_files.values()
+            ]
+            for revision_file, future in futures:
+                try:
+                    temp_path = future.result()
+                except Exception as exc:
+                    errors.append(exc)
+                    continue
+                if temp_path is not None:
+                    temp_paths[revision_file.original_filepath] = temp_path
+
+        if errors:
+            for temp_path in temp_paths.values():
+                os.remove(temp_path)
+            raise errors[0]
+        return temp_paths
+
+    def _prepare(self, revision_file: PreparableRevisionFile) -> Optional[str]:
+        if self.source_cache is None:
+            return revision_file.prepare_revision_file()
+        return revision_file.prepare_revision_file(
+            source_cache=self.source_cache
+        )
+
+    def _rename_all(self, temp_paths: Dict[str, str]):
+        # Backups are made inside the try, so the ones already made are
+        # removed when a later one fails.
+        backups = {}
+        renamed = []
+        try:
+            for filepath in temp_paths:
+                backups[filepath] = self._backup(filepath)
+            for filepath, temp_path in temp_paths.items():
+                os.replace(temp_path, filepath)
+                renamed.append(filepath)
+            self._fsync_directories(temp_paths)
+        except BaseException:
+            for filepath in renamed:
+                os.replace(backups.pop(filepath), filepath)
+            self._fsync_directories(renamed)
+            raise
+        finally:
+            for backup_path in backups.values():
+                os.remove(backup_path)
+
+    def _backup(self, filepath: str) -> str:
+        backup_path = filepath + self.BACKUP_SUFFIX
+        try:
+            os.link(filepath, backup_path)
+        except OSError:
+            shutil.copy2(filepath, backup_path)
+        return backup_path
+
+    @staticmethod
+    def _fsync_directories(filepaths):
+        directories = {
+            os.path.dirname(os.path.abspath(filepath)) for filepath in filepaths
+        }
+        for directory in directories:
+            try:
+                descriptor = os.open(directory, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.fsync(descriptor)
+            except OSError:
+                pass
+            finally:
+                os.close(descriptor)
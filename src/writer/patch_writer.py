@@ -0,0 +1,158 @@
+import os
+import re
+import shutil
+import tempfile
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+from .source_cache import CachedSource
+
+
+class PatchNotApplicable(Exception):
+    pass
+
+
+Span = Tuple[int, int]
+AssignedValue = Union[None, str, Tuple[str, ...]]
+
+
+def write_temp_file(
+    filepath: str, head: bytes, tail_source: Optional[BinaryIO] = None
+) -> str:
+    # Temp file in the same directory, so the final rename never crosses
+    # filesystems and readers see either the old or the new file.
+    dir_name = os.path.dirname(os.path.abspath(filepath))
+    file_mode = os.stat(filepath).st_mode if os.path.exists(filepath) else None
+    descriptor, temp_path = tempfile.mkstemp(
+        dir=dir_name, prefix=".migxer-", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(descriptor, "wb") as temp_file:
+            temp_file.write(head)
+            if tail_source is not None:
+                shutil.copyfileobj(tail_source, temp_file)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        if file_mode is not None:
+            os.chmod(temp_path, file_mode)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return temp_path
+
+
+def atomic_write(
+    filepath: str, head: bytes, tail_source: Optional[BinaryIO] = None
+):
+    temp_path = write_temp_file(filepath, head, tail_source)
+    try:
+        os.replace(temp_path, filepath)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+class RevisionFilePatcher:
+    # Rewrites only the bytes of the ``revision``/``down_revision`` values and
+    # of the ``Revises:`` docstring line. Only the file head (up to both
+    # assignments) is read into memory, the rest is streamed unchanged. A
+    # source kept from parsing is patched in memory without reading at all.
+    HEAD_CHUNK_SIZE: int = 16 * 1024
+    REVISES_TARGET_ID: str = "down_revision"
+
+    _ASSIGNMENT_RE = re.compile(
+        rb"^(?P<target>revision|down_revision)[ \t]*(?::[^=\n]*)?=[ \t]*"
+        rb"(?P<value>'[^'\\\n]*'|\"[^\"\\\n]*\"|None"
+        rb"|\((?:[ \t]*(?:'[^'\\\n]*'|\"[^\"\\\n]*\")[ \t]*,?)*\))"
+        rb"[ \t]*(?:#[^\n]*)?\r?$",
+        re.MULTILINE,
+    )
+    _REVISES_RE = re.compile(rb"^Revises:[ \t]*(?P<value>[^\r\n]*)", re.MULTILINE)
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+
+    def write(self, values: Dict[str, AssignedValue]) -> bool:
+        temp_path = self.prepare(values)
+        if temp_path is None:
+            return False
+        os.replace(temp_path, self.filepath)
+        return True
+
+    def prepare(
+        self, values: Dict[str, AssignedValue],
+        cached: Optional[CachedSource] = None
+    ) -> Optional[str]:
+        if cached is not None:
+            new_source = self.patch(cached.source, values)
+            if new_source == cached.source:
+                return None
+            return write_temp_file(self.filepath, new_source)
+        with open(self.filepath, "rb") as source_file:
+            head = self._read_head(source_file, frozenset(values))
+            new_head = self.patch(head, values)
+            if new_head == head:
+                return None
+            return write_temp_file(self.filepath, new_head, source_file)
+
+    def _read_head(self, source_file: BinaryIO, targets) -> bytes:
+        head = b""
+        while True:
+            chunk = source_file.read(self.HEAD_CHUNK_SIZE)
+            head += chunk
+            # Cut at the last full line, so a match is never split.
+            complete_head = head[:head.rfind(b"\n") + 1] if chunk else head
+            found = {
+                match.group("target").decode()
+                for match in self._ASSIGNMENT_RE.finditer(complete_head)
+            }
+            if targets <= found or not chunk:
+                source_file.seek(len(complete_head))
+                return complete_head
+
+    def patch(self, source: bytes, values: Dict[str, AssignedValue]) -> bytes:
+        replacements: List[Tuple[Span, bytes]] = []
+        assignment_spans = self.find_assignment_spans(source)
+        for target_id, value in values.items():
+            span, quote = assignment_spans.get(target_id, (None, None))
+            if span is None:
+                raise PatchNotApplicable(self.filepath, target_id)
+            replacements.append((span, self._literal(value, quote)))
+
+        if self.REVISES_TARGET_ID in values:
+            first_assignment = min(
+                span[0] for span, _ in assignment_spans.values()
+            )
+            match = self._REVISES_RE.search(source, 0, first_assignment)
+            if match:
+                revises = values[self.REVISES_TARGET_ID] or ""
+                if isinstance(revises, tuple):
+                    revises = ", ".join(revises)
+                replacements.append((match.span("value"), revises.encode()))
+
+        patched = source
+        for (start, end), value in sorted(replacements, reverse=True):
+            if patched[start:end] != value:
+                patched = patched[:start] + value + patched[end:]
+        return patched
+
+    def find_assignment_spans(self, source: bytes) -> Dict[str, tuple]:
+        spans = {}
+        for match in self._ASSIGNMENT_RE.finditer(source):
+            target_id = match.group("target").decode()
+            if target_id in spans:
+                continue
+            quote = re.search(rb"['\"]", match.group("value"))
+            quote = quote.group() if quote else b"'"
+            spans[target_id] = (match.span("value"), quote)
+        return spans
+
+    @staticmethod
+    def _literal(value: AssignedValue, quote: bytes) -> bytes:
+        if value is None:
+            return b"None"
+        if isinstance(value, tuple):
+            elements = [quote + element.encode() + quote for element in value]
+            if len(elements) == 1:
+                return b"(" + elements[0] + b",)"
+            return b"(" + b", ".join(elements) + b")"
+        return quote + value.encode() + quote
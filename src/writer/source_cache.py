@@ -0,0 +1,123 @@
+import ast
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+
+class CachedSource:
+    __slots__ = ("source", "tree", "mtime_ns", "size", "inode", "read_ns")
+
+    def __init__(
+        self, source: bytes, stat: os.stat_result,
+        tree: Optional[ast.Module] = None
+    ):
+        self.source = source
+        self.tree = tree
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.inode = stat.st_ino
+        self.read_ns = time.time_ns()
+
+
+class SourceCache:
+    # Whole sources of the migrations a fix will rewrite, kept for the write
+    # path so a fix does not read (or, with the tree, parse) a file again. Bounded by
+    # the total size of the sources, least recently used first out. An entry
+    # is handed out once and only while the file's stat still matches; a
+    # file modified within RACY_WINDOW_NS of its read may have changed
+    # without changing mtime, so it is read from disk again instead.
+    DEFAULT_MAX_BYTES: int = 64 * 1024 * 1024
+    RACY_WINDOW_NS: int = 2_000_000_000
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        if max_bytes < 0:
+            raise AttributeError(f"Source cache size can't be {max_bytes}")
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[str, CachedSource]' = OrderedDict()
+        # BatchWriter prepares files from several threads.
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, filepath: str) -> bool:
+        return os.path.abspath(filepath) in self._entries
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits, "misses": self.misses, "stale": self.stale,
+            "evictions": self.evictions,
+        }
+
+    def put(
+        self, filepath: str, source: bytes, stat: os.stat_result,
+        tree: Optional[ast.Module] = None
+    ):
+        # ``stat`` must be taken from the same open file ``source`` was read
+        # from.
+        if len(source) > self.max_bytes:
+            return
+        key = os.path.abspath(filepath)
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = CachedSource(source, stat, tree)
+            self.size += len(source)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted.source)
+                self.evictions += 1
+
+    def take(self, filepath: str) -> Optional[CachedSource]:
+        # The entry is removed: the caller rewrites the file, and may rewrite
+        # the tree in place too.
+        key = os.path.abspath(filepath)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._discard(key)
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            stat = None
+        if stat is None or not self._is_fresh(entry, stat):
+            with self._lock:
+                self.stale += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def _is_fresh(self, entry: CachedSource, stat: os.stat_result) -> bool:
+        return (
+            stat.st_mtime_ns == entry.mtime_ns
+            and stat.st_size == entry.size
+            and stat.st_ino == entry.inode
+            and entry.mtime_ns + self.RACY_WINDOW_NS < entry.read_ns
+        )
+
+    def retain(self, filepaths: Iterable[str]):
+        # Drops every entry but those of ``filepaths``.
+        keep = {os.path.abspath(filepath) for filepath in filepaths}
+        with self._lock:
+            for key in [key for key in self._entries if key not in keep]:
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry.source)
@@ -0,0 +1,100 @@
+import glob
+import os
+import shutil
+import subprocess
+import tempfile
+
+import pytest
+
+from benchmarks.generator import RevisionIdOrdering
+
+
+MIGRATION_FILES_DIR = "tests/migration_files_fixtures/"
+# Files older than the racy window, so stat matches are trusted.
+OLD_MTIME = 1_600_000_000
+
+MIGRATION_TEMPLATE = '''"""{revision}
+
+Revision ID: {revision}
+Revises: {revises}
+{date_line}
+"""
+revision = {revision!r}
+down_revision = {down_revision!r}
+branch_labels = None
+depends_on = {depends_on!r}
+
+
+def upgrade():
+    pass
+'''
+
+
+def render_migration(revision, down_revision, day=None, depends_on=None) -> str:
+    if isinstance(down_revision, tuple):
+        revises = ", ".join(down_revision)
+    else:
+        revises = down_revision or ""
+    # No day, no Create Date line.
+    date_line = f"Create Date: 2022-10-{day:02d} 12:00:00.000000\n" if day else ""
+    return MIGRATION_TEMPLATE.format(
+        revision=revision, revises=revises, date_line=date_line,
+        down_revision=down_revision, depends_on=depends_on,
+    )
+
+
+def write_source(dir_name: str, filename: str, source) -> str:
+    path = os.path.join(dir_name, filename)
+    with open(path, "wb" if isinstance(source, bytes) else "w") as file:
+        file.write(source)
+    return path
+
+
+def write_migration(
+    dir_name: str, revision: str, down_revision, day=None, depends_on=None,
+    filename=None,
+) -> str:
+    return write_source(
+        dir_name, filename or f"{revision}.py",
+        render_migration(revision, down_revision, day, depends_on),
+    )
+
+
+def git(repo_dir: str, *args: str, env=None) -> bytes:
+    return subprocess.run(
+        [
+            "git", "-C", repo_dir, "-c", "user.name=migxer",
+            "-c", "user.email=migxer@localhost", *args
+        ],
+        check=True, capture_output=True, env={**os.environ, **(env or {})},
+    ).stdout
+
+
+@pytest.fixture
+def temp_dir():
+    temp_dir = tempfile.mkdtemp()
+    yield temp_dir
+    shutil.rmtree(temp_dir)
+
+
+@pytest.fixture
+def migrations_dir():
+    # Migrations only: a run may leave bytecode next to the fixtures.
+    temp_dir = tempfile.mkdtemp()
+    for path in sorted(glob.glob(MIGRATION_FILES_DIR + "*.py")):
+        shutil.copy(path, temp_dir)
+    yield temp_dir + os.sep
+    shutil.rmtree(temp_dir)
+
+
+@pytest.fixture
+def aged_migrations_dir(migrations_dir):
+    for filename in os.listdir(migrations_dir):
+        os.utime(os.path.join(migrations_dir, filename), (OLD_MTIME, OLD_MTIME))
+    return migrations_dir
+
+
+@pytest.fixture
+def revision_id_ordering():
+    # For generated trees without dates.
+    return RevisionIdOrdering()
@@ -0,0 +1,171 @@
+import random
+
+import pytest
+
+from src.revision_storage import CompactRevisionStorage, RevisionStorage
+
+
+def _naive_ancestors(storage, revision):
+    # Revision -> number of steps up, the revision itself included.
+    ancestors = {revision: 0}
+    stack = [revision]
+    while stack:
+        current = stack.pop()
+        for parent in storage[current].parent_revisions:
+            if parent in storage and (
+                parent not in ancestors
+                or ancestors[parent] > ancestors[current] + 1
+            ):
+                ancestors[parent] = ancestors[current] + 1
+                stack.append(parent)
+    return ancestors
+
+
+def _naive_lca(storage, first, second):
+    first_ancestors = _naive_ancestors(storage, first)
+    second_ancestors = _naive_ancestors(storage, second)
+    common = [
+        ancestor for ancestor in first_ancestors if ancestor in second_ancestors
+    ]
+    if not common:
+        return None, None
+    lowest = min(common, key=first_ancestors.get)
+    return lowest, first_ancestors[lowest] + second_ancestors[lowest]
+
+
+def _assert_queries_match(storage, rng, pairs=200):
+    revisions = list(storage)
+    for _ in range(pairs):
+        first, second = rng.choice(revisions), rng.choice(revisions)
+        lowest, distance = _naive_lca(storage, first, second)
+        assert storage.is_ancestor(first, second) == (
+            first in _naive_ancestors(storage, second)
+        )
+        assert storage.lowest_common_ancestor(first, second) == lowest
+        assert storage.distance(first, second) == distance
+
+
+def _naive_descendants(storage, revision):
+    stack = [revision]
+    while stack:
+        current = stack.pop()
+        yield current
+        stack.extend(storage[current].children)
+
+
+def _random_tree_edges(rng, size):
+    edges = [("r0", None)]
+    for index in range(1, size):
+        parent = index - 1 if rng.random() < 0.8 else rng.randrange(index)
+        edges.append((f"r{index}", f"r{parent}"))
+    return edges
+
+
+class TestAncestorQueries:
+    def test_linear_history(self):
+        storage = RevisionStorage.from_edges(
+            [("r0", None)] + [(f"r{i}", f"r{i - 1}") for i in range(1, 100)]
+        )
+        assert storage.is_ancestor("r0", "r99")
+        assert storage.is_ancestor("r42", "r42")
+        assert not storage.is_ancestor("r99", "r0")
+        assert storage.lowest_common_ancestor("r10", "r90", "r50") == "r10"
+        assert storage.distance("r3", "r70") == 67
+        assert storage.ancestor_index.depth("r99") == 99
+
+    @pytest.mark.parametrize("storage_cls", [
+        RevisionStorage, CompactRevisionStorage
+    ])
+    @pytest.mark.parametrize("seed", range(3))
+    def test_random_trees(self, storage_cls, seed):
+        rng = random.Random(seed)
+        storage = storage_cls.from_edges(_random_tree_edges(rng, 150))
+        _assert_queries_match(storage, rng)
+
+    def test_separate_trees(self):
+        storage = RevisionStorage.from_edges([
+            ("a", "missing"), ("b", "a"), ("c", "a"),
+            ("x", "gone"), ("y", "x"),
+        ])
+        assert storage.lowest_common_ancestor("b", "c") == "a"
+        assert storage.lowest_common_ancestor("b", "y") is None
+        assert storage.lowest_common_ancestor("a", "x") is None
+        assert storage.distance("c", "y") is None
+        assert not storage.is_ancestor("x", "b")
+
+    def test_unknown_revision(self):
+        storage = RevisionStorage.from_edges([("a", None), ("b", "a")])
+        with pytest.raises(KeyError):
+            storage.is_ancestor("missing", "b")
+        with pytest.raises(KeyError):
+            storage.distance("a", "missing")
+
+    @pytest.mark.parametrize("seed", range(3))
+    def test_incremental_adding(self, seed):
+        rng = random.Random(seed)
+        edges = _random_tree_edges(rng, 60)
+        rng.shuffle(edges)
+        storage = RevisionStorage()
+        storage.add(revision=edges[0][0], down_revision=edges[0][1])
+        storage.ancestor_index
+        for revision, down_revision in edges[1:]:
+            storage.add(revision=revision, down_revision=down_revision)
+            _assert_queries_match(storage, rng, pairs=20)
+
+    @pytest.mark.parametrize("seed", range(3))
+    def test_incremental_reparenting_and_removal(self, seed):
+        rng = random.Random(seed)
+        storage = RevisionStorage.from_edges(_random_tree_edges(rng, 60))
+        index = storage.ancestor_index
+        for _ in range(20):
+            revision = f"r{rng.randrange(1, 60)}"
+            if revision not in storage:
+                continue
+            subtree = set(_naive_descendants(storage, revision))
+            candidates = sorted(set(storage) - subtree)
+            storage._reparent(storage[revision], storage[rng.choice(candidates)])
+            _assert_queries_match(storage, rng, pairs=20)
+        for revision in rng.sample(sorted(storage), 10):
+            storage.remove(revision)
+            _assert_queries_match(storage, rng, pairs=20)
+        assert storage.ancestor_index is index
+
+    @pytest.mark.parametrize("storage_cls", [
+        RevisionStorage, CompactRevisionStorage
+    ])
+    def test_index_after_fix(self, storage_cls, revision_id_ordering):
+        rng = random.Random(7)
+        storage = storage_cls.from_edges(_random_tree_edges(rng, 80))
+        _assert_queries_match(storage, rng, pairs=20)
+        storage.ordering = revision_id_ordering
+        storage.fix_revision_conflict()
+        assert storage.find_first_multiparent() is None
+        _assert_queries_match(storage, rng)
+        head, = storage.heads()
+        assert storage.distance(storage.root_revision, head) == 79
+
+    @pytest.mark.parametrize("storage_cls", [
+        RevisionStorage, CompactRevisionStorage
+    ])
+    def test_single_parent_tuple(self, storage_cls):
+        storage = storage_cls.from_edges([
+            ("r", None), ("a", ("r",)), ("b", ("a",)),
+        ])
+        assert storage.is_ancestor("r", "b")
+        assert storage.lowest_common_ancestor("a", "b") == "a"
+        assert storage.distance("r", "b") == 2
+
+    def test_merges(self):
+        storage = RevisionStorage.from_edges([
+            ("root", None), ("a", "root"), ("b", "root"), ("c", "b"),
+            ("m", ("a", "c")), ("d", "m"),
+        ])
+        assert storage.has_merges
+        assert storage.is_ancestor("c", "d")
+        assert storage.is_ancestor("a", "m")
+        assert not storage.is_ancestor("a", "c")
+        assert storage.lowest_common_ancestor("a", "c") == "root"
+        assert storage.lowest_common_ancestor("d", "c", "m") == "c"
+        assert storage.distance("a", "c") == 3
+        assert storage.distance("root", "d") == 3
+        _assert_queries_match(storage, random.Random(0), pairs=50)
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from benchmarks.generator import MigrationTreeSpec, generate_migration_tree
+from src.fileparser import MigrationsParser
+
+
+MIGRATION_FILES_DIR = "tests/migration_files_fixtures/"
+
+
+@pytest.fixture
+def generated_dirs():
+    temp_dirs = []
+    for seed, shape in enumerate(("linear", "wide")):
+        temp_dir = tempfile.mkdtemp()
+        generate_migration_tree(temp_dir, MigrationTreeSpec(
+            count=150, shape=shape, heads=3, seed=seed
+        ))
+        temp_dirs.append(temp_dir + os.sep)
+    yield temp_dirs
+    for temp_dir in temp_dirs:
+        shutil.rmtree(temp_dir)
+
+
+def _graph(storage):
+    return {
+        revision: (item.parent_revision, item.revision_date, item.children)
+        for revision, item in storage.items()
+    }
+
+
+class TestAsyncApi:
+    def test_aload_matches_sync_load(self):
+        parser = asyncio.run(MigrationsParser.aload(MIGRATION_FILES_DIR))
+        expected = MigrationsParser(_dir_name=MIGRATION_FILES_DIR)
+        assert parser.files == expected.files
+        assert _graph(parser.revisions_storage) == _graph(
+            expected.revisions_storage
+        )
+
+    def test_repos_load_concurrently(self, generated_dirs):
+        async def load_all():
+            return await asyncio.gather(*(
+                MigrationsParser.aload(dir_name, concurrency=2)
+                for dir_name in generated_dirs
+            ))
+
+        parsers = asyncio.run(load_all())
+        for parser, dir_name in zip(parsers, generated_dirs):
+            expected = MigrationsParser(_dir_name=dir_name)
+            assert len(parser.revisions_storage) == 150
+            assert _graph(parser.revisions_storage) == _graph(
+                expected.revisions_storage
+            )
+
+    def test_event_loop_is_not_blocked(self, generated_dirs):
+        ticks = []
+
+        async def ticker(done: asyncio.Event):
+            while not done.is_set():
+                ticks.append(None)
+                await asyncio.sleep(0)
+
+        async def load_while_ticking():
+            done = asyncio.Event()
+            ticking = asyncio.create_task(ticker(done))
+            await MigrationsParser.aload(generated_dirs[0], concurrency=1)
+            done.set()
+            await ticking
+
+        asyncio.run(load_while_ticking())
+        assert len(ticks) > 1
+
+    def test_aload_with_cache(self, migrations_dir):
+        cold = asyncio.run(MigrationsParser.aload(migrations_dir, _use_cache=True))
+        warm = asyncio.run(MigrationsParser.aload(migrations_dir, _use_cache=True))
+        assert cold.cache_stats["misses"] == 4
+        assert warm.cache_stats["hits"] + warm.cache_stats["misses"] == 4
+        assert _graph(warm.revisions_storage) == _graph(cold.revisions_storage)
+
+    def test_fix_and_write(self, migrations_dir):
+        async def fix():
+            parser = await MigrationsParser.aload(migrations_dir)
+            return await parser.revisions_storage.fix_and_write()
+
+        written = asyncio.run(fix())
+        assert len(written) == 1
+        storage = MigrationsParser(_dir_name=migrations_dir).revisions_storage
+        assert storage.find_first_multiparent() is None
+        assert asyncio.run(storage.fix_and_write()) == []
+
+    def test_concurrent_fix_and_write_is_rejected(self, migrations_dir):
+        async def fix_twice():
+            parser = await MigrationsParser.aload(migrations_dir)
+            storage = parser.revisions_storage
+            return await asyncio.gather(
+                storage.fix_and_write(), storage.fix_and_write(),
+                return_exceptions=True,
+            )
+
+        written, rejected = asyncio.run(fix_twice())
+        assert len(written) == 1
+        assert isinstance(rejected, RuntimeError)
+        storage = MigrationsParser(_dir_name=migrations_dir).revisions_storage
+        assert storage.find_first_multiparent() is None
+
+    def test_aload_with_snapshot(self, migrations_dir):
+        snapshot_path = migrations_dir + "graph.snapshot"
+        cold = asyncio.run(
+            MigrationsParser.aload(migrations_dir, _snapshot_path=snapshot_path)
+        )
+        warm = asyncio.run(
+            MigrationsParser.aload(migrations_dir, _snapshot_path=snapshot_path)
+        )
+        assert not cold.snapshot_used and warm.snapshot_used
+        assert warm.revisions_storage.heads() == cold.revisions_storage.heads()
+
+    @pytest.mark.parametrize("option", ["_jobs", "_pool"])
+    def test_aload_rejects_pool_options(self, option):
+        with pytest.raises(AttributeError):
+            asyncio.run(MigrationsParser.aload(MIGRATION_FILES_DIR, **{option: 2}))
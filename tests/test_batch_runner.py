@@ -0,0 +1,148 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+from benchmarks.generator import MigrationTreeSpec, generate_migration_tree
+from src.batch import BatchRunner
+from src.fileparser import MigrationsParser
+from src.parse_cache import ParseCache
+from src.stats import RunStats
+
+
+MIGRATION_FILES_DIR = "tests/migration_files_fixtures/"
+
+
+@pytest.fixture
+def monorepo():
+    # services/svc_0..2 have a conflict, svc_3 is a single chain.
+    temp_dir = tempfile.mkdtemp()
+    for index in range(3):
+        shutil.copytree(
+            MIGRATION_FILES_DIR,
+            os.path.join(temp_dir, "services", f"svc_{index}", "versions"),
+            ignore=shutil.ignore_patterns("__pycache__"),
+        )
+    linear = os.path.join(temp_dir, "services", "svc_3", "versions")
+    os.makedirs(linear)
+    generate_migration_tree(linear, MigrationTreeSpec(count=30))
+    yield temp_dir
+    shutil.rmtree(temp_dir)
+
+
+def _versions(monorepo):
+    return os.path.join(monorepo, "services", "*", "versions")
+
+
+class TestBatchRunner:
+    def test_expand_directories(self, monorepo):
+        first = os.path.join(monorepo, "services", "svc_0", "versions")
+        directories = BatchRunner.expand_directories(
+            [first, _versions(monorepo), "missing"]
+        )
+        assert directories == [
+            first, *(
+                os.path.join(monorepo, "services", f"svc_{index}", "versions")
+                for index in range(1, 4)
+            ),
+            "missing",
+        ]
+
+    def test_check_only(self, monorepo):
+        directories = BatchRunner.expand_directories([_versions(monorepo)])
+        reports = BatchRunner(directories, fix=False).run()
+        assert [report.has_conflict for report in reports] == [
+            True, True, True, False
+        ]
+        assert reports[0].heads == ["7474fcfa1b90", "8448frrr2a14"]
+        assert reports[3].files == reports[3].revisions == 30
+        assert all(not report.files_written for report in reports)
+
+    @pytest.mark.parametrize("pool", ["process", "thread"])
+    def test_fix_with_shared_pool(self, monorepo, pool):
+        directories = BatchRunner.expand_directories([_versions(monorepo)])
+        reports = BatchRunner(directories, jobs=2, pool=pool).run()
+        assert [len(report.files_written) for report in reports] == [1, 1, 1, 0]
+        for directory, report in zip(directories, reports):
+            storage = MigrationsParser(_dir_name=directory).revisions_storage
+            assert storage.find_first_multiparent() is None
+            assert report.heads == storage.heads()
+
+    def test_unknown_pool(self):
+        with pytest.raises(AttributeError):
+            BatchRunner([MIGRATION_FILES_DIR], pool="fiber")
+
+    def test_shared_parse_cache(self, monorepo):
+        directories = BatchRunner.expand_directories([_versions(monorepo)])
+        cache_path = os.path.join(monorepo, ParseCache.FILENAME)
+        with ParseCache(cache_path) as parse_cache:
+            BatchRunner(directories, fix=False, parse_cache=parse_cache).run()
+            assert parse_cache.stats == {"hits": 0, "misses": 42}
+        run_stats = RunStats()
+        with ParseCache(cache_path) as parse_cache:
+            BatchRunner(
+                directories, fix=False, parse_cache=parse_cache,
+                hooks=[run_stats]
+            ).run()
+            assert parse_cache.stats == {"hits": 42, "misses": 0}
+        assert run_stats.counters["files_parsed"] == 0
+
+    def test_errors_are_reported_per_directory(self, monorepo):
+        broken = os.path.join(monorepo, "services", "svc_0", "versions")
+        for filename in os.listdir(broken):
+            if filename != "migration_A.py":
+                os.remove(os.path.join(broken, filename))
+        reports = BatchRunner(
+            BatchRunner.expand_directories([_versions(monorepo), "missing"])
+        ).run()
+        assert reports[-1].error == "not a directory"
+        assert [report.error for report in reports[:-1]] == [None] * 4
+
+    @pytest.mark.parametrize("jobs", [1, 2])
+    def test_unparsable_file_fails_its_directory_only(self, monorepo, jobs):
+        broken = os.path.join(monorepo, "services", "svc_1", "versions")
+        with open(os.path.join(broken, "half_written.py"), "w") as file:
+            file.write("revision = 'bbbb'\ndown_revision = (\n")
+        reports = BatchRunner(
+            BatchRunner.expand_directories([_versions(monorepo)]), jobs=jobs
+        ).run()
+        assert reports[1].error.startswith(
+            os.path.join(broken, "half_written.py") + ": SyntaxError"
+        )
+        assert reports[1].files_written == []
+        assert [report.error for report in reports] == [
+            None, reports[1].error, None, None
+        ]
+        assert len(reports[0].files_written) == 1
+
+    def test_cli_rejects_single_directory_options(self, monorepo):
+        completed = subprocess.run(
+            [
+                sys.executable, "-m", "src.main", "--batch",
+                _versions(monorepo), "--render", "ascii",
+            ],
+            capture_output=True, text=True,
+        )
+        assert completed.returncode == 2
+        assert "--render can't be used with --batch" in completed.stderr
+
+    def test_cli_report(self, monorepo):
+        report_path = os.path.join(monorepo, "report.json")
+        completed = subprocess.run(
+            [
+                sys.executable, "-m", "src.main", "--batch",
+                _versions(monorepo), "--check", "--report", report_path,
+            ],
+            capture_output=True, text=True,
+        )
+        assert completed.returncode == 1
+        with open(report_path) as report_file:
+            report = json.load(report_file)
+        assert len(report) == 4
+        assert sum(
+            entry["multiparent"] is not None for entry in report.values()
+        ) == 3
@@ -0,0 +1,135 @@
+import glob
+import os
+import shutil
+
+import pytest
+
+from src.fileparser import MigrationsParser
+from src.revision_storage import RevisionItem
+from src.writer import BatchWriter
+
+
+MIGRATION_FILES_DIR = "tests/migration_files_fixtures/"
+
+
+def _snapshot(dir_name: str):
+    snapshot = {}
+    for filename in sorted(os.listdir(dir_name)):
+        with open(dir_name + filename) as file:
+            snapshot[filename] = file.read()
+    return snapshot
+
+
+class FailingRevisionFile:
+    def __init__(self, original_filepath: str):
+        self.original_filepath = original_filepath
+
+    def prepare_revision_file(self):
+        raise OSError("disk is full")
+
+
+class TestBatchWriter:
+    def test_commit_writes_every_file(self, migrations_dir):
+        batch_writer = BatchWriter()
+        for filename, parent in (("migration_A.py", "x"), ("migration_B.py", "y")):
+            batch_writer.add(RevisionItem(
+                revision=filename,
+                original_filepath=migrations_dir + filename,
+                parent_revision=parent,
+            ))
+        written = batch_writer.commit()
+
+        assert sorted(os.path.basename(path) for path in written) == [
+            "migration_A.py", "migration_B.py"
+        ]
+        parser = MigrationsParser(_dir_name=migrations_dir)
+        parents = {
+            os.path.basename(item.original_filepath): item.parent_revision
+            for item in parser.revisions_storage.values()
+        }
+        assert parents["migration_A.py"] == "x"
+        assert parents["migration_B.py"] == "y"
+        assert sorted(os.listdir(migrations_dir)) == sorted(
+            os.path.basename(path)
+            for path in glob.glob(MIGRATION_FILES_DIR + "*.py")
+        )
+
+    def test_failed_prepare_writes_nothing(self, migrations_dir):
+        before = _snapshot(migrations_dir)
+        batch_writer = BatchWriter()
+        batch_writer.add(RevisionItem(
+            revision="7474fcfa1b90",
+            original_filepath=migrations_dir + "migration_A.py",
+            parent_revision="x",
+        ))
+        batch_writer.add(FailingRevisionFile(migrations_dir + "migration_B.py"))
+
+        with pytest.raises(OSError):
+            batch_writer.commit()
+        assert _snapshot(migrations_dir) == before
+
+    def test_failed_rename_rolls_back(self, migrations_dir, monkeypatch):
+        before = _snapshot(migrations_dir)
+        batch_writer = BatchWriter()
+        for filename in ("migration_A.py", "migration_B.py", "migration_C.py"):
+            batch_writer.add(RevisionItem(
+                revision=filename,
+                original_filepath=migrations_dir + filename,
+                parent_revision="x",
+            ))
+
+        real_replace = os.replace
+        calls = []
+
+        def flaky_replace(source, target):
+            calls.append(target)
+            if len(calls) == 3:
+                raise OSError("network share went away")
+            return real_replace(source, target)
+
+        monkeypatch.setattr(os, "replace", flaky_replace)
+        with pytest.raises(OSError):
+            batch_writer.commit()
+        monkeypatch.setattr(os, "replace", real_replace)
+
+        assert _snapshot(migrations_dir) == before
+
+    def test_failed_backup_leaves_no_backups(self, migrations_dir, monkeypatch):
+        before = _snapshot(migrations_dir)
+        batch_writer = BatchWriter()
+        for filename in ("migration_A.py", "migration_B.py", "migration_C.py"):
+            batch_writer.add(RevisionItem(
+                revision=filename,
+                original_filepath=migrations_dir + filename,
+                parent_revision="x",
+            ))
+
+        real_link = os.link
+        calls = []
+
+        def flaky_link(source, target):
+            calls.append(target)
+            if len(calls) == 2:
+                raise OSError("too many links")
+            return real_link(source, target)
+
+        def failing_copy(source, target):
+            raise OSError("disk is full")
+
+        monkeypatch.setattr(os, "link", flaky_link)
+        monkeypatch.setattr(shutil, "copy2", failing_copy)
+        with pytest.raises(OSError):
+            batch_writer.commit()
+        monkeypatch.undo()
+
+        assert _snapshot(migrations_dir) == before
+
+    def test_fix_writes_every_rewritten_revision(self, migrations_dir):
+        parser = MigrationsParser(_dir_name=migrations_dir)
+        storage = parser.revisions_storage
+        storage.fix_revision_conflict()
+        written = storage.wtite_fix_to_file()
+
+        assert len(written) == len(storage.revisions_to_rewrite) == 1
+        new_storage = MigrationsParser(_dir_name=migrations_dir).revisions_storage
+        assert new_storage.find_first_multiparent() is None
@@ -0,0 +1,96 @@
+from datetime import datetime
+
+import pytest
+
+from src.fileparser import MigrationsParser
+from src.revision_storage import CompactRevisionStorage, RevisionStorage
+
+
+MIGRATION_FILES_DIR = "tests/migration_files_fixtures/"
+
+
+def _edges(storage):
+    return {
+        revision: (
+            item.parent_revision, item.revision_date,
+            item.original_filepath, item.children,
+        )
+        for revision, item in storage.items()
+    }
+
+
+class TestCompactRevisionStorage:
+    def test_unordered_adding(self):
+        storage = CompactRevisionStorage()
+        storage.add(revision="root", original_filepath="some/root")
+        storage.add(revision="D", down_revision="B", original_filepath="some/D")
+        assert storage.orphans == ["D"]
+
+        storage.add(revision="B", down_revision="A", original_filepath="some/B")
+        assert storage.orphans == ["B"]
+
+        storage.add(revision="A", down_revision="root", original_filepath="A")
+        assert storage.orphans == []
+        assert storage.root_revision == "root"
+        assert storage.get_revisions_line() == ["root", "A", "B", "D"]
+        assert len(storage) == 4
+        assert "D" in storage and "missing" not in storage
+        assert storage.get("missing") is None
+
+    def test_dates_round_trip(self):
+        revision_date = datetime(2022, 10, 2, 14, 33, 55, 185029)
+        storage = CompactRevisionStorage()
+        storage.add(revision="root", revision_date=revision_date)
+        storage.add(revision="A", down_revision="root")
+
+        assert storage["root"].revision_date == revision_date
+        assert storage["A"].revision_date is None
+        assert str(storage["root"]) == "root (2022-10-02 14:33:55)"
+
+    def test_item_view_is_compact(self):
+        storage = CompactRevisionStorage.from_edges([("root", None)])
+        with pytest.raises(AttributeError):
+            storage["root"].__dict__
+
+    def test_matches_dict_storage_on_fixtures(self):
+        fileparser = MigrationsParser(_dir_name=MIGRATION_FILES_DIR)
+        compact_parser = MigrationsParser(
+            _dir_name=MIGRATION_FILES_DIR,
+            revisions_storage=CompactRevisionStorage(),
+        )
+        storage = fileparser.revisions_storage
+        compact = compact_parser.revisions_storage
+
+        assert _edges(compact) == _edges(storage)
+        assert compact.find_first_multiparent() == storage.find_first_multiparent()
+
+        storage.fix_revision_conflict()
+        compact.fix_revision_conflict()
+        assert compact.get_revisions_line() == storage.get_revisions_line()
+        assert compact.find_first_multiparent() is None
+        assert compact.revision_to_rewrite.revision == (
+            storage.revision_to_rewrite.revision
+        )
+
+    def test_from_edges_matches_dict_storage(self):
+        edges = [("D", "B"), ("B", "A"), ("root", None), ("C", "A"), ("A", "root")]
+        storage = RevisionStorage.from_edges(edges)
+        compact = CompactRevisionStorage.from_edges(edges)
+
+        assert _edges(compact) == _edges(storage)
+        assert compact.find_first_multiparent() == "A"
+
+    @pytest.mark.parametrize("method, args", [
+        ("pop", ("a",)), ("popitem", ()), ("setdefault", ("a",)),
+        ("update", ({},)), ("clear", ()), ("copy", ()), ("__delitem__", ("a",)),
+    ])
+    def test_dict_api_is_rejected(self, method, args):
+        storage = CompactRevisionStorage.from_edges([("a", None)])
+        with pytest.raises(TypeError):
+            getattr(storage, method)(*args)
+        assert "a" in storage
+
+    def test_repr_and_equality(self):
+        storage = CompactRevisionStorage.from_edges([("a", None), ("b", "a")])
+        assert repr(storage) == "CompactRevisionStorage(['a', 'b'])"
+        assert storage != {} and storage == storage
@@ -1,4 +1,10 @@
+from datetime import datetime
+
+import pytest
+
 from src.fileparser import MigrationsParser
+from src.revision_storage import CompactRevisionStorage, RevisionStorage
+from src.revision_storage.migxer_revision_storage import FixIsImpossible
 
 
 class TestConflictFixing:
@@ -15,3 +21,75 @@ class TestConflictFixing:
             '2d9f80797b0d', '7474fcfa1b90', '7954fsbh1i24', '8448frrr2a14'
         ]
         assert revisions == expected_revisions
+
+
+def _day(day: int) -> datetime:
+    return datetime(2022, 10, day, 12, 0, 0)
+
+
+class TestAllConflictsFixing:
+
+    def test_three_way_conflict(self):
+        storage = RevisionStorage.from_edges([
+            ("root", None, _day(1)),
+            ("C", "root", _day(4)),
+            ("A", "root", _day(2)),
+            ("B", "root", _day(3)),
+            ("A2", "A", _day(5)),
+        ])
+        assert storage.fix_revision_conflict()
+        assert storage.get_revisions_line() == ["root", "A", "A2", "B", "C"]
+        assert storage.find_first_multiparent() is None
+        assert [item.revision for item in storage.revisions_to_rewrite] == [
+            "B", "C"
+        ]
+        assert storage["B"].parent_revision == "A2"
+        assert storage["C"].parent_revision == "B"
+
+    def test_nested_conflicts_fixed_in_one_run(self):
+        storage = RevisionStorage.from_edges([
+            ("root", None, _day(1)),
+            ("A", "root", _day(2)),
+            ("B", "root", _day(3)),
+            ("A1", "A", _day(6)),
+            ("A2", "A", _day(4)),
+            ("B1", "B", _day(5)),
+        ])
+        assert storage.fix_revision_conflict()
+        assert storage.get_revisions_line() == [
+            "root", "A", "A2", "A1", "B", "B1"
+        ]
+        assert storage.fix_revision_conflict() is False
+
+    @pytest.mark.parametrize("storage_cls", [
+        RevisionStorage, CompactRevisionStorage
+    ])
+    def test_plan_is_the_same_for_backends(self, storage_cls):
+        edges = [
+            ("root", None, _day(1)),
+            ("A", "root", _day(2)),
+            ("B", "root", _day(3)),
+            ("C", "root", _day(4)),
+        ]
+        storage = storage_cls.from_edges(edges)
+        assert storage.plan_conflict_fix() == [
+            ("B", "A", "root"), ("C", "B", "root")
+        ]
+
+    def test_missing_date_is_not_fixable(self):
+        storage = RevisionStorage.from_edges([
+            ("root", None, _day(1)),
+            ("A", "root", _day(2)),
+            ("B", "root", None),
+        ])
+        with pytest.raises(FixIsImpossible):
+            storage.fix_revision_conflict()
+
+    def test_same_dates_are_not_fixable(self):
+        storage = RevisionStorage.from_edges([
+            ("root", None, _day(1)),
+            ("A", "root", _day(2)),
+            ("B", "root", _day(2)),
+        ])
+        with pytest.raises(FixIsImpossible):
+            storage.fix_revision_conflict()
@@ -0,0 +1,112 @@
+import random
+
+import pytest
+
+from src.revision_storage import CompactRevisionStorage, RevisionStorage
+
+
+def _naive_tip(storage, revision):
+    current = storage[revision]
+    while current.children:
+        current = storage[current.children[0]]
+    return current.revision
+
+
+def _naive_first_branch_point(storage, revision):
+    current = storage[revision]
+    while len(current.children) == 1:
+        current = storage[current.children[0]]
+    return current.revision if current.children else None
+
+
+def _naive_depth(storage, revision):
+    depth = 0
+    parent = storage[revision].parent_revision
+    while parent in storage:
+        depth += 1
+        parent = storage[parent].parent_revision
+    return depth
+
+
+def _assert_index_matches(storage):
+    index = storage.descendant_index
+    for revision in storage:
+        assert index.tip(revision) == _naive_tip(storage, revision)
+        assert index.first_branch_point(revision) == (
+            _naive_first_branch_point(storage, revision)
+        )
+        assert index.depth(revision) == _naive_depth(storage, revision)
+
+
+def _random_tree_edges(rng, size):
+    edges = [("r0", None)]
+    for index in range(1, size):
+        parent = index - 1 if rng.random() < 0.8 else rng.randrange(index)
+        edges.append((f"r{index}", f"r{parent}"))
+    return edges
+
+
+class TestDescendantIndex:
+    def test_linear_history(self):
+        storage = RevisionStorage.from_edges(
+            [("r0", None)] + [(f"r{i}", f"r{i - 1}") for i in range(1, 100)]
+        )
+        assert storage.find_first_multiparent() is None
+        assert storage._get_last_descendant("r0").revision == "r99"
+        assert storage.descendant_index.depth("r99") == 99
+        assert storage.get_revisions_line_length() == 100
+
+    @pytest.mark.parametrize("storage_cls", [
+        RevisionStorage, CompactRevisionStorage
+    ])
+    def test_single_parent_tuple(self, storage_cls):
+        storage = storage_cls.from_edges([
+            ("r", None), ("a", ("r",)), ("b", ("a",)),
+        ])
+        assert storage.graph_depth() == 3
+        assert storage.get_revisions_line_length() == 3
+        assert storage.descendant_index.depth("b") == 2
+        assert storage._get_last_descendant("r").revision == "b"
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_incremental_adding(self, seed):
+        rng = random.Random(seed)
+        edges = _random_tree_edges(rng, 60)
+        rng.shuffle(edges)
+        storage = RevisionStorage()
+        storage.add(revision=edges[0][0], down_revision=edges[0][1])
+        storage.descendant_index
+        for revision, down_revision in edges[1:]:
+            storage.add(revision=revision, down_revision=down_revision)
+            _assert_index_matches(storage)
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_incremental_reparenting(self, seed):
+        rng = random.Random(seed)
+        storage = RevisionStorage.from_edges(_random_tree_edges(rng, 60))
+        storage.descendant_index
+        for _ in range(30):
+            revision = f"r{rng.randrange(1, 60)}"
+            item = storage[revision]
+            subtree = {revision}
+            stack = [revision]
+            while stack:
+                children = storage[stack.pop()].children
+                subtree.update(children)
+                stack.extend(children)
+            candidates = sorted(set(storage) - subtree)
+            storage._reparent(item, storage[rng.choice(candidates)])
+            _assert_index_matches(storage)
+
+    @pytest.mark.parametrize("storage_cls", [
+        RevisionStorage, CompactRevisionStorage
+    ])
+    def test_index_after_fix(self, storage_cls, revision_id_ordering):
+        rng = random.Random(7)
+        storage = storage_cls.from_edges(_random_tree_edges(rng, 80))
+        storage.descendant_index
+        storage.ordering = revision_id_ordering
+        storage.fix_revision_conflict()
+        assert storage.find_first_multiparent() is None
+        _assert_index_matches(storage)
+        assert storage.get_revisions_line_length() == 80
@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from src.discovery import MigrationsDiscovery
+from src.fileparser import MigrationsParser
+
+
+MIGRATION_FILES_DIR = "tests/migration_files_fixtures/"
+
+
+@pytest.fixture
+def locations():
+    # versions/2022/{root,A}.py, versions/2023/{B,C}.py, extra/ is empty
+    temp_dir = tempfile.mkdtemp()
+    versions = os.path.join(temp_dir, "versions")
+    for year, filenames in (
+        ("2022", ("migration_root.py", "migration_A.py")),
+        ("2023", ("migration_B.py", "migration_C.py")),
+    ):
+        os.makedirs(os.path.join(versions, year))
+        for filename in filenames:
+            shutil.copy(
+                MIGRATION_FILES_DIR + filename, os.path.join(versions, year)
+            )
+    pycache = os.path.join(versions, "2022", "__pycache__")
+    os.makedirs(pycache)
+    with open(os.path.join(pycache, "stale.py"), "w") as stale_file:
+        stale_file.write("revision = 'stale'\ndown_revision = None\n")
+    with open(os.path.join(versions, "README"), "w") as readme:
+        readme.write("not a migration")
+    extra = os.path.join(temp_dir, "extra")
+    os.makedirs(extra)
+    yield versions, extra
+    shutil.rmtree(temp_dir)
+
+
+class TestMigrationsDiscovery:
+    def test_not_recursive_by_default(self, locations):
+        versions, _ = locations
+        assert MigrationsDiscovery([versions]).files() == []
+
+    def test_recursive_skips_pycache(self, locations):
+        versions, _ = locations
+        files = MigrationsDiscovery([versions], recursive=True).files()
+        assert [os.path.relpath(path, versions) for path in files] == [
+            os.path.join("2022", "migration_A.py"),
+            os.path.join("2022", "migration_root.py"),
+            os.path.join("2023", "migration_B.py"),
+            os.path.join("2023", "migration_C.py"),
+        ]
+
+    def test_several_locations(self, locations):
+        versions, extra = locations
+        shutil.copy(MIGRATION_FILES_DIR + "migration_root.py", extra)
+        files = MigrationsDiscovery(
+            [extra, os.path.join(versions, "2023")]
+        ).files()
+        assert [os.path.basename(path) for path in files] == [
+            "migration_root.py", "migration_B.py", "migration_C.py"
+        ]
+
+    def test_path_without_trailing_separator(self):
+        files = MigrationsDiscovery([MIGRATION_FILES_DIR.rstrip("/")]).files()
+        assert sorted(files) == sorted(
+            os.path.join(MIGRATION_FILES_DIR.rstrip("/"), filename)
+            for filename in os.listdir(MIGRATION_FILES_DIR)
+            if filename.endswith(".py")
+        )
+
+    def test_stamps(self, locations):
+        versions, _ = locations
+        stamps = MigrationsDiscovery([versions], recursive=True).stamps()
+        assert len(stamps) == 4
+        for filepath, (mtime_ns, size) in stamps.items():
+            assert os.stat(filepath).st_mtime_ns == mtime_ns
+            assert os.path.getsize(filepath) == size
+
+
+class TestParserLocations:
+    def test_parser_loads_all_locations(self, locations):
+        versions, extra = locations
+        fileparser = MigrationsParser(
+            _dir_name=os.path.join(versions, "2022"),
+            _version_locations=[os.path.join(versions, "2023"), extra],
+        )
+        assert len(fileparser.revisions_storage) == 4
+        assert fileparser.revisions_storage.orphans == []
+
+    def test_parser_recursive(self, locations):
+        versions, _ = locations
+        fileparser = MigrationsParser(_dir_name=versions, _recursive=True)
+        assert len(fileparser.files) == 4
+        assert "stale" not in fileparser.revisions_storage
+
+    def test_env_variable_lists_locations(self, locations, monkeypatch):
+        versions, extra = locations
+        monkeypatch.setenv("MIGRATIONS_DIR", os.pathsep.join([
+            os.path.join(versions, "2022"), os.path.join(versions, "2023")
+        ]))
+        fileparser = MigrationsParser()
+        assert fileparser.migrations_dir == os.path.join(versions, "2022")
+        assert len(fileparser.revisions_storage) == 4
@@ -0,0 +1,36 @@
+import os
+import tempfile
+
+import pytest
+
+from benchmarks.generator import SHAPES, MigrationTreeSpec, generate_migration_tree
+from src.fileparser import MigrationsParser
+
+
+class TestMigrationTreeGenerator:
+    @pytest.mark.parametrize("shape", SHAPES)
+    def test_generated_tree_parses_back(self, shape):
+        spec = MigrationTreeSpec(count=50, shape=shape, heads=4, body_lines=3)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            edges = generate_migration_tree(temp_dir, spec)
+            parser = MigrationsParser(_dir_name=temp_dir + os.sep, _engine="ast")
+
+        storage = parser.revisions_storage
+        assert len(storage) == 50
+        assert storage.orphans == []
+        assert {
+            revision: item.parent_revision for revision, item in storage.items()
+        } == dict(edges)
+        heads = [item for item in storage.values() if not item.children]
+        assert (len(heads) > 1) == (shape != "linear")
+        if shape == "many_heads":
+            assert len(heads) == 4
+
+    @pytest.mark.parametrize("shape", SHAPES)
+    def test_generated_tree_is_fixable(self, shape):
+        spec = MigrationTreeSpec(count=50, shape=shape, heads=4)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            generate_migration_tree(temp_dir, spec)
+            storage = MigrationsParser(_dir_name=temp_dir + os.sep).revisions_storage
+        storage.fix_revision_conflict()
+        assert len(storage.get_revisions_line()) == 50
@@ -0,0 +1,98 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from src.git_source import GitError, GitMigrationsLoader, GitObjectReader, run_git
+from tests.conftest import git, render_migration, write_migration
+
+
+def _commit_migration(repo_dir, revision, down_revision, day):
+    versions = os.path.join(repo_dir, "versions")
+    os.makedirs(versions, exist_ok=True)
+    write_migration(versions, revision, down_revision, day)
+    git(repo_dir, "add", "versions")
+    git(repo_dir, "commit", "-q", "-m", revision)
+
+
+@pytest.fixture
+def repo_dir(temp_dir):
+    # main:    root - A - C
+    # feature: root - A - B
+    git(temp_dir, "init", "-q", "-b", "main")
+    _commit_migration(temp_dir, "root", None, 1)
+    _commit_migration(temp_dir, "A", "root", 2)
+    git(temp_dir, "checkout", "-q", "-b", "feature")
+    _commit_migration(temp_dir, "B", "A", 3)
+    git(temp_dir, "checkout", "-q", "main")
+    _commit_migration(temp_dir, "C", "A", 4)
+    # The working tree is not needed at all.
+    shutil.rmtree(os.path.join(temp_dir, "versions"))
+    os.makedirs(os.path.join(temp_dir, "versions"))
+    return temp_dir
+
+
+class TestGitObjectReader:
+    def test_reads_blobs(self, repo_dir):
+        object_id = run_git(
+            repo_dir, "rev-parse", "main:versions/A.py"
+        ).decode().strip()
+        with GitObjectReader(repo_dir) as reader:
+            assert b"revision = 'A'" in reader.read(object_id)
+            assert b"revision = 'A'" in reader.read(object_id)
+
+    def test_missing_object(self, repo_dir):
+        with GitObjectReader(repo_dir) as reader:
+            with pytest.raises(GitError):
+                reader.read("0" * 40)
+
+
+class TestGitMigrationsLoader:
+    def test_single_ref(self, repo_dir):
+        loader = GitMigrationsLoader([os.path.join(repo_dir, "versions")])
+        storage = loader.load(["main"])
+        assert sorted(storage) == ["A", "C", "root"]
+        assert storage.find_first_multiparent() is None
+        assert storage["C"].revision_date.day == 4
+
+    def test_merged_refs_conflict(self, repo_dir):
+        loader = GitMigrationsLoader([os.path.join(repo_dir, "versions")])
+        storage = loader.load(["main", "feature"])
+        assert storage.find_first_multiparent() == "A"
+        assert sorted(storage.heads()) == ["B", "C"]
+        # root and A are the same blobs on both refs.
+        assert loader.file_parser.bytes_read == sum(
+            len(render_migration(revision, down_revision, day))
+            for revision, down_revision, day in (
+                ("root", None, 1), ("A", "root", 2), ("C", "A", 4),
+                ("B", "A", 3),
+            )
+        )
+
+    def test_unknown_ref(self, repo_dir):
+        loader = GitMigrationsLoader([os.path.join(repo_dir, "versions")])
+        with pytest.raises(GitError):
+            loader.load(["no-such-branch"])
+
+    def test_cli_exit_code(self, repo_dir):
+        versions = os.path.join(repo_dir, "versions")
+        conflict = subprocess.run(
+            [
+                sys.executable, "-m", "src.main", "--rev_dir", versions,
+                "--against", "feature",
+            ],
+            capture_output=True, text=True,
+        )
+        assert conflict.returncode == 1
+        assert "heads conflict after A" in conflict.stdout
+
+        same = subprocess.run(
+            [
+                sys.executable, "-m", "src.main", "--rev_dir", versions,
+                "--against", "main~1",
+            ],
+            capture_output=True, text=True,
+        )
+        assert same.returncode == 0
@@ -0,0 +1,130 @@
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.generator import MigrationTreeGenerator, MigrationTreeSpec
+from src.render import GraphRenderer
+from src.revision_storage import CompactRevisionStorage, RevisionStorage
+
+
+MIGRATION_FILES_DIR = "tests/migration_files_fixtures/"
+
+EDGES = [
+    ("r", None), ("a", "r"), ("b", "a"), ("c", "b"), ("x", "c"), ("y", "c"),
+    ("y2", "y"), ("z", "c"), ("z1", "z"), ("z2", "z"), ("w", "a"),
+    ("m", ("z1", "z2")), ("m2", "m"),
+]
+
+
+@pytest.fixture(params=[RevisionStorage, CompactRevisionStorage])
+def storage(request):
+    return request.param.from_edges(EDGES)
+
+
+class TestAsciiRenderer:
+    def test_every_conflict(self, storage):
+        # z is a branch point too, but its branches merge back in m.
+        assert list(GraphRenderer(storage).ascii_lines()) == [
+            "r - a",
+            "  |- b - c",
+            "  |  |- x",
+            "  |  |- y - y2",
+            "  |  \\- z",
+            "  |     |- z1 - m - m2",
+            "  |     \\- z2 - m (see above)",
+            "  \\- w",
+            "",
+            "r - a - b - c",
+            "  |- x",
+            "  |- y - y2",
+            "  \\- z",
+            "     |- z1 - m - m2",
+            "     \\- z2 - m (see above)",
+        ]
+
+    def test_window(self, storage):
+        assert list(GraphRenderer(storage, window=1).ascii_lines()) == [
+            "r - a",
+            "  |- b - <...>",
+            "  \\- w",
+            "",
+            "<...> - b - c",
+            "  |- x",
+            "  |- y - <...>",
+            "  \\- z - <...>",
+        ]
+
+    def test_with_dates(self):
+        storage = RevisionStorage.from_edges(
+            [("r", None), ("a", "r"), ("b", "r")]
+        )
+        assert list(GraphRenderer(storage, with_dates=True).ascii_lines()) == [
+            "r (date is unknown)",
+            "  |- a (date is unknown)",
+            "  \\- b (date is unknown)",
+        ]
+
+    def test_nothing_to_draw(self):
+        storage = RevisionStorage.from_edges([("r", None), ("a", "r")])
+        assert list(GraphRenderer(storage).ascii_lines()) == []
+
+    def test_bad_window(self, storage):
+        with pytest.raises(AttributeError):
+            GraphRenderer(storage, window=0)
+
+    def test_output_is_bounded_by_window(self):
+        edges = MigrationTreeGenerator(MigrationTreeSpec(
+            count=5000, shape="wide", heads=10, seed=1
+        )).edges()
+        storage = RevisionStorage.from_edges(edges)
+        lines = list(GraphRenderer(storage, window=3).ascii_lines())
+        assert lines.count("") == len(storage.branch_points()) - 1
+        assert max(map(len, lines)) < 100
+
+
+class TestDotRenderer:
+    def test_whole_graph(self, storage):
+        lines = list(GraphRenderer(storage).dot_lines())
+        assert lines[0] == "digraph revisions {"
+        assert lines[-1] == "}"
+        assert '    "a" [color=red];' in lines
+        assert '    "c" [color=red];' in lines
+        assert '    "z";' in lines
+        assert '    "z1" -> "m";' in lines
+        assert '    "z2" -> "m";' in lines
+        assert sum(" -> " in line for line in lines) == 13
+
+    def test_window(self, storage):
+        lines = list(GraphRenderer(storage, window=1).dot_lines())
+        nodes = [
+            line.split('"')[1] for line in lines[3:-1] if " -> " not in line
+        ]
+        assert sorted(nodes) == ["a", "b", "c", "r", "w", "x", "y", "z"]
+        assert '    "y" [style=dashed];' in lines
+        edges = [line for line in lines if " -> " in line]
+        assert len(edges) == len(set(edges)) == 7
+
+    def test_depends_on_and_quoting(self):
+        storage = RevisionStorage.from_edges([
+            ("r", None), ('a"1', "r"), ("b", "r", None, None, ('a"1',)),
+        ])
+        lines = list(GraphRenderer(storage).dot_lines())
+        assert '    "a\\"1" -> "b" [style=dotted];' in lines
+
+
+class TestRenderCli:
+    def test_render_does_not_fix(self):
+        rendered = subprocess.run(
+            [
+                sys.executable, "-m", "src.main", "--rev_dir",
+                MIGRATION_FILES_DIR, "--render", "ascii", "--window", "1",
+            ],
+            capture_output=True, text=True,
+        )
+        assert rendered.returncode == 0
+        assert rendered.stdout.splitlines() == [
+            "2d9f80797b0d",
+            "  |- 7474fcfa1b90",
+            "  \\- 7954fsbh1i24 - <...>",
+        ]
@@ -0,0 +1,75 @@
+import glob
+import tempfile
+
+import pytest
+
+from src.fileparser import MigrationsParser
+from src.scanner import HeaderScanner, ScanFailed
+from src.visitor import MigxerVisitor
+from tests.conftest import MIGRATION_FILES_DIR, write_source
+
+
+class TestHeaderScanner:
+    @pytest.mark.parametrize("path", sorted(glob.glob(MIGRATION_FILES_DIR + "*.py")))
+    def test_scan_matches_visitor(self, path):
+        scanned = HeaderScanner(path).scan()
+        visitor = MigxerVisitor(path)
+
+        assert scanned.revision == visitor.revision_value
+        assert scanned.down_revision == visitor.down_revision_value
+        assert scanned.revision_date is not None
+
+    def test_scan_date(self):
+        scanned = HeaderScanner(MIGRATION_FILES_DIR + "migration_A.py").scan()
+        assert scanned.revision_date.strftime("%Y-%m-%d %H:%M:%S") == (
+            "2022-10-02 14:33:55"
+        )
+
+    def test_unsupported_value_fails_with_source(self):
+        source = (
+            "revision = 'merge'\n"
+            "down_revision = (\n"
+            "    'a', 'b'\n"
+            ")\n"
+            "\n"
+            "def upgrade():\n"
+            "    pass\n"
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = write_source(temp_dir, "merge.py", source)
+            with pytest.raises(ScanFailed) as exc_info:
+                HeaderScanner(path).scan()
+        assert exc_info.value.source == source
+
+    def test_missing_assignments_fail(self):
+        source = "def upgrade():\n    pass\nrevision = 'late'\n"
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = write_source(temp_dir, "late.py", source)
+            with pytest.raises(ScanFailed):
+                HeaderScanner(path).scan()
+
+    def test_parser_falls_back_to_visitor(self):
+        source = (
+            '"""Late assignments\n'
+            "Create Date: 2022-10-05 10:00:00.000000\n"
+            '"""\n'
+            "def upgrade():\n"
+            "    pass\n"
+            "revision = 'late'\n"
+            "down_revision = None\n"
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            write_source(temp_dir, "late.py", source)
+            fileparser = MigrationsParser(_dir_name=temp_dir + "/")
+        item = fileparser.revisions_storage["late"]
+        assert item.parent_revision is None
+        assert item.revision_date.day == 5
+
+    def test_engines_build_same_storage(self):
+        scanned = MigrationsParser(_dir_name=MIGRATION_FILES_DIR)
+        visited = MigrationsParser(_dir_name=MIGRATION_FILES_DIR, _engine="ast")
+        for revision, item in visited.revisions_storage.items():
+            scanned_item = scanned.revisions_storage[revision]
+            assert scanned_item.parent_revision == item.parent_revision
+            assert scanned_item.revision_date == item.revision_date
+            assert scanned_item.children == item.children
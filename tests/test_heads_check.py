@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.generator import SHAPES, MigrationTreeSpec, generate_migration_tree
+from src.check import HeadsCheck
+from src.fileparser import MigrationsParser
+from tests.conftest import MIGRATION_FILES_DIR, write_source
+
+
+def _write(dir_name, filename, header):
+    write_source(dir_name, filename, header + "\n\ndef upgrade():\n    pass\n")
+
+
+class TestHeadsCheck:
+    def test_fixtures(self):
+        check = HeadsCheck([MIGRATION_FILES_DIR])
+        assert check.heads() == ["7474fcfa1b90", "8448frrr2a14"]
+        assert check.files_checked == 4
+        assert check.fallbacks == 0
+
+    @pytest.mark.parametrize("shape", SHAPES)
+    def test_matches_storage_heads(self, shape, temp_dir):
+        generate_migration_tree(temp_dir, MigrationTreeSpec(
+            count=60, shape=shape, heads=4, seed=3
+        ))
+        storage = MigrationsParser(_dir_name=temp_dir).revisions_storage
+        assert HeadsCheck([temp_dir]).heads() == storage.heads()
+
+    def test_merges_and_fallback(self, temp_dir):
+        _write(temp_dir, "a.py", "revision = 'a'\ndown_revision = None")
+        _write(temp_dir, "b.py", "revision = 'b'\ndown_revision = 'a'")
+        _write(temp_dir, "c.py", 'revision = "c"\ndown_revision = ("a",)')
+        _write(
+            temp_dir, "m.py",
+            "revision = 'm'\ndown_revision = (\n    'b',\n    'c',\n)"
+        )
+        _write(temp_dir, "__init__.py", "")
+        check = HeadsCheck([temp_dir])
+        assert check.heads() == ["m"]
+        assert check.fallbacks == 2
+
+    def test_recursive_locations(self, temp_dir):
+        os.makedirs(os.path.join(temp_dir, "one", "nested"))
+        os.makedirs(os.path.join(temp_dir, "two"))
+        _write(temp_dir + "/one", "a.py", "revision = 'a'\ndown_revision = None")
+        _write(
+            temp_dir + "/one/nested", "b.py",
+            "revision = 'b'\ndown_revision = 'a'"
+        )
+        _write(temp_dir + "/two", "c.py", "revision = 'c'\ndown_revision = 'a'")
+        locations = [temp_dir + "/one", temp_dir + "/two"]
+        assert HeadsCheck(locations).heads() == ["c"]
+        assert HeadsCheck(locations, recursive=True).heads() == ["b", "c"]
+
+
+class TestCheckCli:
+    def _run_check(self, dir_name):
+        return subprocess.run(
+            [sys.executable, "-m", "src.main", "--rev_dir", dir_name, "--check"],
+            capture_output=True, text=True,
+        )
+
+    def test_exit_codes(self, temp_dir):
+        conflict = self._run_check(MIGRATION_FILES_DIR)
+        assert conflict.returncode == 1
+        assert "7474fcfa1b90, 8448frrr2a14" in conflict.stdout
+
+        generate_migration_tree(temp_dir, MigrationTreeSpec(count=20))
+        assert self._run_check(temp_dir).returncode == 0
+
+    def test_heavy_modules_are_not_imported(self):
+        script = (
+            "import sys\n"
+            "from src.main import check_heads\n"
+            "class Inputs:\n"
+            f"    rev_dir = {MIGRATION_FILES_DIR!r}\n"
+            "    version_location = []\n"
+            "    recursive = False\n"
+            "check_heads(Inputs)\n"
+            "print(sorted({'ast', 'datetime', 'dataclasses', 'typing',"
+            " 'src.fileparser'}"
+            " & set(sys.modules)))\n"
+        )
+        imported = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True
+        )
+        assert imported.stdout.strip().splitlines()[-1] == "[]"
@@ -0,0 +1,66 @@
+import pytest
+
+from src.fileparser import MigrationsParser
+from src.revision_storage import CompactRevisionStorage, RevisionItem
+from src.scanner import HeaderScanner, LazyDate
+
+
+MIGRATION_FILES_DIR = "tests/migration_files_fixtures/"
+
+
+def _loaded_dates(storage):
+    return sorted(
+        revision for revision, item in storage.items()
+        if item.lazy_revision_date is None
+    )
+
+
+class TestLazyDates:
+    def test_scan_keeps_raw_date_line(self):
+        scanned = HeaderScanner(MIGRATION_FILES_DIR + "migration_A.py").scan()
+        assert scanned.date_line.startswith("Create Date: 2022-10-02")
+
+    @pytest.mark.parametrize("engine", MigrationsParser.ENGINES)
+    def test_graph_is_built_without_dates(self, engine):
+        fileparser = MigrationsParser(
+            _dir_name=MIGRATION_FILES_DIR, _engine=engine
+        )
+        storage = fileparser.revisions_storage
+        assert storage.find_first_multiparent() == "2d9f80797b0d"
+        assert _loaded_dates(storage) == []
+
+    def test_only_branching_children_are_dated(self):
+        storage = MigrationsParser(
+            _dir_name=MIGRATION_FILES_DIR
+        ).revisions_storage
+        storage.plan_conflict_fix()
+        assert _loaded_dates(storage) == sorted(
+            storage["2d9f80797b0d"].children
+        )
+
+    def test_date_is_read_when_header_scan_missed_it(self, aged_migrations_dir):
+        path = aged_migrations_dir + "migration_A.py"
+        lazy_date = LazyDate(path)
+        item = RevisionItem("A", path, revision_date=lazy_date)
+        assert item.lazy_revision_date is lazy_date
+        assert item.revision_date.strftime("%Y-%m-%d") == "2022-10-02"
+        assert item.lazy_revision_date is None
+
+    def test_warm_cache_keeps_dates_lazy(self, aged_migrations_dir):
+        cold = MigrationsParser(_dir_name=aged_migrations_dir, _use_cache=True)
+        warm = MigrationsParser(_dir_name=aged_migrations_dir, _use_cache=True)
+        assert warm.cache_stats["hits"] == 4
+        assert _loaded_dates(warm.revisions_storage) == []
+        for revision, item in warm.revisions_storage.items():
+            cold_item = cold.revisions_storage[revision]
+            assert item.revision_date == cold_item.revision_date
+            assert item.revision_date is not None
+
+    def test_compact_storage_loads_dates_on_demand(self):
+        items = MigrationsParser(
+            _dir_name=MIGRATION_FILES_DIR
+        ).revisions_storage.values()
+        storage = CompactRevisionStorage.from_edges(items)
+        assert len(storage._lazy_dates) == 4
+        assert storage["7474fcfa1b90"].revision_date.day == 2
+        assert len(storage._lazy_dates) == 3
@@ -0,0 +1,187 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from src.fileparser import MigrationsParser
+from src.parse_cache import ParseCache
+from src.revision_storage import CompactRevisionStorage, RevisionStorage
+from src.revision_storage.migxer_revision_storage import RevisionsCycleException
+from src.scanner import HeaderScanner
+from src.visitor import MigxerVisitor
+from tests.conftest import write_migration
+
+
+def _day(day: int) -> datetime:
+    return datetime(2022, 10, day, 12, 0, 0)
+
+
+# root - A - B - M - D
+#          \    /
+#           - C
+MERGED_EDGES = [
+    ("root", None, _day(1)),
+    ("A", "root", _day(2)),
+    ("B", "A", _day(3)),
+    ("C", "A", _day(4)),
+    ("M", ("B", "C"), _day(5)),
+    ("D", "M", _day(6)),
+]
+
+
+@pytest.fixture
+def migrations_dir(temp_dir):
+    write_migration(temp_dir, "root", None, 1)
+    write_migration(temp_dir, "A", "root", 2)
+    write_migration(temp_dir, "B", "A", 3)
+    write_migration(temp_dir, "C", "A", 4, depends_on="B")
+    write_migration(temp_dir, "M", ("B", "C"), 5)
+    write_migration(temp_dir, "E", "M", 6)
+    write_migration(temp_dir, "F", "M", 7)
+    return temp_dir + os.sep
+
+
+class TestMergeParsing:
+    def test_scanner_reads_merge_revision(self, migrations_dir):
+        scanned = HeaderScanner(migrations_dir + "M.py").scan()
+        assert scanned.down_revision == ("B", "C")
+        assert scanned.depends_on == ()
+
+    def test_scanner_reads_depends_on(self, migrations_dir):
+        scanned = HeaderScanner(migrations_dir + "C.py").scan()
+        assert scanned.down_revision == "A"
+        assert scanned.depends_on == ("B",)
+
+    @pytest.mark.parametrize("revision", ["root", "C", "M"])
+    def test_scanner_matches_visitor(self, migrations_dir, revision):
+        path = migrations_dir + revision + ".py"
+        scanned = HeaderScanner(path).scan()
+        visitor = MigxerVisitor(path)
+        assert scanned.down_revision == visitor.down_revision_value
+        assert scanned.depends_on == visitor.depends_on_value
+
+    def test_visitor_reads_annotated_assignments(self):
+        visitor = MigxerVisitor("inline", source=(
+            "revision: str = 'M'\n"
+            "down_revision: Union[str, Sequence[str], None] = ['B', 'C']\n"
+            "depends_on: Union[str, Sequence[str], None] = 'D'\n"
+        ))
+        assert visitor.revision_value == "M"
+        assert visitor.down_revision_value == ("B", "C")
+        assert visitor.depends_on_value == ("D",)
+
+    @pytest.mark.parametrize("engine", MigrationsParser.ENGINES)
+    def test_parser_loads_merge_history(self, migrations_dir, engine):
+        storage = MigrationsParser(
+            _dir_name=migrations_dir, _engine=engine
+        ).revisions_storage
+        assert storage["M"].parent_revision == ("B", "C")
+        assert storage["C"].depends_on == ("B",)
+        assert sorted(storage["M"].children) == ["E", "F"]
+        assert storage.orphans == []
+
+    def test_cache_keeps_merge_revisions(self, migrations_dir):
+        MigrationsParser(_dir_name=migrations_dir, _use_cache=True)
+        with ParseCache.for_directory(migrations_dir) as parse_cache:
+            found, missing = parse_cache.lookup([migrations_dir + "M.py"])
+            found_depends, _ = parse_cache.lookup([migrations_dir + "C.py"])
+        assert missing == []
+        assert found[migrations_dir + "M.py"].parent_revision == ("B", "C")
+        assert found_depends[migrations_dir + "C.py"].depends_on == ("B",)
+
+
+@pytest.mark.parametrize("storage_cls", [RevisionStorage, CompactRevisionStorage])
+class TestMergeGraph:
+    def test_heads_and_branch_points(self, storage_cls):
+        storage = storage_cls.from_edges(MERGED_EDGES)
+        assert storage.heads() == ["D"]
+        assert storage.branch_points() == ["A"]
+        assert sorted(storage["B"].children) == ["M"]
+
+    def test_topological_order(self, storage_cls):
+        storage = storage_cls.from_edges(list(reversed(MERGED_EDGES)))
+        order = storage.topological_order()
+        position = {revision: index for index, revision in enumerate(order)}
+        assert sorted(order) == sorted(edge[0] for edge in MERGED_EDGES)
+        for revision, down_revision, _ in MERGED_EDGES:
+            item = storage[revision]
+            for parent in item.parent_revisions:
+                assert position[parent] < position[revision]
+
+    def test_depends_on_orders_revisions(self, storage_cls):
+        storage = storage_cls.from_edges([
+            ("root", None, _day(1)),
+            ("C", "A", _day(4), None, ("B",)),
+            ("A", "root", _day(3)),
+            ("B", "root", _day(2)),
+        ])
+        assert storage["C"].depends_on == ("B",)
+        order = storage.topological_order()
+        assert order.index("B") < order.index("C")
+
+    def test_cycle_is_reported(self, storage_cls):
+        storage = storage_cls.from_edges([
+            ("root", None, _day(1)),
+            ("A", ("root", "B"), _day(2)),
+            ("B", "A", _day(3)),
+        ])
+        with pytest.raises(RevisionsCycleException):
+            storage.topological_order()
+
+    def test_merged_branches_are_not_a_conflict(self, storage_cls):
+        storage = storage_cls.from_edges(MERGED_EDGES)
+        assert storage.find_first_multiparent() is None
+        assert storage.fix_revision_conflict() is False
+        assert storage.graph_depth() == 5
+
+    def test_conflict_after_merge(self, storage_cls):
+        storage = storage_cls.from_edges(
+            MERGED_EDGES + [("E", "M", _day(7))]
+        )
+        assert storage.find_first_multiparent() == "M"
+        assert storage.plan_conflict_fix() == [("E", "D", "M")]
+
+    def test_conflict_inside_merge(self, storage_cls):
+        # root - A - B - M
+        #         \ \   /
+        #          \ - C
+        #           - X
+        storage = storage_cls.from_edges(
+            MERGED_EDGES[:5] + [("X", "A", _day(6))]
+        )
+        assert storage.find_first_multiparent() == "A"
+        assert storage.fix_revision_conflict() is True
+        assert storage["X"].parent_revision == "M"
+        assert storage.heads() == ["X"]
+        assert storage.find_first_multiparent() is None
+
+    def test_merge_parent_is_moved(self, storage_cls):
+        # root - A - M
+        #     \     /
+        #      - B -
+        #         \
+        #          - C
+        storage = storage_cls.from_edges([
+            ("root", None, _day(1)),
+            ("A", "root", _day(2)),
+            ("B", "root", _day(3)),
+            ("M", ("A", "B"), _day(4)),
+            ("C", "B", _day(5)),
+        ])
+        assert storage.fix_revision_conflict() is True
+        assert storage["C"].parent_revision == "M"
+        assert storage.heads() == ["C"]
+
+
+class TestMergeFixWriting:
+    def test_fix_is_written_and_reloaded(self, migrations_dir):
+        fileparser = MigrationsParser(_dir_name=migrations_dir)
+        storage = fileparser.revisions_storage
+        assert storage.find_first_multiparent() == "M"
+        storage.fix_revision_conflict()
+        assert storage.wtite_fix_to_file() == [migrations_dir + "F.py"]
+
+        reloaded = MigrationsParser(_dir_name=migrations_dir).revisions_storage
+        assert reloaded["F"].parent_revision == "E"
+        assert reloaded["M"].parent_revision == ("B", "C")
+        assert reloaded.heads() == ["F"]
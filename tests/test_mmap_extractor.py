@@ -0,0 +1,90 @@
+import glob
+import os
+import tempfile
+
+import pytest
+
+from benchmarks.generator import SHAPES, MigrationTreeSpec, generate_migration_tree
+from src.fileparser import MigrationsParser
+from src.scanner import HeaderScanner, MmapHeaderExtractor, ScanFailed
+from src.visitor import MigxerVisitor
+from tests.conftest import MIGRATION_FILES_DIR, write_source
+
+
+def _assert_matches_visitor(path: str):
+    extracted = MmapHeaderExtractor(path).scan()
+    visitor = MigxerVisitor(path)
+    assert extracted.revision == visitor.revision_value
+    assert extracted.down_revision == visitor.down_revision_value
+    assert extracted.depends_on == visitor.depends_on_value
+    scanned = HeaderScanner(path).scan()
+    assert extracted.date_line == scanned.date_line
+
+
+@pytest.fixture(scope="module", params=SHAPES)
+def generated_dir(request):
+    spec = MigrationTreeSpec(
+        count=60, shape=request.param, heads=4, body_lines=20, seed=3
+    )
+    with tempfile.TemporaryDirectory() as temp_dir:
+        generate_migration_tree(temp_dir, spec)
+        yield temp_dir
+
+
+class TestMmapHeaderExtractor:
+    @pytest.mark.parametrize("path", sorted(glob.glob(MIGRATION_FILES_DIR + "*.py")))
+    def test_matches_visitor_on_fixtures(self, path):
+        _assert_matches_visitor(path)
+
+    def test_matches_visitor_on_generated_corpus(self, generated_dir):
+        filenames = sorted(os.listdir(generated_dir))
+        assert len(filenames) == 60
+        for filename in filenames:
+            _assert_matches_visitor(os.path.join(generated_dir, filename))
+
+    def test_stops_at_module_body(self, generated_dir):
+        path = os.path.join(generated_dir, sorted(os.listdir(generated_dir))[0])
+        extracted = MmapHeaderExtractor(path).scan()
+        with open(path, "rb") as migration_file:
+            source = migration_file.read()
+        assert extracted.bytes_read <= source.index(b"def upgrade")
+        assert extracted.revision_date is not None
+
+    def test_merge_revision_and_crlf(self):
+        source = (
+            b'"""merge\r\n\r\nCreate Date: 2022-10-05 10:00:00.000000\r\n"""\r\n'
+            b"revision = 'm'\r\n"
+            b"down_revision = ('a', 'b')  # merge\r\n"
+            b"depends_on = ['c']\r\n"
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = write_source(temp_dir, "merge.py", source)
+            extracted = MmapHeaderExtractor(path).scan()
+            _assert_matches_visitor(path)
+        assert extracted.down_revision == ("a", "b")
+        assert extracted.depends_on == ("c",)
+        assert extracted.revision_date.day == 5
+
+    @pytest.mark.parametrize("source", [
+        b"",
+        b"revision = 'a'\n",
+        b"revision = 'a'\ndown_revision = (\n    'b',\n)\n",
+        b"def upgrade():\n    pass\nrevision = 'a'\ndown_revision = None\n",
+    ])
+    def test_unsupported_sources_fail_with_source(self, source):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = write_source(temp_dir, "odd.py", source)
+            with pytest.raises(ScanFailed) as exc_info:
+                MmapHeaderExtractor(path).scan()
+        assert exc_info.value.source == source.decode()
+
+    def test_engine_builds_same_storage(self, generated_dir):
+        dir_name = generated_dir + os.sep
+        extracted = MigrationsParser(_dir_name=dir_name, _engine="mmap")
+        visited = MigrationsParser(_dir_name=dir_name, _engine="ast")
+        assert extracted.file_parser.fallbacks == 0
+        for revision, item in visited.revisions_storage.items():
+            extracted_item = extracted.revisions_storage[revision]
+            assert extracted_item.parent_revision == item.parent_revision
+            assert extracted_item.revision_date == item.revision_date
+            assert extracted_item.children == item.children
@@ -0,0 +1,139 @@
+import os
+from datetime import datetime
+
+import pytest
+
+import src.git_source.history
+from src.fileparser import MigrationsParser
+from src.git_source import GitFirstCommitOrdering, GitHistory
+from src.revision_storage import (
+    CreateDateOrdering, FallbackOrdering, FixIsImpossible, RevisionItem,
+    RevisionStorage,
+)
+from tests.conftest import git, write_migration
+
+
+def _item(revision, revision_date=None):
+    return RevisionItem(revision, None, revision_date=revision_date)
+
+
+class TestOrderingStrategies:
+    def test_create_date(self):
+        items = [
+            _item("b", datetime(2022, 1, 2)), _item("a", datetime(2022, 1, 1))
+        ]
+        ordered = CreateDateOrdering().order(items)
+        assert [item.revision for item in ordered] == ["a", "b"]
+
+    def test_missing_date_is_reported(self):
+        with pytest.raises(FixIsImpossible, match="without a date"):
+            CreateDateOrdering().order(
+                [_item("a"), _item("b", datetime.now())]
+            )
+
+    def test_ties(self):
+        date = datetime(2022, 1, 1)
+        items = [_item("b", date), _item("a", date)]
+        with pytest.raises(FixIsImpossible, match="same date"):
+            CreateDateOrdering().order(items)
+        loose = CreateDateOrdering().order(items, strict=False)
+        assert [item.revision for item in loose] == ["b", "a"]
+
+    def test_fallback(self):
+        class ByName(CreateDateOrdering):
+            describes = "name"
+
+            def key(self, revision_item):
+                return revision_item.revision
+
+        items = [_item("b"), _item("a")]
+        ordering = FallbackOrdering(CreateDateOrdering(), ByName())
+        assert [item.revision for item in ordering.order(items)] == ["a", "b"]
+        with pytest.raises(FixIsImpossible, match="without a date"):
+            FallbackOrdering(CreateDateOrdering()).order(items)
+
+    def test_storage_uses_its_ordering(self):
+        storage = RevisionStorage.from_edges(
+            [("r", None), ("a", "r"), ("b", "r")]
+        )
+        with pytest.raises(FixIsImpossible):
+            storage.plan_conflict_fix()
+
+        class ByName(CreateDateOrdering):
+            def key(self, revision_item):
+                return revision_item.revision
+
+        storage.ordering = ByName()
+        assert storage.plan_conflict_fix() == [("b", "a", "r")]
+
+
+@pytest.fixture
+def repo_dir(temp_dir):
+    os.makedirs(os.path.join(temp_dir, "versions"))
+    git(temp_dir, "init", "-q")
+    return temp_dir
+
+
+def _commit(repo_dir, message, timestamp):
+    git(repo_dir, "add", "versions")
+    git(
+        repo_dir, "commit", "-q", "-m", message,
+        env={"GIT_COMMITTER_DATE": f"{timestamp} +0000"},
+    )
+
+
+class TestGitFirstCommitOrdering:
+    def test_history_is_read_once(self, repo_dir, monkeypatch):
+        versions = os.path.join(repo_dir, "versions")
+        root = write_migration(versions, "root", None)
+        _commit(repo_dir, "root", 1_600_000_000)
+        late = write_migration(versions, "late", "root")
+        _commit(repo_dir, "late", 1_600_000_300)
+        untracked = write_migration(versions, "untracked", "root")
+
+        calls = []
+        run_git = src.git_source.history.run_git
+        monkeypatch.setattr(
+            src.git_source.history, "run_git",
+            lambda *args: calls.append(args) or run_git(*args)
+        )
+        history = GitHistory([versions])
+        assert history.first_commit_time(root) == 1_600_000_000
+        assert history.first_commit_time(late) == 1_600_000_300
+        assert history.first_commit_time(untracked) is None
+        assert len(calls) == 2
+
+    def test_fix_follows_commit_order(self, repo_dir):
+        versions = os.path.join(repo_dir, "versions")
+        # "b" claims to be older but was committed after "a", and "c" has no
+        # date header at all.
+        write_migration(versions, "root", None, 1)
+        _commit(repo_dir, "root", 1_600_000_000)
+        write_migration(versions, "a", "root", 5)
+        _commit(repo_dir, "a", 1_600_000_100)
+        write_migration(versions, "b", "root", 2)
+        _commit(repo_dir, "b", 1_600_000_200)
+        write_migration(versions, "c", "root")
+        _commit(repo_dir, "c", 1_600_000_300)
+
+        storage = MigrationsParser(_dir_name=versions).revisions_storage
+        with pytest.raises(FixIsImpossible):
+            storage.plan_conflict_fix()
+
+        storage.ordering = GitFirstCommitOrdering(GitHistory([versions]))
+        assert storage.plan_conflict_fix() == [
+            ("b", "a", "root"), ("c", "b", "root")
+        ]
+
+    def test_falls_back_to_dates(self, repo_dir):
+        versions = os.path.join(repo_dir, "versions")
+        write_migration(versions, "root", None, 1)
+        write_migration(versions, "a", "root", 3)
+        write_migration(versions, "b", "root", 2)
+        # Both branches in one commit have the same commit time.
+        _commit(repo_dir, "all", 1_600_000_000)
+
+        storage = MigrationsParser(_dir_name=versions).revisions_storage
+        git_ordering = GitFirstCommitOrdering(GitHistory([versions]))
+        storage.ordering = FallbackOrdering(git_ordering, CreateDateOrdering())
+        assert storage.plan_conflict_fix() == [("a", "b", "root")]
@@ -0,0 +1,41 @@
+import pytest
+
+from src.fileparser import MigrationsParser
+from src.fileparser.migration_file_parser import split_files_into_chunks
+
+
+MIGRATION_FILES_DIR = "tests/migration_files_fixtures/"
+
+
+def _storage_edges(storage):
+    return {
+        revision: (item.parent_revision, item.revision_date, item.children)
+        for revision, item in storage.items()
+    }
+
+
+class TestParallelParsing:
+    @pytest.mark.parametrize("pool", ["process", "thread"])
+    @pytest.mark.parametrize("jobs", [2, 4])
+    def test_same_storage_as_sequential(self, pool, jobs):
+        sequential = MigrationsParser(_dir_name=MIGRATION_FILES_DIR)
+        parallel = MigrationsParser(
+            _dir_name=MIGRATION_FILES_DIR, _jobs=jobs, _pool=pool
+        )
+        assert parallel.files == sequential.files
+        assert _storage_edges(parallel.revisions_storage) == _storage_edges(
+            sequential.revisions_storage
+        )
+        assert (
+            parallel.revisions_storage.root_revision
+            == sequential.revisions_storage.root_revision
+        )
+
+    def test_chunks_cover_all_files(self):
+        files = MigrationsParser(_dir_name=MIGRATION_FILES_DIR).files
+        chunks = split_files_into_chunks(files, 3)
+        assert [path for chunk in chunks for path in chunk] == files
+
+    def test_unknown_pool(self):
+        with pytest.raises(AttributeError):
+            MigrationsParser(_dir_name=MIGRATION_FILES_DIR, _pool="fiber")
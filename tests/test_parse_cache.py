@@ -0,0 +1,74 @@
+import os
+
+from src.fileparser import MigrationFileParser, MigrationsParser
+from src.parse_cache import ParseCache
+
+
+class TestParseCache:
+    def test_cold_then_warm_run(self, aged_migrations_dir):
+        cold = MigrationsParser(_dir_name=aged_migrations_dir, _use_cache=True)
+        assert cold.cache_stats == {"hits": 0, "misses": 4}
+        assert os.path.exists(aged_migrations_dir + ParseCache.FILENAME)
+
+        warm = MigrationsParser(_dir_name=aged_migrations_dir, _use_cache=True)
+        assert warm.cache_stats == {"hits": 4, "misses": 0}
+        for revision, item in cold.revisions_storage.items():
+            warm_item = warm.revisions_storage[revision]
+            assert warm_item.parent_revision == item.parent_revision
+            assert warm_item.revision_date == item.revision_date
+            assert warm_item.children == item.children
+
+    def test_changed_file_is_reparsed(self, aged_migrations_dir):
+        MigrationsParser(_dir_name=aged_migrations_dir, _use_cache=True)
+        path = aged_migrations_dir + "migration_C.py"
+        with open(path) as file:
+            source = file.read()
+        with open(path, "w") as file:
+            file.write(source.replace("8448frrr2a14", "9999frrr2a14"))
+
+        warm = MigrationsParser(_dir_name=aged_migrations_dir, _use_cache=True)
+        assert warm.cache_stats == {"hits": 3, "misses": 1}
+        assert "9999frrr2a14" in warm.revisions_storage
+
+    def test_file_changed_between_parse_and_store(self, aged_migrations_dir):
+        path = aged_migrations_dir + "migration_C.py"
+        with ParseCache.for_directory(aged_migrations_dir) as parse_cache:
+            _, missing = parse_cache.lookup([path])
+            revision_item, = MigrationFileParser().parse_files(missing)
+            with open(path) as file:
+                source = file.read()
+            with open(path, "w") as file:
+                file.write(source.replace("8448frrr2a14", "9999frrr2a14"))
+            parse_cache.store([revision_item])
+
+            # The entry matches the parsed content, not the new one.
+            found, missing = parse_cache.lookup([path])
+            assert found == {} and missing == [path]
+
+    def test_touched_but_unchanged_file_is_a_hit(self, aged_migrations_dir):
+        MigrationsParser(_dir_name=aged_migrations_dir, _use_cache=True)
+        os.utime(aged_migrations_dir + "migration_C.py")
+
+        warm = MigrationsParser(_dir_name=aged_migrations_dir, _use_cache=True)
+        assert warm.cache_stats == {"hits": 4, "misses": 0}
+
+    def test_invalidate(self, aged_migrations_dir):
+        MigrationsParser(_dir_name=aged_migrations_dir, _use_cache=True)
+        with ParseCache.for_directory(aged_migrations_dir) as parse_cache:
+            parse_cache.invalidate(aged_migrations_dir + "migration_A.py")
+            assert len(parse_cache) == 3
+            parse_cache.invalidate()
+            assert len(parse_cache) == 0
+
+    def test_max_entries(self, aged_migrations_dir):
+        MigrationsParser(
+            _dir_name=aged_migrations_dir, _use_cache=True, _cache_max_entries=2
+        )
+        with ParseCache.for_directory(aged_migrations_dir) as parse_cache:
+            assert len(parse_cache) == 2
+
+    def test_shared_cache_is_left_open(self, aged_migrations_dir):
+        with ParseCache.for_directory(aged_migrations_dir) as parse_cache:
+            MigrationsParser(_dir_name=aged_migrations_dir, _parse_cache=parse_cache)
+            MigrationsParser(_dir_name=aged_migrations_dir, _parse_cache=parse_cache)
+            assert parse_cache.stats == {"hits": 4, "misses": 4}
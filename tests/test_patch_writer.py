@@ -0,0 +1,107 @@
+import difflib
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from src.revision_storage import RevisionItem
+from src.visitor import MigxerVisitor
+from src.writer import PatchNotApplicable, RevisionFilePatcher
+
+
+MIGRATION_FILES_DIR = "tests/migration_files_fixtures/"
+
+
+@pytest.fixture
+def migration_copy():
+    temp_dir = tempfile.mkdtemp()
+    path = shutil.copy(MIGRATION_FILES_DIR + "migration_C.py", temp_dir)
+    yield path
+    shutil.rmtree(temp_dir)
+
+
+def _read(path: str) -> str:
+    with open(path) as file:
+        return file.read()
+
+
+class TestRevisionFilePatcher:
+    def test_only_value_and_header_lines_change(self, migration_copy):
+        original = _read(migration_copy)
+        item = RevisionItem(
+            revision="8448frrr2a14",
+            original_filepath=migration_copy,
+            parent_revision="7474fcfa1b90",
+        )
+        item.serialize_to_revision_file()
+
+        patched = _read(migration_copy)
+        changed_lines = [
+            line for line in difflib.unified_diff(
+                original.splitlines(), patched.splitlines(), lineterm="", n=0
+            )
+            if line.startswith(("+", "-")) and not line.startswith(("+++", "---"))
+        ]
+        assert sorted(changed_lines) == [
+            "+Revises: 7474fcfa1b90",
+            "+down_revision = '7474fcfa1b90'",
+            "-Revises: 7954fsbh1i24",
+            "-down_revision = '7954fsbh1i24'",
+        ]
+        assert "# ### end Alembic commands ###" in patched
+        assert MigxerVisitor(migration_copy).down_revision_value == "7474fcfa1b90"
+
+    def test_unchanged_values_do_not_write(self, migration_copy):
+        mtime = os.stat(migration_copy).st_mtime_ns
+        written = RevisionFilePatcher(migration_copy).write({
+            "revision": "8448frrr2a14", "down_revision": "7954fsbh1i24"
+        })
+        assert written is False
+        assert os.stat(migration_copy).st_mtime_ns == mtime
+
+    def test_large_body_is_streamed(self, migration_copy):
+        body = "".join(f"    op.execute('select {i}')\n" for i in range(20000))
+        with open(migration_copy, "a") as file:
+            file.write("\n\ndef big():\n" + body)
+        original = _read(migration_copy)
+
+        RevisionFilePatcher.HEAD_CHUNK_SIZE = 64
+        try:
+            RevisionFilePatcher(migration_copy).write({"down_revision": None})
+        finally:
+            RevisionFilePatcher.HEAD_CHUNK_SIZE = 16 * 1024
+        patched = _read(migration_copy)
+        assert patched.endswith(body)
+        assert patched == original.replace(
+            "Revises: 7954fsbh1i24", "Revises: "
+        ).replace("down_revision = '7954fsbh1i24'", "down_revision = None")
+
+    def test_patch_keeps_quotes(self):
+        source = b'revision = "a"\ndown_revision = "b"  # parent\n'
+        patched = RevisionFilePatcher("inline").patch(
+            source, {"down_revision": "c"}
+        )
+        assert patched == b'revision = "a"\ndown_revision = "c"  # parent\n'
+
+    def test_multiline_value_is_not_patchable(self):
+        source = b"revision = 'a'\ndown_revision = (\n    'b', 'c'\n)\n"
+        with pytest.raises(PatchNotApplicable):
+            RevisionFilePatcher("inline").patch(source, {"down_revision": "d"})
+
+    def test_patch_merge_revision(self):
+        source = (
+            b'"""merge\n\nRevises: b, c\n"""\n'
+            b"revision = 'a'\ndown_revision = ('b', 'c')\n"
+        )
+        patched = RevisionFilePatcher("inline").patch(
+            source, {"down_revision": ("b", "d")}
+        )
+        assert patched == (
+            b'"""merge\n\nRevises: b, d\n"""\n'
+            b"revision = 'a'\ndown_revision = ('b', 'd')\n"
+        )
+
+    def test_no_temp_files_left(self, migration_copy):
+        RevisionFilePatcher(migration_copy).write({"down_revision": "x"})
+        assert os.listdir(os.path.dirname(migration_copy)) == ["migration_C.py"]
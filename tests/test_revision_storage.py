@@ -105,3 +105,66 @@ class TestRevisionStorage:
         storage.add(**r_item_C)
 
         assert storage.find_first_multiparent() == r_item_A["revision"]
+
+    def test_unordered_adding_adopts_every_orphan(
+        self, r_item_root, r_item_A, r_item_B, r_item_C, r_item_D
+    ):
+        storage = RevisionStorage()
+        storage.add(**r_item_B)
+        storage.add(**r_item_C)
+        storage.add(**r_item_D)
+
+        assert storage.orphans == [r_item_B["revision"], r_item_C["revision"]]
+        assert storage.root_revision == r_item_B["revision"]
+
+        storage.add(**r_item_A)
+        storage.add(**r_item_root)
+
+        assert storage.orphans == []
+        assert storage.root_revision == r_item_root["revision"]
+        assert storage["A"].children == ["B", "C"]
+        assert storage["root"].children == ["A"]
+
+    def test_from_edges(self):
+        storage = RevisionStorage.from_edges(
+            [("D", "B"), ("B", "A"), ("root", None), ("C", "A"), ("A", "root")]
+        )
+
+        assert storage.root_revision == "root"
+        assert storage.orphans == []
+        assert storage["A"].children == ["B", "C"]
+        assert storage["B"].children == ["D"]
+        assert storage.find_first_multiparent() == "A"
+
+    def test_remove_orphans_children_and_readding_adopts_them(
+        self, r_item_root, r_item_A, r_item_B, r_item_C, r_item_D
+    ):
+        storage = RevisionStorage()
+        for r_item in (r_item_root, r_item_A, r_item_B, r_item_C, r_item_D):
+            storage.add(**r_item)
+        assert storage.find_first_multiparent() == "A"
+
+        removed = storage.remove("A")
+
+        assert "A" not in storage
+        assert storage["root"].children == []
+        assert storage.orphans == ["B", "C"]
+        assert storage.find_first_multiparent() is None
+
+        removed.children = []
+        storage.add(removed)
+
+        assert storage.orphans == []
+        assert storage["A"].children == ["B", "C"]
+        assert storage.find_first_multiparent() == "A"
+        assert storage._get_last_descendant("root").revision == "D"
+
+    def test_remove_root(self, r_item_root, r_item_A):
+        storage = RevisionStorage()
+        storage.add(**r_item_root)
+        storage.add(**r_item_A)
+
+        storage.remove("root")
+
+        assert storage.root_revision == "A"
+        assert storage.orphans == ["A"]
@@ -0,0 +1,210 @@
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+from src.discovery import MigrationsDiscovery
+from src.fileparser import MigrationsParser
+from src.parse_cache import ParseCache
+from src.revision_storage import (
+    CompactRevisionStorage, RevisionStorage, SnapshotError, SnapshotMismatch
+)
+from src.revision_storage.snapshot import read_snapshot_fingerprint
+from tests.conftest import MIGRATION_FILES_DIR, git
+
+EDGES = [
+    ("root", None, datetime(2022, 10, 1, 12, 0, 0, 123456), "/m/root.py"),
+    ("A", "root", datetime(2022, 10, 2), "/m/A.py"),
+    ("B", "root", None, None),
+    ("M", ("A", "B"), datetime(2022, 10, 4), "/m/M.py", ("root",)),
+    ("orphan", "missing", datetime(2022, 10, 5), "/m/orphan.py"),
+]
+
+
+def _graph(storage):
+    return {
+        revision: (
+            item.parent_revision, item.revision_date, item.original_filepath,
+            item.children, item.depends_on
+        )
+        for revision, item in storage.items()
+    }
+
+
+class TestSnapshotFormat:
+    @pytest.mark.parametrize(
+        "storage_cls", [RevisionStorage, CompactRevisionStorage]
+    )
+    def test_round_trip(self, storage_cls, temp_dir):
+        path = os.path.join(temp_dir, "revisions.snapshot")
+        storage = storage_cls.from_edges(EDGES)
+        storage.save_snapshot(path, b"listing")
+
+        loaded = storage_cls.from_snapshot(path, b"listing")
+        assert list(loaded) == list(storage)
+        assert _graph(loaded) == _graph(storage)
+        assert loaded.orphans == ["orphan"]
+        assert sorted(loaded.heads()) == ["M", "orphan"]
+
+    def test_empty_storage(self, temp_dir):
+        path = os.path.join(temp_dir, "revisions.snapshot")
+        RevisionStorage().save_snapshot(path)
+        assert len(RevisionStorage.from_snapshot(path)) == 0
+
+    def test_fingerprint_mismatch(self, temp_dir):
+        path = os.path.join(temp_dir, "revisions.snapshot")
+        RevisionStorage.from_edges(EDGES).save_snapshot(path, b"old")
+        assert read_snapshot_fingerprint(path) == b"old"
+        with pytest.raises(SnapshotMismatch):
+            RevisionStorage.from_snapshot(path, b"new")
+        # Without a fingerprint the snapshot is trusted as is.
+        assert len(RevisionStorage.from_snapshot(path)) == len(EDGES)
+
+    def test_corrupted_snapshot(self, temp_dir):
+        path = os.path.join(temp_dir, "revisions.snapshot")
+        RevisionStorage.from_edges(EDGES).save_snapshot(path)
+        with open(path, "r+b") as snapshot_file:
+            snapshot_file.seek(40)
+            byte = snapshot_file.read(1)
+            snapshot_file.seek(40)
+            snapshot_file.write(bytes([byte[0] ^ 0xFF]))
+        with pytest.raises(SnapshotError):
+            RevisionStorage.from_snapshot(path)
+
+    @pytest.mark.parametrize("content", [b"", b"MIGXSNAP", b"not a snapshot" * 4])
+    def test_not_a_snapshot(self, content, temp_dir):
+        path = os.path.join(temp_dir, "revisions.snapshot")
+        with open(path, "wb") as snapshot_file:
+            snapshot_file.write(content)
+        with pytest.raises(SnapshotError):
+            RevisionStorage.from_snapshot(path)
+
+
+class TestParserSnapshot:
+    def test_snapshot_replaces_parsing(self, migrations_dir, temp_dir):
+        path = os.path.join(temp_dir, "revisions.snapshot")
+        cold = MigrationsParser(_dir_name=migrations_dir, _snapshot_path=path)
+        assert not cold.snapshot_used
+        assert os.path.exists(path)
+
+        warm = MigrationsParser(_dir_name=migrations_dir, _snapshot_path=path)
+        assert warm.snapshot_used
+        assert warm.files == cold.files
+        assert warm.file_parser.counters["bytes_read"] == 0
+        assert _graph(warm.revisions_storage) == _graph(cold.revisions_storage)
+        assert warm.revisions_storage.find_first_multiparent() == "2d9f80797b0d"
+
+    def test_dates_stay_lazy(self, migrations_dir, temp_dir):
+        path = os.path.join(temp_dir, "revisions.snapshot")
+        cold = MigrationsParser(_dir_name=migrations_dir, _snapshot_path=path)
+        # Saving did not load the dates either.
+        assert all(
+            item.lazy_revision_date is not None
+            for item in cold.revisions_storage.values()
+        )
+
+        warm = MigrationsParser(_dir_name=migrations_dir, _snapshot_path=path)
+        for revision, item in warm.revisions_storage.items():
+            lazy_revision_date = item.lazy_revision_date
+            assert lazy_revision_date.date_line == (
+                cold.revisions_storage[revision].lazy_revision_date.date_line
+            )
+            assert item.revision_date == (
+                cold.revisions_storage[revision].revision_date
+            )
+
+    def test_changed_listing_invalidates(self, migrations_dir, temp_dir):
+        path = os.path.join(temp_dir, "revisions.snapshot")
+        MigrationsParser(_dir_name=migrations_dir, _snapshot_path=path)
+        storage = MigrationsParser(_dir_name=migrations_dir).revisions_storage
+        storage.fix_revision_conflict()
+        storage.wtite_fix_to_file()
+
+        fixed = MigrationsParser(_dir_name=migrations_dir, _snapshot_path=path)
+        assert not fixed.snapshot_used
+        assert fixed.revisions_storage.find_first_multiparent() is None
+        again = MigrationsParser(_dir_name=migrations_dir, _snapshot_path=path)
+        assert again.snapshot_used
+        assert again.revisions_storage.find_first_multiparent() is None
+
+    def test_unknown_fingerprint(self):
+        with pytest.raises(AttributeError):
+            MigrationsParser(
+                _dir_name=MIGRATION_FILES_DIR, _snapshot_fingerprint="hash"
+            )
+
+    def test_cli_rejects_unknown_fingerprint(self):
+        completed = subprocess.run(
+            [
+                sys.executable, "-m", "src.main", "--rev_dir",
+                MIGRATION_FILES_DIR, "--snapshot_fingerprint", "hash",
+            ],
+            capture_output=True, text=True,
+        )
+        assert completed.returncode == 2
+        assert "--snapshot_fingerprint" in completed.stderr
+
+
+class TestGitFingerprint:
+    @pytest.fixture
+    def repo_dir(self, migrations_dir):
+        git(migrations_dir, "init", "-q")
+        git(migrations_dir, "add", ".")
+        git(migrations_dir, "commit", "-q", "-m", "migrations")
+        return migrations_dir
+
+    def test_survives_new_mtimes(self, repo_dir):
+        discovery = MigrationsDiscovery([repo_dir])
+        stat_fingerprint = discovery.fingerprint()
+        git_fingerprint = discovery.git_fingerprint()
+        for filename in os.listdir(repo_dir):
+            os.utime(os.path.join(repo_dir, filename), (1_600_000_000,) * 2)
+        assert discovery.fingerprint() != stat_fingerprint
+        assert discovery.git_fingerprint() == git_fingerprint
+
+    def test_sees_uncommitted_changes(self, repo_dir):
+        discovery = MigrationsDiscovery([repo_dir])
+        git_fingerprint = discovery.git_fingerprint()
+        with open(os.path.join(repo_dir, "new.py"), "w") as new_file:
+            new_file.write("revision = 'new'\n")
+        untracked = discovery.git_fingerprint()
+        assert untracked != git_fingerprint
+        with open(os.path.join(repo_dir, "new.py"), "a") as new_file:
+            new_file.write("down_revision = None\n")
+        assert discovery.git_fingerprint() != untracked
+
+    def test_falls_back_outside_a_work_tree(self, migrations_dir):
+        discovery = MigrationsDiscovery([migrations_dir])
+        assert discovery.git_fingerprint() == discovery.fingerprint()
+
+    def test_falls_back_without_git(self, repo_dir, monkeypatch):
+        monkeypatch.setenv("PATH", "")
+        discovery = MigrationsDiscovery([repo_dir])
+        assert discovery.git_fingerprint() == discovery.fingerprint()
+
+    def test_parser_uses_git_fingerprint(self, repo_dir, temp_dir):
+        path = os.path.join(temp_dir, "revisions.snapshot")
+        MigrationsParser(
+            _dir_name=repo_dir, _snapshot_path=path, _snapshot_fingerprint="git"
+        )
+        for filename in os.listdir(repo_dir):
+            os.utime(os.path.join(repo_dir, filename), (1_600_000_000,) * 2)
+        warm = MigrationsParser(
+            _dir_name=repo_dir, _snapshot_path=path, _snapshot_fingerprint="git"
+        )
+        assert warm.snapshot_used
+
+    def test_cache_and_snapshot_next_to_migrations(self, repo_dir):
+        # Both change on every run and must not change the fingerprint.
+        path = os.path.join(repo_dir, "revisions.snapshot")
+        with ParseCache.for_directory(repo_dir):
+            pass
+        options = dict(
+            _dir_name=repo_dir, _snapshot_path=path,
+            _snapshot_fingerprint="git", _use_cache=True,
+        )
+        MigrationsParser(**options)
+        warm = MigrationsParser(**options)
+        assert warm.snapshot_used
@@ -0,0 +1,135 @@
+import builtins
+import os
+
+import pytest
+
+from src.fileparser import MigrationsParser
+from src.writer import SourceCache
+from tests.conftest import OLD_MTIME
+
+
+def _put(source_cache, filepath, source):
+    with open(filepath, "wb") as source_file:
+        source_file.write(source)
+    os.utime(filepath, (OLD_MTIME,) * 2)
+    source_cache.put(filepath, source, os.stat(filepath))
+
+
+@pytest.fixture
+def opened_files(monkeypatch):
+    opened = []
+    original_open = builtins.open
+
+    def tracking_open(file, *args, **kwargs):
+        opened.append(os.path.basename(str(file)))
+        return original_open(file, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "open", tracking_open)
+    return opened
+
+
+class TestSourceCache:
+    def test_take_hands_out_once(self, temp_dir):
+        source_cache = SourceCache()
+        filepath = os.path.join(temp_dir, "a.py")
+        _put(source_cache, filepath, b"revision = 'a'\n")
+        assert filepath in source_cache
+        assert source_cache.take(filepath).source == b"revision = 'a'\n"
+        assert source_cache.take(filepath) is None
+        assert source_cache.stats == {
+            "hits": 1, "misses": 1, "stale": 0, "evictions": 0
+        }
+
+    def test_evicts_least_recent_by_size(self, temp_dir):
+        source_cache = SourceCache(max_bytes=10)
+        paths = [os.path.join(temp_dir, f"{name}.py") for name in "abc"]
+        for filepath in paths:
+            _put(source_cache, filepath, b"x" * 4)
+        assert [filepath in source_cache for filepath in paths] == [
+            False, True, True
+        ]
+        assert source_cache.size == 8
+        _put(source_cache, paths[0], b"x" * 11)
+        assert paths[0] not in source_cache
+        assert source_cache.stats["evictions"] == 1
+
+    def test_changed_file_is_stale(self, temp_dir):
+        source_cache = SourceCache()
+        filepath = os.path.join(temp_dir, "a.py")
+        _put(source_cache, filepath, b"revision = 'a'\n")
+        with open(filepath, "ab") as source_file:
+            source_file.write(b"down_revision = None\n")
+        assert source_cache.take(filepath) is None
+        assert source_cache.stats["stale"] == 1
+
+    def test_recent_file_is_not_trusted(self, temp_dir):
+        source_cache = SourceCache()
+        filepath = os.path.join(temp_dir, "a.py")
+        with open(filepath, "wb") as source_file:
+            source_file.write(b"revision = 'a'\n")
+        source_cache.put(filepath, b"revision = 'a'\n", os.stat(filepath))
+        assert source_cache.take(filepath) is None
+
+    def test_retain(self, temp_dir):
+        source_cache = SourceCache()
+        paths = [os.path.join(temp_dir, f"{name}.py") for name in "abc"]
+        for filepath in paths:
+            _put(source_cache, filepath, b"x")
+        source_cache.retain(paths[1:2])
+        assert len(source_cache) == 1 and paths[1] in source_cache
+        assert source_cache.size == 1
+
+    def test_negative_size(self):
+        with pytest.raises(AttributeError):
+            SourceCache(max_bytes=-1)
+
+
+class TestFixWithKeptSources:
+    @pytest.mark.parametrize("engine", ["scanner", "ast"])
+    def test_fix_reads_no_file_again(self, engine, aged_migrations_dir, opened_files):
+        source_cache = SourceCache()
+        fileparser = MigrationsParser(
+            _dir_name=aged_migrations_dir, _engine=engine, _source_cache=source_cache
+        )
+        storage = fileparser.revisions_storage
+        # Only the children of the branch point are kept.
+        assert len(source_cache) == 2
+        storage.fix_revision_conflict()
+        del opened_files[:]
+        written = storage.wtite_fix_to_file()
+
+        assert len(written) == 1
+        assert opened_files == []
+        assert source_cache.stats["hits"] == 1
+        fixed = MigrationsParser(_dir_name=aged_migrations_dir).revisions_storage
+        assert fixed.find_first_multiparent() is None
+
+    def test_other_files_are_read_up_to_their_header(self, aged_migrations_dir):
+        plain = MigrationsParser(_dir_name=aged_migrations_dir).file_parser
+        source_cache = SourceCache()
+        kept = MigrationsParser(
+            _dir_name=aged_migrations_dir, _source_cache=source_cache
+        ).file_parser
+        kept_sizes = sum(
+            os.path.getsize(aged_migrations_dir + filename)
+            for filename in ("migration_A.py", "migration_C.py")
+        )
+        assert len(source_cache) == 2
+        assert kept.bytes_read == plain.bytes_read + kept_sizes
+
+    def test_changed_file_is_read_again(self, aged_migrations_dir):
+        source_cache = SourceCache()
+        storage = MigrationsParser(
+            _dir_name=aged_migrations_dir, _source_cache=source_cache
+        ).revisions_storage
+        storage.fix_revision_conflict()
+        revision_item, = storage.revisions_to_rewrite
+        with open(revision_item.original_filepath, "a") as migration_file:
+            migration_file.write("\n# edited after parsing\n")
+        storage.wtite_fix_to_file()
+
+        assert source_cache.stats["stale"] == 1
+        with open(revision_item.original_filepath) as migration_file:
+            assert migration_file.read().endswith("# edited after parsing\n")
+        fixed = MigrationsParser(_dir_name=aged_migrations_dir).revisions_storage
+        assert fixed.find_first_multiparent() is None
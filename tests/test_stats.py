@@ -0,0 +1,78 @@
+from src.fileparser import MigrationsParser
+from src.revision_storage import RevisionStorage
+from src.stats import RunStats
+from src.writer import SourceCache
+
+
+class TestHooks:
+    def test_parser_and_storage_events(self, migrations_dir):
+        events = []
+
+        def hook(event, payload):
+            events.append((event, payload))
+
+        storage = RevisionStorage()
+        storage.add_hook(hook)
+        MigrationsParser(
+            _dir_name=migrations_dir, revisions_storage=storage, hooks=[hook]
+        )
+        storage.fix_revision_conflict()
+        storage.wtite_fix_to_file()
+
+        phases = [payload["name"] for event, payload in events if event == "phase"]
+        assert phases == [
+            "discovery", "parsing", "graph_build", "conflict_fixing", "writing"
+        ]
+        payloads = {event: payload for event, payload in events}
+        assert payloads["files_scanned"] == {"count": 4}
+        assert payloads["files_parsed"]["count"] == 4
+        assert payloads["files_parsed"]["fallbacks"] == 0
+        assert payloads["files_parsed"]["bytes_read"] > 0
+        assert payloads["graph"] == {"revisions": 4, "depth": 3}
+        assert payloads["conflicts_fixed"] == {"count": 1}
+        assert payloads["files_written"] == {"count": 1}
+
+    def test_run_stats(self, migrations_dir):
+        run_stats = RunStats()
+        MigrationsParser(_dir_name=migrations_dir, hooks=[run_stats], _jobs=2)
+        report = run_stats.to_dict()
+
+        assert set(report["phases"]) == {"discovery", "parsing", "graph_build"}
+        for phase in report["phases"].values():
+            assert phase["wall"] >= 0 and phase["cpu"] >= 0
+        assert report["counters"]["files_scanned"] == 4
+        assert report["counters"]["files_parsed.bytes_read"] > 0
+        assert report["counters"]["orphans"] == 0
+
+    def test_reused_parser_counts_each_load_once(self, migrations_dir):
+        run_stats = RunStats()
+        parser = MigrationsParser(_dir_name=migrations_dir, hooks=[run_stats])
+        bytes_read = run_stats.counters["files_parsed.bytes_read"]
+        parser._load_revision_items(None)
+        assert run_stats.counters["files_parsed.bytes_read"] == 2 * bytes_read
+        assert parser.file_parser.bytes_read == 2 * bytes_read
+
+    def test_kept_sources_are_counted_apart(self, migrations_dir):
+        run_stats = RunStats()
+        parser = MigrationsParser(
+            _dir_name=migrations_dir, hooks=[run_stats],
+            _source_cache=SourceCache(),
+        )
+        counters = run_stats.counters
+        # The two children of the branch point.
+        assert counters["sources_kept"] == 2
+        assert counters["sources_kept.bytes_read"] > 0
+        assert (
+            counters["files_parsed.bytes_read"]
+            + counters["sources_kept.bytes_read"]
+            == parser.file_parser.bytes_read
+        )
+
+    def test_fallbacks_are_counted(self, migrations_dir):
+        with open(migrations_dir + "merge.py", "w") as file:
+            file.write(
+                "revision = 'merge'\ndown_revision = (\n    '7474fcfa1b90',\n)\n"
+            )
+        run_stats = RunStats()
+        MigrationsParser(_dir_name=migrations_dir, hooks=[run_stats])
+        assert run_stats.counters["files_parsed.fallbacks"] == 1
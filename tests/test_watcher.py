@@ -0,0 +1,110 @@
+import os
+import shutil
+
+import pytest
+
+from src.fileparser import MigrationsParser
+from src.watcher import MigrationsWatcher
+from tests.conftest import MIGRATION_FILES_DIR, write_migration, write_source
+
+
+@pytest.fixture
+def migrations_dir(temp_dir):
+    for filename in ("migration_root.py", "migration_A.py"):
+        shutil.copy(MIGRATION_FILES_DIR + filename, temp_dir)
+    return temp_dir + os.sep
+
+
+class TestMigrationsWatcher:
+    def test_no_changes(self, migrations_dir):
+        watcher = MigrationsWatcher(MigrationsParser(_dir_name=migrations_dir))
+        report = watcher.poll()
+        assert not report.has_changes
+
+    def test_added_file_reports_conflict(self, migrations_dir):
+        watcher = MigrationsWatcher(MigrationsParser(_dir_name=migrations_dir))
+        write_migration(migrations_dir, "bbbb", "2d9f80797b0d", 5, filename="new.py")
+
+        report = watcher.poll()
+        assert report.added == [migrations_dir + "new.py"]
+        assert report.multiparent == "2d9f80797b0d"
+        assert watcher.storage["2d9f80797b0d"].children == [
+            "7474fcfa1b90", "bbbb"
+        ]
+
+    def test_removed_file_resolves_conflict(self, migrations_dir):
+        write_migration(migrations_dir, "bbbb", "2d9f80797b0d", 5, filename="new.py")
+        watcher = MigrationsWatcher(MigrationsParser(_dir_name=migrations_dir))
+        assert watcher.storage.find_first_multiparent() == "2d9f80797b0d"
+
+        os.remove(migrations_dir + "new.py")
+        report = watcher.poll()
+        assert report.removed == [migrations_dir + "new.py"]
+        assert report.multiparent is None
+        assert "bbbb" not in watcher.storage
+
+    def test_changed_file_moves_revision(self, migrations_dir):
+        write_migration(migrations_dir, "bbbb", "2d9f80797b0d", 5, filename="new.py")
+        watcher = MigrationsWatcher(MigrationsParser(_dir_name=migrations_dir))
+
+        write_migration(migrations_dir, "cccc", "7474fcfa1b90", 5, filename="new.py")
+        os.utime(migrations_dir + "new.py", ns=(1, 1))
+        report = watcher.poll()
+        assert report.changed == [migrations_dir + "new.py"]
+        assert report.multiparent is None
+        assert watcher.storage.get_revisions_line() == [
+            "2d9f80797b0d", "7474fcfa1b90", "cccc"
+        ]
+
+    def test_auto_fix(self, migrations_dir):
+        watcher = MigrationsWatcher(
+            MigrationsParser(_dir_name=migrations_dir), auto_fix=True
+        )
+        write_migration(migrations_dir, "bbbb", "2d9f80797b0d", 5, filename="new.py")
+
+        report = watcher.poll()
+        assert report.fixed == [migrations_dir + "new.py"]
+        assert report.multiparent is None
+        assert not watcher.poll().has_changes
+
+        reparsed = MigrationsParser(_dir_name=migrations_dir).revisions_storage
+        assert reparsed["bbbb"].parent_revision == "7474fcfa1b90"
+
+    def test_unparsable_file_is_retried_once_completed(self, migrations_dir):
+        watcher = MigrationsWatcher(MigrationsParser(_dir_name=migrations_dir))
+        write_source(
+            migrations_dir, "new.py", "revision = 'bbbb'\ndown_revision = (\n"
+        )
+
+        report = watcher.poll()
+        assert report.added == [migrations_dir + "new.py"]
+        assert list(report.errors) == [migrations_dir + "new.py"]
+        assert "errors: " + migrations_dir + "new.py" in str(report)
+        assert "bbbb" not in watcher.storage
+        # Unchanged, it is not reported again.
+        assert not watcher.poll().has_changes
+
+        write_migration(migrations_dir, "bbbb", "7474fcfa1b90", 5, filename="new.py")
+        os.utime(migrations_dir + "new.py", ns=(1, 1))
+        report = watcher.poll()
+        assert report.added == [migrations_dir + "new.py"]
+        assert report.errors == {}
+        assert report.multiparent is None
+        assert watcher.storage["bbbb"].parent_revision == "7474fcfa1b90"
+
+    def test_unfixable_conflict_keeps_watching(self, migrations_dir):
+        watcher = MigrationsWatcher(
+            MigrationsParser(_dir_name=migrations_dir), auto_fix=True
+        )
+        # Without a Create Date the siblings can't be ordered.
+        write_source(
+            migrations_dir, "new.py",
+            "revision = 'bbbb'\ndown_revision = '2d9f80797b0d'\n",
+        )
+
+        report = watcher.poll()
+        assert report.fixed == []
+        assert report.multiparent == "2d9f80797b0d"
+        assert report.errors["2d9f80797b0d"].startswith("FixIsImpossible")
+        assert watcher.storage.find_first_multiparent() == "2d9f80797b0d"
+        assert not watcher.poll().has_changes